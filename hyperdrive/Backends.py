@@ -0,0 +1,345 @@
+import io
+import os
+import json
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from typing import BinaryIO, Optional
+from datetime import datetime, timezone
+from botocore.exceptions import ClientError
+import Constants as C
+
+
+class Backend(ABC):
+    """
+    Object storage that isn't S3, behind the subset of the boto3 S3 client
+    that Store and Librarian use, so either can run on any backend.
+
+    Missing objects and failed conditions raise ClientErrors
+    with S3's error codes, so callers handle every backend alike.
+    Subclasses implement load, save, remove and scan
+    (a backend missing one can't be instantiated).
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.RLock()
+
+    def error(self, code: str, operation: str) -> ClientError:
+        return ClientError(
+            {'Error': {'Code': code, 'Message': f'{operation} failed'}},
+            operation)
+
+    @abstractmethod
+    def load(self, bucket: str, key: str) -> Optional[tuple[bytes, dict]]:
+        """
+        Get an object.
+
+        Args:
+            bucket (str): The bucket.
+            key (str): The key.
+
+        Returns:
+            Optional[tuple[bytes, dict]]:
+                The body and metadata of the object or None if it's missing.
+        """
+
+    @abstractmethod
+    def save(
+            self,
+            bucket: str,
+            key: str,
+            body: bytes,
+            encoding: Optional[str] = None,
+            metadata: Optional[dict] = None
+    ) -> dict:
+        """
+        Put an object.
+
+        Args:
+            bucket (str): The bucket.
+            key (str): The key.
+            body (bytes): The body.
+            encoding (Optional[str]): The ContentEncoding of the body.
+            metadata (Optional[dict]): The user metadata of the object.
+
+        Returns:
+            dict: The metadata of the object.
+        """
+
+    @abstractmethod
+    def remove(self, bucket: str, key: str) -> None:
+        """
+        Delete an object if it exists.
+
+        Args:
+            bucket (str): The bucket.
+            key (str): The key.
+        """
+
+    @abstractmethod
+    def scan(self, bucket: str, prefix: str) -> list[dict]:
+        """
+        List the objects under a prefix.
+
+        Args:
+            bucket (str): The bucket.
+            prefix (str): The prefix.
+
+        Returns:
+            list[dict]: The metadata of each object, sorted by key.
+        """
+
+    def describe(self, body: bytes, meta: dict) -> dict:
+        meta = {key: val for key, val in meta.items() if val is not None}
+        return {**meta, 'ContentLength': len(body)}
+
+    def fetch(self, bucket: str, key: str, operation: str) -> tuple:
+        obj = self.load(bucket, key)
+        if obj is None:
+            code = 'NoSuchKey' if operation == 'GetObject' else '404'
+            raise self.error(code, operation)
+        return obj
+
+    def get_object(
+            self,
+            Bucket: str,
+            Key: str,
+            IfNoneMatch: Optional[str] = None,
+            **kwargs
+    ) -> dict:
+        body, meta = self.fetch(Bucket, Key, 'GetObject')
+        if IfNoneMatch and IfNoneMatch == meta['ETag']:
+            raise self.error('304', 'GetObject')
+        return {**self.describe(body, meta), 'Body': io.BytesIO(body)}
+
+    def head_object(self, Bucket: str, Key: str, **kwargs) -> dict:
+        body, meta = self.fetch(Bucket, Key, 'HeadObject')
+        return self.describe(body, meta)
+
+    def put_object(
+            self,
+            Bucket: str,
+            Key: str,
+            Body: bytes,
+            IfMatch: Optional[str] = None,
+            IfNoneMatch: Optional[str] = None,
+            ContentEncoding: Optional[str] = None,
+            Metadata: Optional[dict] = None,
+            **kwargs
+    ) -> dict:
+        if not isinstance(Body, bytes):
+            Body = Body.read()
+        with self.lock:
+            obj = self.load(Bucket, Key)
+            if (
+                (IfMatch and (not obj or obj[1]['ETag'] != IfMatch)) or
+                (IfNoneMatch == '*' and obj)
+            ):
+                raise self.error('PreconditionFailed', 'PutObject')
+            meta = self.save(Bucket, Key, Body, ContentEncoding, Metadata)
+        return {'ETag': meta['ETag']}
+
+    def upload_fileobj(
+            self,
+            Fileobj: BinaryIO,
+            Bucket: str,
+            Key: str,
+            ExtraArgs: Optional[dict] = None,
+            **kwargs
+    ) -> None:
+        args = ExtraArgs or {}
+        with self.lock:
+            self.save(
+                Bucket, Key, Fileobj.read(),
+                args.get('ContentEncoding'), args.get('Metadata'))
+
+    def upload_file(
+            self,
+            Filename: str,
+            Bucket: str,
+            Key: str,
+            ExtraArgs: Optional[dict] = None,
+            **kwargs
+    ) -> None:
+        with open(Filename, 'rb') as file:
+            self.upload_fileobj(file, Bucket, Key, ExtraArgs)
+
+    def download_fileobj(
+            self,
+            Bucket: str,
+            Key: str,
+            Fileobj: BinaryIO,
+            **kwargs
+    ) -> None:
+        body, _ = self.fetch(Bucket, Key, 'HeadObject')
+        Fileobj.write(body)
+
+    def copy(
+            self,
+            CopySource: dict,
+            Bucket: str,
+            Key: str,
+            **kwargs
+    ) -> None:
+        body, meta = self.fetch(
+            CopySource['Bucket'], CopySource['Key'], 'HeadObject')
+        with self.lock:
+            self.save(
+                Bucket, Key, body,
+                meta.get('ContentEncoding'), meta.get('Metadata'))
+
+    def delete_objects(self, Bucket: str, Delete: dict, **kwargs) -> dict:
+        with self.lock:
+            for obj in Delete['Objects']:
+                self.remove(Bucket, obj['Key'])
+        return {'Deleted': Delete['Objects']}
+
+    def get_paginator(self, operation: str) -> 'Backend':
+        # everything fits on one page
+        return self
+
+    def paginate(self, Bucket: str, Prefix: str = '', **kwargs) -> list:
+        return [{'Contents': self.scan(Bucket, Prefix)}]
+
+
+class MemoryBackend(Backend):
+    """
+    Keeps objects in a dict, e.g. for tests.
+    Objects are shared by every Store in the process
+    (and copied into forked children).
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        # (bucket, key) -> (body, metadata)
+        self.objects = {}
+
+    def load(self, bucket: str, key: str) -> Optional[tuple[bytes, dict]]:
+        return self.objects.get((bucket, key))
+
+    def save(
+            self,
+            bucket: str,
+            key: str,
+            body: bytes,
+            encoding: Optional[str] = None,
+            metadata: Optional[dict] = None
+    ) -> dict:
+        meta = {
+            'ETag': f'"{hashlib.md5(body).hexdigest()}"',
+            'LastModified': datetime.now(timezone.utc),
+            'ContentEncoding': encoding,
+            'Metadata': metadata
+        }
+        self.objects[(bucket, key)] = (body, meta)
+        return meta
+
+    def remove(self, bucket: str, key: str) -> None:
+        self.objects.pop((bucket, key), None)
+
+    def scan(self, bucket: str, prefix: str) -> list[dict]:
+        objs = [
+            {
+                'Key': key,
+                'Size': len(body),
+                'ETag': meta['ETag'],
+                'LastModified': meta['LastModified']
+            }
+            for (bucket_, key), (body, meta) in list(self.objects.items())
+            if bucket_ == bucket and key.startswith(prefix)
+        ]
+        return sorted(objs, key=lambda obj: obj['Key'])
+
+
+class LocalBackend(Backend):
+    """
+    Keeps objects as files in a local dir (root/bucket/key),
+    e.g. for offline runs and benchmarks without network latency.
+
+    ETags are derived from each file's mtime and size, so they change on
+    every write without hashing the file. The ContentEncoding and user
+    metadata of an object are kept in root/.meta/bucket/key.json.
+
+    Args:
+        root (str): The dir holding the buckets.
+    """
+
+    def __init__(self, root: str) -> None:
+        super().__init__()
+        self.root = root
+
+    def get_path(self, bucket: str, key: str) -> str:
+        return os.path.join(self.root, bucket or '', key)
+
+    def get_meta_path(self, bucket: str, key: str) -> str:
+        return os.path.join(self.root, C.META_DIR, bucket or '', f'{key}.json')
+
+    def stat(self, path: str) -> dict:
+        stat = os.stat(path)
+        return {
+            'ETag': f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"',
+            'LastModified': datetime.fromtimestamp(
+                stat.st_mtime, timezone.utc),
+            'Size': stat.st_size
+        }
+
+    def load(self, bucket: str, key: str) -> Optional[tuple[bytes, dict]]:
+        path = self.get_path(bucket, key)
+        if not os.path.isfile(path):
+            return None
+        with open(path, 'rb') as file:
+            body = file.read()
+        meta = self.stat(path)
+        meta_path = self.get_meta_path(bucket, key)
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r') as file:
+                meta.update(json.load(file))
+        return body, meta
+
+    def save(
+            self,
+            bucket: str,
+            key: str,
+            body: bytes,
+            encoding: Optional[str] = None,
+            metadata: Optional[dict] = None
+    ) -> dict:
+        path = self.get_path(bucket, key)
+        meta_path = self.get_meta_path(bucket, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp = f'{path}.tmp'
+        with open(temp, 'wb') as file:
+            file.write(body)
+        os.replace(temp, path)
+        extra = {
+            name: val for name, val in
+            [('ContentEncoding', encoding), ('Metadata', metadata)] if val
+        }
+        if extra:
+            os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+            with open(meta_path, 'w') as file:
+                json.dump(extra, file)
+        elif os.path.exists(meta_path):
+            os.remove(meta_path)
+        return self.stat(path)
+
+    def remove(self, bucket: str, key: str) -> None:
+        for path in [
+            self.get_path(bucket, key), self.get_meta_path(bucket, key)
+        ]:
+            if os.path.isfile(path):
+                os.remove(path)
+
+    def scan(self, bucket: str, prefix: str) -> list[dict]:
+        bucket_dir = os.path.normpath(self.get_path(bucket, ''))
+        objs = []
+        for dirpath, dirnames, filenames in os.walk(bucket_dir):
+            if dirpath == bucket_dir:
+                # encodings of the bucketless layout
+                dirnames[:] = [name for name in dirnames if name != C.META_DIR]
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                key = os.path.relpath(path, bucket_dir).replace(os.sep, '/')
+                if key.startswith(prefix) and not name.endswith('.tmp'):
+                    objs.append({'Key': key, **self.stat(path)})
+        return sorted(objs, key=lambda obj: obj['Key'])
@@ -0,0 +1,329 @@
+from typing import Optional
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from DataSource import MarketData
+import Constants as C
+
+PENDING = 'pending'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class BackfillPlanner:
+    """
+    Finds the market days missing from a provider's stored bars
+    and plans the fewest calls that fetch them.
+
+    The gaps of each symbol are kept as compact ranges of market days
+    (see find_gaps), e.g. {'AAPL': [['2020-03-02', '2020-03-06']]},
+    so a symbol with one missing week is one range, not five dates.
+
+    A plan (see make_plan) turns the gaps into tasks that each cost
+    a known number of calls, using the provider's bulk endpoints
+    (grouped daily bars, multi symbol bars or multi day minute bars)
+    where they're cheaper, and estimates how long the calls take
+    under the provider's rate limit.
+    Executing a plan marks its tasks as they finish and saves it,
+    so an interrupted backfill resumes where it stopped (see execute).
+
+    Args:
+        md (MarketData): The provider, e.g. Polygon.
+        kind (str): The bars, OHLC_DIR (daily) or INTRA_DIR (minute).
+    """
+
+    def __init__(self, md: MarketData, kind: str = C.OHLC_DIR) -> None:
+        self.md = md
+        self.kind = kind
+
+    def get_path(self) -> str:
+        return self.md.finder.get_backfill_path(self.kind, self.md.provider)
+
+    def get_stored_dates(self, symbol: str) -> list[str]:
+        """
+        Get the days a symbol has stored bars for.
+
+        Args:
+            symbol (str): The symbol.
+
+        Returns:
+            list[str]: The dates, e.g. ['2020-01-02', '2020-01-03'].
+        """
+        if self.kind == C.INTRA_DIR:
+            return self.md.get_intraday_dates(symbol)
+        # the stored data, not the provider's
+        df = MarketData.get_ohlc(self.md, symbol)
+        if C.TIME not in df or df.empty:
+            return []
+        return list(
+            pd.to_datetime(df[C.TIME]).dt.strftime(C.DATE_FMT).unique())
+
+    def get_ranges(self, dates: list[str], stored: set) -> list[list[str]]:
+        """
+        Find the runs of consecutive dates that aren't stored.
+
+        Args:
+            dates (list[str]): The sorted market days.
+            stored (set): The stored days.
+
+        Returns:
+            list[list[str]]: The [first, last] day of each run.
+        """
+        dates = np.array(dates)
+        missing = ~np.isin(dates, list(stored))
+        # +1 where a run starts and -1 after it ends
+        edges = np.diff(np.concatenate([[0], missing.astype(int), [0]]))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1) - 1
+        return [
+            [str(dates[start]), str(dates[end])]
+            for start, end in zip(starts, ends)
+        ]
+
+    def find_gaps(
+            self,
+            symbols: list[str],
+            timeframe: str = 'max',
+            since_first: bool = True
+    ) -> dict:
+        """
+        Build the index of missing market days of each symbol.
+
+        Args:
+            symbols (list[str]): The symbols.
+            timeframe (str): The window to check, e.g. '1y'.
+            since_first (bool): Whether to skip the days before a symbol's
+                first stored day (e.g. before its IPO).
+                Symbols without stored bars miss the whole window.
+
+        Returns:
+            dict: symbol -> [first, last] day of each gap,
+                only for the symbols with gaps.
+        """
+        start, end = self.md.traveller.convert_dates(timeframe)
+        calendars = {}
+        gaps = {}
+        for symbol in symbols:
+            crypto = self.md.is_crypto(symbol)
+            if crypto not in calendars:
+                calendars[crypto] = self.md.traveller.get_market_dates(
+                    start, end, crypto)
+            dates = calendars[crypto]
+            stored = set(self.get_stored_dates(symbol))
+            if since_first and stored:
+                first = min(stored)
+                dates = [date for date in dates if date >= first]
+            ranges = self.get_ranges(dates, stored)
+            if ranges:
+                gaps[symbol] = ranges
+        return gaps
+
+    def expand(self, symbol: str, ranges: list[list[str]]) -> list[str]:
+        # the market days in a symbol's gaps
+        crypto = self.md.is_crypto(symbol)
+        return [
+            date for first, last in ranges
+            for date in self.md.traveller.get_market_dates(
+                first, last, crypto)
+        ]
+
+    def plan_ohlc(self, gaps: dict) -> list[dict]:
+        # one call fetches every daily bar of a symbol since its first gap
+        tasks = []
+        singles = dict(gaps)
+        if hasattr(self.md, 'get_ohlc_grouped'):
+            # stocks missing a few days can share grouped daily calls
+            # if there are fewer days than symbols
+            few = {
+                symbol: self.expand(symbol, ranges)
+                for symbol, ranges in gaps.items()
+                if not self.md.is_crypto(symbol)
+            }
+            few = {
+                symbol: dates for symbol, dates in few.items()
+                if len(dates) <= C.POLY_GROUPED_MAX_DAYS
+            }
+            dates = sorted(set().union(*few.values()))
+            if few and len(dates) < len(few):
+                size = C.POLY_GROUPED_MAX_DAYS
+                for idx in range(0, len(dates), size):
+                    chunk = set(dates[idx:idx + size])
+                    tasks.append({
+                        'symbols': sorted(
+                            symbol for symbol, missing in few.items()
+                            if chunk.intersection(missing)),
+                        'dates': sorted(chunk),
+                        'calls': len(chunk)
+                    })
+                for symbol in few:
+                    del singles[symbol]
+        starts = {}
+        for symbol, ranges in singles.items():
+            key = (ranges[0][0], self.md.is_crypto(symbol))
+            starts.setdefault(key, []).append(symbol)
+        # stocks (or crypto) since the same day
+        # can share a multi symbol call
+        size = C.ALPACA_BATCH_SIZE if hasattr(self.md, 'get_bars') else 1
+        for (start, _), symbols in sorted(starts.items()):
+            for idx in range(0, len(symbols), size):
+                tasks.append({
+                    'symbols': symbols[idx:idx + size],
+                    'start': start,
+                    'calls': 1
+                })
+        return tasks
+
+    def plan_intraday(self, gaps: dict) -> list[dict]:
+        # a call per range of days that fits under the provider's limit
+        tasks = []
+        for symbol, ranges in gaps.items():
+            dates = self.expand(symbol, ranges)
+            if hasattr(self.md, 'get_date_ranges'):
+                days_per_call = self.md.get_days_per_call(
+                    self.md.is_crypto(symbol))
+                date_ranges = self.md.get_date_ranges(dates, days_per_call)
+            else:
+                date_ranges = [(date, date) for date in dates]
+            for first, last in date_ranges:
+                tasks.append({
+                    'symbols': [symbol],
+                    'dates': [
+                        date for date in dates if first <= date <= last],
+                    'calls': 1
+                })
+        return tasks
+
+    def make_plan(self, gaps: dict) -> dict:
+        """
+        Plan the calls that fill the gaps.
+
+        Args:
+            gaps (dict): The index of missing days (see find_gaps).
+
+        Returns:
+            dict: The tasks (symbols, dates or start day, calls and status),
+                the gaps, the total calls and the seconds they take
+                under the provider's rate limit.
+        """
+        if self.kind == C.INTRA_DIR:
+            tasks = self.plan_intraday(gaps)
+        else:
+            tasks = self.plan_ohlc(gaps)
+        for idx, task in enumerate(tasks):
+            task.update({'id': idx, 'status': PENDING, 'attempts': 0})
+        calls = sum(task['calls'] for task in tasks)
+        limiter = self.md.get_limiter()
+        return {
+            'kind': self.kind,
+            'provider': self.md.provider,
+            'created': datetime.now(C.TZ).isoformat(),
+            'calls': calls,
+            'seconds': calls / limiter.rate if limiter else 0,
+            'gaps': gaps,
+            'tasks': tasks
+        }
+
+    def load_plan(self) -> Optional[dict]:
+        """
+        Load the saved plan, e.g. to resume it.
+
+        Returns:
+            Optional[dict]: The plan or None if there isn't one.
+        """
+        try:
+            return self.md.reader.load_json(self.get_path())
+        except Exception:
+            return None
+
+    def save_plan(self, plan: dict) -> None:
+        self.md.writer.save_json(self.get_path(), plan)
+
+    def run(self, task: dict) -> None:
+        # makes the task's calls and writes the bars they return
+        md = self.md
+        symbols = task['symbols']
+        if self.kind == C.INTRA_DIR:
+            md.save_intraday(
+                symbol=symbols[0], dates=task['dates'], incremental=False)
+        elif 'dates' in task:
+            dfs = md.get_ohlc_grouped(symbols, task['dates'])
+            for symbol, df in dfs.items():
+                md.write_ohlc(symbol, df)
+        elif len(symbols) > 1:
+            # the window grows with every day the plan waits
+            timeframe = md.get_timeframe_since(task['start'])
+            results = md.try_again(
+                func=md.get_bars, symbols=symbols, timeframe=timeframe)
+            for symbol, bars in results.items():
+                if bars:
+                    md.write_ohlc(
+                        symbol, md.standardize_bars(symbol, bars, timeframe))
+        else:
+            md.save_ohlc(
+                symbol=symbols[0],
+                timeframe=md.get_timeframe_since(task['start']),
+                incremental=False)
+
+    def execute(
+            self,
+            plan: dict,
+            max_calls: Optional[int] = None,
+            save: bool = True
+    ) -> dict:
+        """
+        Run the pending tasks of a plan, saving it as they finish.
+
+        Args:
+            plan (dict): The plan (see make_plan), updated in place.
+            max_calls (Optional[int]): Stop starting tasks once this many
+                calls were made, the rest of the tasks stay pending.
+            save (bool): Whether to save the plan (see load_plan)
+                every BACKFILL_CHECKPOINT tasks and at the end.
+
+        Returns:
+            dict: The number of tasks per status and the calls made.
+        """
+        calls = 0
+        ran = 0
+        for task in plan['tasks']:
+            if task['status'] != PENDING:
+                continue
+            if max_calls is not None and calls >= max_calls:
+                break
+            try:
+                self.run(task)
+                task['status'] = DONE
+            except Exception as e:
+                task['attempts'] += 1
+                task['error'] = str(e)
+                if task['attempts'] >= C.BACKFILL_ATTEMPTS:
+                    task['status'] = FAILED
+                print(f'Backfill failed for {task["symbols"]}.')
+                print(e)
+            calls += task['calls']
+            ran += 1
+            if save and ran % C.BACKFILL_CHECKPOINT == 0:
+                self.save_plan(plan)
+        if save and ran:
+            self.save_plan(plan)
+        report = self.summarize(plan)
+        report['calls'] = calls
+        return report
+
+    def summarize(self, plan: dict) -> dict:
+        """
+        Count the tasks of a plan by status.
+
+        Args:
+            plan (dict): The plan.
+
+        Returns:
+            dict: The number of pending, done and failed tasks
+                and the calls the pending tasks still need.
+        """
+        report = {PENDING: 0, DONE: 0, FAILED: 0, 'remaining_calls': 0}
+        for task in plan['tasks']:
+            report[task['status']] += 1
+            if task['status'] == PENDING:
+                report['remaining_calls'] += task['calls']
+        return report
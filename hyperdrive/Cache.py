@@ -0,0 +1,267 @@
+import os
+import time
+import threading
+from typing import Hashable, Optional
+from collections import OrderedDict
+import pandas as pd
+from Constants import PathFinder
+import Constants as C
+
+
+class FrameCache:
+    """
+    An in-memory LRU cache of DataFrames bounded by a byte budget.
+
+    Entries are keyed by name and tagged with a version (e.g. file mtime),
+    so a stale version is treated as a miss.
+    Frames are copied on the way in and out,
+    so callers can't corrupt cached data by mutating their frames.
+
+    Args:
+        max_bytes (int):
+            The memory budget. A budget of 0 disables the cache.
+    """
+
+    def __init__(self, max_bytes: int = 0) -> None:
+        self.max_bytes = max_bytes
+        self.frames = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: str, version: Hashable) -> Optional[pd.DataFrame]:
+        """
+        Get a copy of a cached frame.
+
+        Args:
+            key (str): The name of the frame, e.g. its path.
+            version (Hashable): The version of the frame that is current.
+
+        Returns:
+            Optional[pd.DataFrame]: A copy of the frame or None on a miss.
+        """
+        with self.lock:
+            entry = self.frames.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self.frames.move_to_end(key)
+            self.hits += 1
+            return entry[1].copy()
+
+    def peek(self, key: str) -> Optional[Hashable]:
+        """
+        Get the version of a cached frame without counting a hit or miss.
+
+        Args:
+            key (str): The name of the frame, e.g. its path.
+
+        Returns:
+            Optional[Hashable]: The version or None if it isn't cached.
+        """
+        with self.lock:
+            entry = self.frames.get(key)
+            return entry[0] if entry else None
+
+    def put(self, key: str, version: Hashable, df: pd.DataFrame) -> None:
+        """
+        Cache a copy of a frame, evicting least recently used frames
+        until it fits the budget.
+
+        Args:
+            key (str): The name of the frame, e.g. its path.
+            version (Hashable): The version of the frame.
+            df (pd.DataFrame): The frame to cache.
+        """
+        num_bytes = int(df.memory_usage(index=True, deep=True).sum())
+        if num_bytes > self.max_bytes:
+            return
+        df = df.copy()
+        with self.lock:
+            self.discard(key)
+            while self.size + num_bytes > self.max_bytes:
+                _, (_, _, evicted) = self.frames.popitem(last=False)
+                self.size -= evicted
+                self.evictions += 1
+            self.frames[key] = (version, df, num_bytes)
+            self.size += num_bytes
+
+    def discard(self, key: str) -> None:
+        # caller must hold the lock
+        entry = self.frames.pop(key, None)
+        if entry:
+            self.size -= entry[2]
+
+    def invalidate(self, key: str) -> None:
+        """
+        Drop a frame from the cache, e.g. after its file was written.
+
+        Args:
+            key (str): The name of the frame, e.g. its path.
+        """
+        with self.lock:
+            self.discard(key)
+
+    def clear(self) -> None:
+        """
+        Drop every frame and reset the counters.
+        """
+        with self.lock:
+            self.frames.clear()
+            self.size = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        """
+        Get the cache counters.
+
+        Returns:
+            dict: hits, misses, evictions, cached frames and bytes used.
+        """
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'frames': len(self.frames),
+                'bytes': self.size
+            }
+
+
+class DiskCache:
+    """
+    A size-capped LRU cache of local copies of S3 objects.
+
+    Copies live under a cache root that mirrors the bucket's keys,
+    with their sidecars under root/.meta.
+    Recency is kept in each file's access time, so it survives restarts.
+    The root is scanned once, on first use, into an index of sizes
+    in LRU order that reads and evictions keep up to date,
+    so a read never walks the cache.
+
+    Args:
+        root (str):
+            The cache dir. The default (working dir) is never evicted,
+            since it also holds the files written by FileWriter.
+        max_bytes (int):
+            The disk budget. A budget of 0 disables eviction.
+    """
+
+    def __init__(self, root: str = '', max_bytes: int = 0) -> None:
+        self.root = root
+        self.max_bytes = max_bytes if root else 0
+        self.finder = PathFinder()
+        # path -> size in LRU order, scanned on first use
+        # (picking up copies of earlier runs and other processes)
+        self.files = None
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get_path(self, key: str) -> str:
+        """
+        Get the local path of a key.
+
+        Args:
+            key (str): The S3 key, e.g. data/ohlc/polygon/AAPL.csv.
+
+        Returns:
+            str: The path of its local copy.
+        """
+        return os.path.join(self.root, key) if self.root else key
+
+    def get_meta_path(self, key: str) -> str:
+        return self.get_path(self.finder.get_meta_path(key))
+
+    def scan(self) -> None:
+        # caller must hold the lock
+        entries = []
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            if dirpath == self.root:
+                # sidecars go with their copies
+                dirnames[:] = [name for name in dirnames if name != C.META_DIR]
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                # skip downloads in progress
+                if name.endswith(('.tmp', '.tmp.plain')):
+                    continue
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_atime_ns, path, stat.st_size))
+        self.files = OrderedDict(
+            (path, size) for _, path, size in sorted(entries))
+        self.size = sum(self.files.values())
+
+    def access(self, key: str, hit: bool) -> None:
+        """
+        Record a read of a local copy, evicting least recently used copies
+        until the cache fits its budget.
+
+        Args:
+            key (str): The S3 key of the copy.
+            hit (bool): Whether the copy was served without a download.
+        """
+        path = self.get_path(key)
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            if not self.max_bytes or not os.path.exists(path):
+                return
+            if self.files is None:
+                self.scan()
+            stat = os.stat(path)
+            # bump the access time but keep the mtime freshness relies on
+            os.utime(path, ns=(time.time_ns(), stat.st_mtime_ns))
+            self.size += stat.st_size - self.files.pop(path, 0)
+            self.files[path] = stat.st_size
+            while self.size > self.max_bytes and len(self.files) > 1:
+                evicted, num_bytes = self.files.popitem(last=False)
+                self.remove(evicted)
+                self.size -= num_bytes
+                self.evictions += 1
+
+    def remove(self, path: str) -> None:
+        key = os.path.relpath(path, self.root)
+        for file in [path, self.get_meta_path(key)]:
+            if os.path.exists(file):
+                os.remove(file)
+
+    def discard(self, key: str) -> None:
+        """
+        Drop the local copy of a key, e.g. after the key was written.
+
+        Args:
+            key (str): The S3 key of the copy.
+        """
+        # in the working dir the copy is the written file itself
+        if not self.root:
+            return
+        path = self.get_path(key)
+        with self.lock:
+            if self.files is not None and path in self.files:
+                self.size -= self.files.pop(path)
+            self.remove(path)
+
+    def stats(self) -> dict:
+        """
+        Get the cache counters.
+
+        Returns:
+            dict: hits, misses, evictions, tracked files and bytes used.
+        """
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'files': len(self.files or {}),
+                'bytes': self.size
+            }
@@ -0,0 +1,288 @@
+import os
+import json
+import hashlib
+import threading
+from typing import Optional
+import pandas as pd
+from botocore.exceptions import ClientError
+from Storage import Store
+import Constants as C
+
+
+class Librarian:
+    """
+    Keeps a manifest for each dataset (e.g. data/ohlc/polygon
+    or data/intraday/polygon/AAPL) that describes every file in it:
+    size, row count, min / max time and content hash.
+
+    Answering "what do we have" from a manifest takes one (conditional) GET
+    instead of listing every object under the dataset's prefix.
+
+    Every write updates the manifest right away with a conditional PUT
+    (IfMatch on the manifest's ETag), retried on conflict,
+    so concurrent writers never drop each other's entries
+    and a killed process never leaves entries behind.
+
+    Args:
+        store (Optional[Store]):
+            The store holding the datasets, defaults to a new Store.
+
+    Attributes:
+        lock (threading.RLock):
+            Serializes the commits of every Librarian in the process.
+    """
+
+    lock: threading.RLock = threading.RLock()
+
+    def __init__(self, store: Optional[Store] = None) -> None:
+        self.store = store or Store()
+        self.enabled = C.MANIFESTS
+        # dataset -> (etag, files) of the last manifest seen
+        self.manifests = {}
+
+    @staticmethod
+    def reset_lock() -> None:
+        # a forked child can't inherit a lock held by another thread
+        Librarian.lock = threading.RLock()
+
+    def get_manifest_key(self, dataset: str) -> str:
+        """
+        Get the S3 key of a dataset's manifest.
+
+        Args:
+            dataset (str): The dataset dir, e.g. data/ohlc/polygon.
+
+        Returns:
+            str: The key of the manifest.
+        """
+        return f'{dataset}/{C.MANIFEST}'
+
+    def describe(
+            self,
+            filename: str,
+            df: Optional[pd.DataFrame] = None,
+            digest: Optional[str] = None
+    ) -> dict:
+        """
+        Describe a local file for its dataset's manifest.
+
+        Args:
+            filename (str): The path of the file.
+            df (Optional[pd.DataFrame]): The data in the file, if known.
+            digest (Optional[str]): The sha256 of the file, if known.
+
+        Returns:
+            dict: The size, rows, min / max time and sha256 of the file.
+        """
+        if not digest:
+            with open(filename, 'rb') as file:
+                digest = hashlib.sha256(file.read()).hexdigest()
+        entry = {
+            'size': os.path.getsize(filename),
+            'rows': None,
+            'min': None,
+            'max': None,
+            'hash': digest
+        }
+        if df is not None:
+            entry['rows'] = len(df)
+            time_col = next(
+                (col for col in [C.TIME, C.EX] if col in df), None)
+            if time_col and not df.empty:
+                times = pd.to_datetime(df[time_col])
+                entry['min'] = times.min().isoformat()
+                entry['max'] = times.max().isoformat()
+        return entry
+
+    def record(
+            self,
+            filename: str,
+            df: Optional[pd.DataFrame] = None,
+            digest: Optional[str] = None
+    ) -> None:
+        """
+        Add the entry of a file that was just written to its manifest.
+
+        Args:
+            filename (str): The path of the file.
+            df (Optional[pd.DataFrame]): The data in the file, if known.
+            digest (Optional[str]): The sha256 of the file, if known.
+        """
+        dataset = self.store.finder.get_dataset_dir(filename)
+        if self.enabled and dataset:
+            self.commit(
+                dataset, filename, self.describe(filename, df, digest))
+
+    def tracks(self, filename: str) -> bool:
+        """
+        Check whether a file belongs to a dataset with a manifest.
+
+        Args:
+            filename (str): The path of the file.
+
+        Returns:
+            bool: Whether the file's entries are recorded.
+        """
+        return bool(
+            self.enabled and self.store.finder.get_dataset_dir(filename))
+
+    def get_hash(self, filename: str) -> Optional[str]:
+        """
+        Get the recorded sha256 of a file without touching the file itself.
+
+        Args:
+            filename (str): The path of the file.
+
+        Returns:
+            Optional[str]: The hash or None if the file isn't recorded.
+        """
+        dataset = self.store.finder.get_dataset_dir(filename)
+        key = filename.replace('\\', '/')
+        entry = self.fetch(dataset)[1].get(key)
+        return entry['hash'] if entry else None
+
+    def forget(self, filename: str) -> None:
+        """
+        Remove the entry of a file from its manifest.
+
+        Args:
+            filename (str): The path of the file.
+        """
+        dataset = self.store.finder.get_dataset_dir(filename)
+        if self.enabled and dataset:
+            self.commit(dataset, filename, None)
+
+    def forget_all(self, filenames: list[str]) -> None:
+        """
+        Remove the entries of files from their manifests,
+        with one commit per dataset, e.g. after deleting a dir.
+
+        Args:
+            filenames (list[str]): The paths of the files.
+        """
+        datasets = {}
+        for filename in filenames:
+            dataset = self.store.finder.get_dataset_dir(filename)
+            if dataset:
+                key = filename.replace('\\', '/')
+                datasets.setdefault(dataset, {})[key] = None
+        if not self.enabled:
+            return
+        with Librarian.lock:
+            for dataset, changes in datasets.items():
+                self.apply(dataset, changes)
+
+    def fetch(self, dataset: str) -> tuple[Optional[str], dict]:
+        """
+        Get the current manifest of a dataset,
+        only transferring it if it changed since it was last seen.
+
+        Args:
+            dataset (str): The dataset dir, e.g. data/ohlc/polygon.
+
+        Returns:
+            tuple[Optional[str], dict]:
+                The ETag of the manifest (None if there is none yet)
+                and its files.
+
+        Raises:
+            ClientError: If the manifest can't be read
+                (other than it being unchanged or missing).
+        """
+        etag, files = self.manifests.get(dataset, (None, {}))
+        params = {
+            'Bucket': self.store.bucket_name,
+            'Key': self.get_manifest_key(dataset)
+        }
+        if etag:
+            params['IfNoneMatch'] = etag
+        try:
+            obj = self.store.get_client().get_object(**params)
+        except ClientError as e:
+            code = e.response['Error']['Code']
+            if code in {'304', 'NotModified'}:
+                return etag, files
+            if code in {'404', 'NoSuchKey'}:
+                self.manifests.pop(dataset, None)
+                return None, {}
+            raise
+        files = json.loads(obj['Body'].read())['files']
+        self.manifests[dataset] = (obj['ETag'], files)
+        return obj['ETag'], files
+
+    def commit(
+            self,
+            dataset: str,
+            filename: str,
+            entry: Optional[dict]
+    ) -> None:
+        """
+        Apply the entry of a file to its dataset's manifest in S3,
+        retried while the manifest keeps changing (see apply).
+
+        Args:
+            dataset (str): The dataset dir, e.g. data/ohlc/polygon.
+            filename (str): The path of the file.
+            entry (Optional[dict]): The entry or None to remove it.
+        """
+        with Librarian.lock:
+            self.apply(dataset, {filename.replace('\\', '/'): entry})
+
+    def apply(self, dataset: str, changes: dict) -> None:
+        key = self.get_manifest_key(dataset)
+        for _ in range(C.MANIFEST_RETRIES):
+            etag, files = self.fetch(dataset)
+            files = dict(files)
+            for filename, entry in changes.items():
+                if entry:
+                    files[filename] = entry
+                else:
+                    files.pop(filename, None)
+            body = json.dumps({'files': files}, sort_keys=True)
+            # only succeeds if nobody committed since the fetch
+            condition = {'IfMatch': etag} if etag else {'IfNoneMatch': '*'}
+            try:
+                obj = self.store.get_client().put_object(
+                    Bucket=self.store.bucket_name, Key=key,
+                    Body=body.encode(), ContentType='application/json',
+                    **condition
+                )
+            except ClientError as e:
+                code = e.response['Error']['Code']
+                if code in {'PreconditionFailed', 'ConditionalRequestConflict',
+                            '412', '409'}:
+                    continue
+                raise
+            self.manifests[dataset] = (obj['ETag'], files)
+            return
+        raise Exception(f'Manifest of {dataset} changed during commit.')
+
+    def get_files(self, dataset: str) -> dict:
+        """
+        Get the files of a dataset without listing its prefix.
+
+        Args:
+            dataset (str): The dataset dir, e.g. data/ohlc/polygon.
+
+        Returns:
+            dict: The manifest entry of each file keyed by path.
+        """
+        return self.fetch(dataset)[1]
+
+    def get_keys(self, prefix: str) -> list[str]:
+        """
+        Get the keys under a prefix inside a dataset from its manifest.
+
+        Args:
+            prefix (str): The prefix, e.g. data/ohlc/polygon/AAPL/.
+
+        Returns:
+            list[str]: The sorted keys.
+        """
+        dataset = self.store.finder.get_dataset_dir(prefix)
+        return sorted(
+            key for key in self.get_files(dataset) if key.startswith(prefix))
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=Librarian.reset_lock)
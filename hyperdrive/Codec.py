@@ -0,0 +1,114 @@
+import gzip
+import shutil
+from typing import BinaryIO, Optional
+import zstandard
+import Constants as C
+
+
+class Codec:
+    """
+    Streams files through zstd or gzip.
+
+    Objects are compressed on their way to S3 (tagged with ContentEncoding)
+    and decompressed on their way back, so local copies stay plain
+    and readers never see the encoding.
+
+    Args:
+        levels (Optional[dict]):
+            The compression level of each codec,
+            defaults to COMPRESSION_LEVELS.
+
+    Attributes:
+        magic (dict): The leading bytes of each encoding.
+    """
+
+    # leading bytes of each encoding
+    magic: dict = {
+        C.ZSTD: b'\x28\xb5\x2f\xfd',
+        C.GZIP: b'\x1f\x8b'
+    }
+
+    def __init__(self, levels: Optional[dict] = None) -> None:
+        self.levels = {**C.COMPRESSION_LEVELS, **(levels or {})}
+
+    def compress(self, src: BinaryIO, dst: BinaryIO, codec: str) -> None:
+        """
+        Compress a stream into another.
+
+        Args:
+            src (BinaryIO): The plain stream.
+            dst (BinaryIO): The stream to write the compressed bytes to.
+            codec (str): The encoding, zstd or gzip.
+
+        Raises:
+            ValueError: If the codec isn't supported.
+        """
+        if codec == C.ZSTD:
+            compressor = zstandard.ZstdCompressor(level=self.levels[codec])
+            compressor.copy_stream(src, dst)
+        elif codec == C.GZIP:
+            # mtime=0 keeps the output deterministic
+            with gzip.GzipFile(
+                fileobj=dst, mode='wb',
+                compresslevel=self.levels[codec], mtime=0
+            ) as file:
+                shutil.copyfileobj(src, file)
+        else:
+            raise ValueError(f'Unsupported codec: {codec}')
+
+    def decompress(self, src: BinaryIO, dst: BinaryIO, codec: str) -> None:
+        """
+        Decompress a stream into another.
+
+        Args:
+            src (BinaryIO): The compressed stream.
+            dst (BinaryIO): The stream to write the plain bytes to.
+            codec (str): The encoding, zstd or gzip.
+
+        Raises:
+            ValueError: If the codec isn't supported.
+        """
+        if codec == C.ZSTD:
+            zstandard.ZstdDecompressor().copy_stream(src, dst)
+        elif codec == C.GZIP:
+            with gzip.GzipFile(fileobj=src, mode='rb') as file:
+                shutil.copyfileobj(file, dst)
+        else:
+            raise ValueError(f'Unsupported codec: {codec}')
+
+    def open(self, src: BinaryIO, codec: str) -> BinaryIO:
+        """
+        Wrap a compressed stream in a stream of its plain bytes.
+
+        Args:
+            src (BinaryIO): The compressed stream.
+            codec (str): The encoding, zstd or gzip.
+
+        Returns:
+            BinaryIO: The plain stream.
+
+        Raises:
+            ValueError: If the codec isn't supported.
+        """
+        if codec == C.ZSTD:
+            return zstandard.ZstdDecompressor().stream_reader(src)
+        elif codec == C.GZIP:
+            return gzip.GzipFile(fileobj=src, mode='rb')
+        else:
+            raise ValueError(f'Unsupported codec: {codec}')
+
+    def detect(self, path: str) -> Optional[str]:
+        """
+        Detect the encoding of a file from its leading bytes.
+
+        Args:
+            path (str): The path of the file.
+
+        Returns:
+            Optional[str]: The encoding or None if the file is plain.
+        """
+        with open(path, 'rb') as file:
+            head = file.read(4)
+        return next(
+            (codec for codec, magic in self.magic.items()
+             if head.startswith(magic)), None)
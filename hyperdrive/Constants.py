@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 from dotenv import load_dotenv, find_dotenv
 from pytz import timezone
@@ -21,6 +22,16 @@ def get_env_bool(var_name):
                 and os.environ[var_name].lower() == 'true')
 
 
+def get_env_dict(var_name):
+    # parses "key1=value1,key2=value2"
+    pairs = [
+        pair.split('=', 1)
+        for pair in (os.environ.get(var_name) or '').split(',')
+        if '=' in pair
+    ]
+    return {key.strip(): value.strip().lower() for key, value in pairs}
+
+
 # Environment
 DEV = get_env_bool('DEV')
 CI = get_env_bool('CI')
@@ -37,11 +48,73 @@ OHLC_DIR = 'ohlc'
 SENT_DIR = 'sentiment'
 INTRA_DIR = 'intraday'
 IDX_DIR = 'indices'
+BACKFILL_DIR = 'backfill'
+COVERAGE_DIR = 'coverage'
 # providers
 POLY_DIR = 'polygon'
 ALPACA_DIR = 'alpaca'
 # models
 MODELS_DIR = 'models'
+# local sidecars (ETag / LastModified of downloaded objects)
+META_DIR = '.meta'
+# per dataset index of files
+MANIFEST = 'manifest.json'
+# object metadata holding the sha256 of the uploaded file
+DIGEST = 'sha256'
+
+# File Formats
+CSV = 'csv'
+PARQUET = 'parquet'
+# time series datasets that follow DATA_FMT
+COLUMNAR_DIRS = [DIV_DIR, SPLT_DIR, OHLC_DIR, INTRA_DIR]
+DATA_FMT = (os.environ.get('DATA_FMT') or CSV).lower()
+# OHLC updates only rewrite a yearly or monthly partition
+# until compaction folds the partitions back into the symbol file
+PARTITION_FMTS = {'year': '%Y', 'month': '%Y-%m'}
+OHLC_PARTITION = (os.environ.get('OHLC_PARTITION') or '').lower()
+# longest gap (in days) between daily bars of a stock
+# that isn't a hole in the stored data (e.g. a long weekend)
+MAX_MARKET_CLOSURE = 4
+# report the fetches the update scripts would make instead of making them
+DRY_RUN = get_env_bool('DRY_RUN')
+
+# Storage
+# 's3', 'local' (a dir of buckets, see STORAGE_ROOT) or 'memory'
+S3 = 's3'
+LOCAL = 'local'
+MEMORY = 'memory'
+STORAGE = (os.environ.get('STORAGE') or S3).lower()
+STORAGE_ROOT = os.environ.get('STORAGE_ROOT') or 'storage'
+S3_MAX_POOL_CONNECTIONS = get_env_int('S3_MAX_POOL_CONNECTIONS', 50)
+# bulk transfers: files in flight x parts in flight per file
+# should stay below the connection pool size
+S3_TRANSFER_WORKERS = get_env_int('S3_TRANSFER_WORKERS', 12)
+S3_MULTIPART_CONCURRENCY = get_env_int('S3_MULTIPART_CONCURRENCY', 4)
+S3_MULTIPART_THRESHOLD = 8 * 1024 ** 2
+# 'mtime' trusts local copies for a day,
+# 'etag' revalidates them with a conditional GET on every read
+MTIME = 'mtime'
+ETAG = 'etag'
+FRESHNESS = (os.environ.get('FRESHNESS') or MTIME).lower()
+# memory budget for parsed DataFrames shared in process (0 disables)
+FRAME_CACHE_BYTES = get_env_int('FRAME_CACHE_BYTES', 0)
+# root for local copies read by FileReader (defaults to the working dir)
+# and its disk budget, only enforced in a dedicated root (0 disables)
+CACHE_DIR = os.environ.get('CACHE_DIR') or ''
+DISK_CACHE_BYTES = get_env_int('DISK_CACHE_BYTES', 0)
+# read-only loads parse objects straight from S3 without a local copy
+STREAM_READS = get_env_bool('STREAM_READS')
+# keep a manifest per dataset (see Catalog.Librarian)
+MANIFESTS = get_env_bool('MANIFESTS')
+MANIFEST_RETRIES = 5
+# objects are compressed in S3 (ContentEncoding) and stored plain locally
+ZSTD = 'zstd'
+GZIP = 'gzip'
+CODECS = [ZSTD, GZIP]
+COMPRESSION_LEVELS = {ZSTD: 3, GZIP: 6}
+# codec per path prefix, the longest matching prefix wins ('*' matches all)
+# e.g. COMPRESSION="*=gzip,data/intraday=zstd,data/api=none"
+COMPRESSION = get_env_dict('COMPRESSION')
 
 folders = {
     'polygon': POLY_DIR,
@@ -73,6 +146,11 @@ VOL = 'Vol'
 AVG = 'Avg'
 TRADES = 'Trades'
 
+# Column Types (enforced by columnar formats)
+DATE_COLS = [TIME, EX, PAY, DEC]
+INT_COLS = [VOL, TRADES]
+FLOAT_COLS = [OPEN, HIGH, LOW, CLOSE, AVG, DIV, RATIO]
+
 # Time
 TZ = timezone('US/Eastern')
 UTC = timezone('UTC')
@@ -130,12 +208,82 @@ DEFAULT_DELAY = 2
 POLY_FREE_DELAY = 13
 POLY_MAX_LIMIT = 1000
 POLY_MAX_AGGS_LIMIT = 50000
+# stocks missing at most this many market days of ohlc are updated
+# from grouped daily bars (a call per day for every stock)
+POLY_GROUPED_MAX_DAYS = get_env_int('POLY_GROUPED_MAX_DAYS', 10)
+# most minutes with bars in a day
+# (stocks trade from 4:00 to 20:00 with extended hours)
+STOCK_MINUTES = 16 * 60
+CRYPTO_MINUTES = 24 * 60
+# regular trading hours of stocks (in TZ)
+MARKET_OPEN = '09:30'
+MARKET_CLOSE = '16:00'
 FEW = 3
 FEW_DAYS = str(FEW) + 'd'
 SCRIPT_FAILURE_THRESHOLD = 0.95
 
 ALPACA_FREE_DELAY = 0.5
 
+# HTTP requests to providers (see Http)
+# (connect, read) timeouts in seconds
+HTTP_TIMEOUT = (
+    get_env_int('HTTP_CONNECT_TIMEOUT', 5),
+    get_env_int('HTTP_READ_TIMEOUT', 30)
+)
+HTTP_RETRIES = get_env_int('HTTP_RETRIES', 5)
+# seconds before the 1st retry, doubled for each one after
+HTTP_BACKOFF = 0.5
+HTTP_BACKOFF_MAX = 60
+# hosts with kept alive connections and connections per host
+HTTP_POOL_HOSTS = 10
+HTTP_POOL_SIZE = get_env_int('HTTP_POOL_SIZE', 10)
+# record provider responses and serve them while they're fresh,
+# or only replay recorded responses (offline), see HttpCache
+RECORD = 'record'
+REPLAY = 'replay'
+HTTP_CACHE = (os.environ.get('HTTP_CACHE') or '').lower()
+HTTP_CACHE_DIR = os.environ.get('HTTP_CACHE_DIR') or os.path.join(
+    tempfile.gettempdir(), 'hyperdrive', 'http')
+# seconds the responses of each class of endpoint stay fresh,
+# e.g. "bars=60,default=0" (bars of past days never expire)
+HTTP_CACHE_TTLS = {
+    'bars': 15 * 60,
+    'reference': 24 * 60 * 60,
+    'macro': 24 * 60 * 60,
+    'default': 0
+} | {
+    name: float(ttl)
+    for name, ttl in get_env_dict('HTTP_CACHE_TTLS').items()
+}
+
+# Rate limits (calls per minute) shared by every thread and process
+# on the machine (see Throttle)
+FREE_RATE_LIMITS = {
+    POLY_DIR: 60 / POLY_FREE_DELAY,
+    ALPACA_DIR: 60 / ALPACA_FREE_DELAY,
+    'glassnode': 24
+}
+# limits of paid tiers, e.g. "polygon=300,alpaca=10000"
+# (providers that aren't free and aren't listed aren't limited)
+RATE_LIMITS = {
+    provider: float(limit)
+    for provider, limit in get_env_dict('RATE_LIMITS').items()
+}
+# calls that can be made at once before waiting
+RATE_LIMIT_BURST = get_env_int('RATE_LIMIT_BURST', 1)
+RATE_LIMIT_DIR = os.environ.get('RATE_LIMIT_DIR') or os.path.join(
+    tempfile.gettempdir(), 'hyperdrive')
+# cache intraday bars resampled from 1 minute bars (see get_intraday)
+RESAMPLE_CACHE = get_env_bool('RESAMPLE_CACHE')
+RESAMPLE_DIR = os.environ.get('RESAMPLE_DIR') or os.path.join(
+    tempfile.gettempdir(), 'hyperdrive', 'bars')
+# backfill plans are saved every BACKFILL_CHECKPOINT tasks
+# and a task is given up after BACKFILL_ATTEMPTS failures
+BACKFILL_CHECKPOINT = get_env_int('BACKFILL_CHECKPOINT', 10)
+BACKFILL_ATTEMPTS = 3
+# symbols per multi symbol bars request (see get_ohlc_many)
+ALPACA_BATCH_SIZE = get_env_int('ALPACA_BATCH_SIZE', 100)
+
 # Exchanges
 BINANCE = 'BINANCE'
 KRAKEN = 'KRAKEN'
@@ -150,9 +298,57 @@ KRAKEN_TEST_SPEND = 0.005
 
 
 class PathFinder:
+    def __init__(self, fmt=DATA_FMT, compression=None):
+        # file extension for time series datasets
+        self.fmt = fmt
+        # codec per path prefix for objects in S3
+        self.compression = COMPRESSION if compression is None else compression
+
     def make_path(self, path):
         Path(path).parent.mkdir(parents=True, exist_ok=True)
 
+    def get_format(self, path):
+        # given a path, return its file format
+        return Path(path).suffix[1:].lower()
+
+    def get_codec(self, path):
+        # given a path, return the codec of its object in S3 (if any)
+        # parquet is already compressed internally
+        if self.get_format(path) == PARQUET:
+            return None
+        key = path.replace('\\', '/')
+        prefixes = [
+            prefix for prefix in self.compression
+            if prefix == '*' or key == prefix or
+            key.startswith(f'{prefix.rstrip("/")}/')
+        ]
+        if not prefixes:
+            return None
+        codec = self.compression[
+            max(prefixes, key=lambda prefix: (prefix != '*', len(prefix)))]
+        return codec if codec in CODECS else None
+
+    def get_dataset_dir(self, path):
+        # given a path in a time series dataset, return the dataset's dir
+        # e.g. data/ohlc/polygon or data/intraday/polygon/AAPL
+        parts = Path(path).parts
+        if (
+            len(parts) < 3 or parts[0] != DATA_DIR or
+            parts[1] not in COLUMNAR_DIRS or parts[-1] == MANIFEST
+        ):
+            return None
+        depth = 4 if parts[1] == INTRA_DIR else 3
+        if len(parts) < depth:
+            return None
+        return '/'.join(parts[:depth])
+
+    def get_meta_path(self, path):
+        # given a path, return the path to its S3 metadata sidecar
+        return os.path.join(
+            META_DIR,
+            f'{path}.json'
+        )
+
     def get_symbols_path(self):
         # return the path for the symbols reference csv
         return os.path.join(
@@ -167,7 +363,7 @@ class PathFinder:
             DATA_DIR,
             DIV_DIR,
             folders[provider],
-            f'{symbol.upper()}.csv'
+            f'{symbol.upper()}.{self.fmt}'
         )
 
     def get_splits_path(self, symbol, provider=POLY_DIR):
@@ -177,7 +373,7 @@ class PathFinder:
             DATA_DIR,
             SPLT_DIR,
             folders[provider],
-            f'{symbol.upper()}.csv'
+            f'{symbol.upper()}.{self.fmt}'
         )
 
     def get_ohlc_path(self, symbol, provider=POLY_DIR):
@@ -187,7 +383,34 @@ class PathFinder:
             DATA_DIR,
             OHLC_DIR,
             folders[provider],
-            f'{symbol.upper()}.csv'
+            f'{symbol.upper()}.{self.fmt}'
+        )
+
+    def get_ohlc_partition_dir(self, symbol, provider=POLY_DIR):
+        # given a symbol
+        # return the dir of its uncompacted ohlc partitions
+        return os.path.join(
+            DATA_DIR,
+            OHLC_DIR,
+            folders[provider],
+            symbol.upper()
+        )
+
+    def get_ohlc_partition_path(self, symbol, partition, provider=POLY_DIR):
+        # given a symbol and partition (e.g. 2020 or 2020-01)
+        # return the path to that slice of its ohlc data
+        return os.path.join(
+            self.get_ohlc_partition_dir(symbol, provider),
+            f'{partition}.{self.fmt}'
+        )
+
+    def get_intraday_dir(self, symbol, provider=POLY_DIR):
+        # given a symbol, return the dir of its intraday files
+        return os.path.join(
+            DATA_DIR,
+            INTRA_DIR,
+            folders[provider],
+            symbol.upper()
         )
 
     def get_intraday_path(self, symbol, date, provider=POLY_DIR):
@@ -198,7 +421,7 @@ class PathFinder:
             INTRA_DIR,
             folders[provider],
             symbol.upper(),
-            f'{date}.csv'
+            f'{date}.{self.fmt}'
         )
 
     def get_unemployment_path(self):
@@ -253,6 +476,26 @@ class PathFinder:
             f'{endpoint}.json',
         )
 
+    def get_backfill_path(self, kind, provider=POLY_DIR):
+        # given a kind of bars (ohlc or intraday),
+        # return the path to the provider's backfill plan
+        return os.path.join(
+            DATA_DIR,
+            BACKFILL_DIR,
+            folders[provider],
+            f'{kind}.json'
+        )
+
+    def get_coverage_path(self, symbol, provider=POLY_DIR):
+        # given a symbol
+        # return the path to the start of its fetched ohlc
+        return os.path.join(
+            DATA_DIR,
+            COVERAGE_DIR,
+            folders[provider],
+            f'{symbol.upper()}.json'
+        )
+
     def get_ndx_path(self):
         return os.path.join(
             DATA_DIR,
@@ -268,8 +511,10 @@ class PathFinder:
                 curr_path = os.path.join(root, file)[
                     len(path) + 1 if truncate else 0:]
                 to_skip = ['__pycache__/', '.pytest',
-                           '.git/', '.ipynb', '.env']
+                           '.git/', '.ipynb', '.env', f'{META_DIR}/']
                 keep = [skip not in curr_path for skip in to_skip]
+                # unfinished atomic writes
+                keep.append(not curr_path.endswith('.tmp'))
                 # remove caches but keep workflows
                 if all(keep) or '.github' in curr_path:
                     paths.append(curr_path)
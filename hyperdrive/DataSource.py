@@ -1,13 +1,16 @@
 import os
 import json
-import requests
-from time import sleep, time
+from time import sleep
 from bs4 import BeautifulSoup
 import pandas as pd
-from random import random
+from pandas.api.types import is_numeric_dtype
 from polygon import RESTClient, exceptions
 from dotenv import load_dotenv, find_dotenv
 from FileOps import FileReader, FileWriter
+from Http import HttpClient
+from HttpCache import CachedPool
+from Throttle import TokenBucket
+from Resample import BarResampler
 from Calculus import Calculator
 from TimeMachine import TimeTraveller
 from Constants import PathFinder
@@ -22,6 +25,18 @@ from selenium.webdriver.common.keys import Keys
 
 
 class MarketData:
+    # (provider, calls per minute) -> TokenBucket
+    limiters = {}
+    # provider (raw) ohlc columns -> standard columns
+    ohlc_mapping = dict(
+        zip(
+            ['date', 'open', 'high', 'low', 'close',
+             'volume', 'average', 'trades'],
+            [C.TIME, C.OPEN, C.HIGH, C.LOW, C.CLOSE,
+             C.VOL, C.AVG, C.TRADES]
+        )
+    )
+
     def __init__(self):
         load_dotenv(find_dotenv('config.env'))
         self.writer = FileWriter()
@@ -30,6 +45,10 @@ class MarketData:
         self.traveller = TimeTraveller()
         self.calculator = Calculator()
         self.provider = 'polygon'
+        self.partition = C.OHLC_PARTITION
+        self.free = True
+        self.http = HttpClient(cached=True)
+        self.resampler = BarResampler()
 
     def get_indexer(self, s1, s2):
         return list(s1.intersection(s2))
@@ -60,7 +79,8 @@ class MarketData:
     def get_dividends(self, symbol, timeframe='max'):
         # given a symbol, return a cached dataframe
         df = self.reader.load_csv(
-            self.finder.get_dividends_path(symbol, self.provider))
+            self.finder.get_dividends_path(symbol, self.provider),
+            read_only=True)
         filtered = self.reader.data_in_timeframe(df, C.EX, timeframe)
         return filtered
 
@@ -72,16 +92,40 @@ class MarketData:
         time_col, val_cols = columns[0], columns[1:]
 
         if time_col in df and set(val_cols).issubset(df.columns):
-            df = self.reader.update_df(
-                filename, df, time_col).sort_values(by=[time_col])
+            # without a filename, only the new rows are standardized
+            if filename:
+                df = self.reader.update_df(filename, df, time_col)
+            df = df.sort_values(by=[time_col])
             # since time col is pd.datetime,
             # consider converting to YYYY-MM-DD str format
             for val_col in val_cols:
-                df[val_col] = df[val_col].apply(
-                    lambda val: float(val) if val else default)
+                df[val_col] = self.to_floats(df[val_col], default)
 
         return df
 
+    def to_floats(self, vals, default):
+        # float(val) if val else default for each val, vectorized
+        if vals.empty:
+            return vals
+        if not is_numeric_dtype(vals):
+            # e.g. strings, which are rare enough to convert one by one
+            return vals.apply(lambda val: float(val) if val else default)
+        # nan is truthy, so it stays nan
+        falsy = vals == 0
+        if falsy.all():
+            # only defaults, so the column takes the default's type
+            return pd.Series(default, index=vals.index, name=vals.name)
+        return vals.astype('float64').mask(falsy, default)
+
+    def to_ints(self, vals):
+        # 0 if pd.isnull(val) else int(val) for each val, vectorized
+        if vals.empty:
+            return vals
+        if not is_numeric_dtype(vals):
+            return vals.apply(lambda val: 0 if pd.isnull(val) else int(val))
+        # truncates toward 0 like int
+        return vals.fillna(0).astype('int64')
+
     def standardize_dividends(self, symbol, df):
         full_mapping = dict(
             zip(
@@ -113,7 +157,8 @@ class MarketData:
     def get_splits(self, symbol, timeframe='max'):
         # given a symbol, return a cached dataframe
         df = self.reader.load_csv(
-            self.finder.get_splits_path(symbol, self.provider))
+            self.finder.get_splits_path(symbol, self.provider),
+            read_only=True)
         filtered = self.reader.data_in_timeframe(df, C.EX, timeframe)
         return filtered
 
@@ -146,20 +191,13 @@ class MarketData:
             return filename
 
     def standardize_ohlc(self, symbol, df, filename=None):
-        full_mapping = dict(
-            zip(
-                ['date', 'open', 'high', 'low', 'close',
-                 'volume', 'average', 'trades'],
-                [C.TIME, C.OPEN, C.HIGH, C.LOW, C.CLOSE,
-                 C.VOL, C.AVG, C.TRADES]
-            )
-        )
-
-        filename = filename or self.finder.get_ohlc_path(symbol, self.provider)
+        # partitions only merge the new rows (see write_ohlc_partitions)
+        if not filename and not self.partition:
+            filename = self.finder.get_ohlc_path(symbol, self.provider)
 
         df = self.standardize(
             df,
-            full_mapping,
+            self.ohlc_mapping,
             filename,
             [C.TIME, C.OPEN, C.HIGH, C.LOW, C.CLOSE],
             0
@@ -167,41 +205,267 @@ class MarketData:
 
         for col in [C.VOL, C.TRADES]:
             if col in df:
-                df[col] = df[col].apply(
-                    lambda val: 0 if pd.isnull(val) else int(val))
+                df[col] = self.to_ints(df[col])
 
         return df
 
+    def get_ohlc_partitions(self, symbol):
+        # given a symbol, return the keys of its uncompacted partitions
+        partition_dir = self.finder.get_ohlc_partition_dir(
+            symbol, self.provider).replace('\\', '/')
+        if self.writer.librarian.enabled:
+            return self.writer.librarian.get_keys(f'{partition_dir}/')
+        return sorted(self.reader.store.get_keys(f'{partition_dir}/'))
+
     def get_ohlc(self, symbol, timeframe='max'):
         df = self.reader.load_csv(
-            self.finder.get_ohlc_path(symbol, self.provider))
+            self.finder.get_ohlc_path(symbol, self.provider),
+            read_only=True)
+        if self.partition:
+            for key in self.get_ohlc_partitions(symbol):
+                df = self.reader.merge_df(
+                    df, self.reader.load_csv(key, read_only=True), C.TIME)
         filtered = self.reader.data_in_timeframe(df, C.TIME, timeframe)
         return filtered
 
-    def save_ohlc(self, **kwargs):
+    def save_ohlc_partitions(self, **kwargs):
         symbol = kwargs['symbol']
+        return self.write_ohlc_partitions(symbol, self.get_ohlc(**kwargs))
+
+    def write_ohlc_partitions(self, symbol, df):
+        # only rewrite the partitions that received new rows
+        if df.empty:
+            return []
+        fmt = C.PARTITION_FMTS[self.partition]
+        partitions = pd.to_datetime(df[C.TIME]).dt.strftime(fmt)
+        filenames = []
+        for partition, rows in df.groupby(partitions):
+            filename = self.finder.get_ohlc_partition_path(
+                symbol, partition, self.provider)
+            if os.path.exists(filename):
+                os.remove(filename)
+            rows = self.reader.update_df(
+                filename, rows.copy(), C.TIME, C.DATE_FMT)
+            self.writer.update_csv(filename, rows)
+            if os.path.exists(filename):
+                filenames.append(filename)
+        return filenames
+
+    def compact_ohlc(self, symbol):
+        # fold a symbol's partitions back into its ohlc file
+        keys = self.get_ohlc_partitions(symbol)
+        if not keys:
+            return
+        parts = [self.reader.load_csv(key) for key in keys]
+        if any(part.empty for part in parts):
+            # don't drop partitions that couldn't be read
+            return
         filename = self.finder.get_ohlc_path(symbol, self.provider)
         if os.path.exists(filename):
             os.remove(filename)
+        df = pd.DataFrame()
+        for part in parts:
+            df = self.reader.merge_df(df, part, C.TIME)
         df = self.reader.update_df(
-            filename, self.get_ohlc(**kwargs), C.TIME, C.DATE_FMT)
+            filename, df, C.TIME, C.DATE_FMT).sort_values(by=[C.TIME])
+        # only drop the partitions once the compacted file is uploaded
+        self.writer.save_csv(filename, df)
+        self.writer.remove_files(keys)
+        return filename
+
+    def is_crypto(self, symbol):
+        return symbol in C.POLY_CRYPTO_SYMBOLS + C.ALPC_CRYPTO_SYMBOLS
+
+    def get_timeframe_since(self, start):
+        # the timeframe (see convert_dates) whose window starts at start
+        _, end = self.traveller.convert_dates('1d', None)
+        days = (end.date() - pd.Timestamp(start).date()).days + 1
+        return f'{max(days, 1)}d'
+
+    def plan_ohlc(self, symbol, timeframe='max', incremental=True):
+        # the window of ohlc to fetch given what's already stored:
+        # from the first hole (or the last stored day) to yesterday,
+        # the whole window if the stored data starts after it does
+        # (unless it was already fetched, see cover_ohlc),
+        # or None if the stored data is current
+        # (the whole timeframe if not incremental)
+        start, end = self.traveller.convert_dates(timeframe, None)
+        start = start.date()
+        end = end.date()
+        plan = {
+            'symbol': symbol,
+            'start': start.strftime(C.DATE_FMT),
+            'end': end.strftime(C.DATE_FMT),
+            'timeframe': timeframe,
+            # whether it fetches the whole window
+            'covers': True
+        }
+        if not incremental:
+            return plan
+        # the stored data, not the provider's
+        stored = MarketData.get_ohlc(self, symbol)
+        if C.TIME not in stored or stored.empty:
+            return plan
+        days = pd.to_datetime(
+            stored[C.TIME]).dt.normalize().drop_duplicates().sort_values()
+        crypto = self.is_crypto(symbol)
+        first = days.iloc[0]
+        if (
+            first.date() > start and
+            self.traveller.get_market_dates(
+                start, first - pd.Timedelta(days=1), crypto) and
+            not self.is_covered(symbol, plan['start'])
+        ):
+            # market days before the first stored day are missing too,
+            # once fetched, the first stored day is the listing date
+            return plan
+        days = days[days.dt.date >= start].reset_index(drop=True)
+        if days.empty:
+            return plan
+        max_gap = 1 if crypto else C.MAX_MARKET_CLOSURE
+        if not crypto:
+            # there are no bars on weekends
+            end = pd.offsets.BDay().rollback(pd.Timestamp(end)).date()
+        holes = days.diff().dt.days > max_gap
+        if holes.any():
+            # refetch from the day before the first hole
+            since = days[holes.idxmax() - 1]
+        elif days.iloc[-1].date() >= end:
+            return None
+        else:
+            # the last stored bar may have been partial
+            since = days.iloc[-1]
+        plan['start'] = since.strftime(C.DATE_FMT)
+        plan['timeframe'] = self.get_timeframe_since(since)
+        plan['covers'] = False
+        return plan
+
+    def get_coverage(self, symbol):
+        # the earliest day the symbol's ohlc was fetched from (if any),
+        # the provider had no bars before its first stored day since
+        try:
+            return self.reader.load_json(
+                self.finder.get_coverage_path(symbol, self.provider))['start']
+        except Exception:
+            return None
+
+    def is_covered(self, symbol, start):
+        coverage = self.get_coverage(symbol)
+        return coverage is not None and coverage <= start
+
+    def cover_ohlc(self, plan):
+        # records that a plan's whole window was fetched and stored
+        symbol = plan['symbol']
+        if plan.get('covers') and not self.is_covered(symbol, plan['start']):
+            self.writer.save_json(
+                self.finder.get_coverage_path(symbol, self.provider),
+                {'start': plan['start']})
+
+    def save_ohlc(self, **kwargs):
+        # only fetches what's missing from the stored data (see plan_ohlc)
+        # unless incremental=False, dry_run=True returns the plan instead
+        symbol = kwargs['symbol']
+        incremental = kwargs.pop('incremental', True)
+        dry_run = kwargs.pop('dry_run', False)
+        plan = self.plan_ohlc(
+            symbol, kwargs.get('timeframe', 'max'), incremental)
+        if dry_run or not plan:
+            return plan
+        kwargs['timeframe'] = plan['timeframe']
+        filename = self.write_ohlc(symbol, self.get_ohlc(**kwargs))
+        self.cover_ohlc(plan)
+        return filename
+
+    def write_ohlc(self, symbol, df):
+        # merges fetched ohlc into the symbol's file (or partitions)
+        if self.partition:
+            return self.write_ohlc_partitions(symbol, df)
+        filename = self.finder.get_ohlc_path(symbol, self.provider)
+        if os.path.exists(filename):
+            os.remove(filename)
+        df = self.reader.update_df(filename, df, C.TIME, C.DATE_FMT)
         self.writer.update_csv(filename, df)
         if os.path.exists(filename):
             return filename
 
-    def get_intraday(self, symbol, min=1, timeframe='max', extra_hrs=False):
-        # implement way to transform 1 min dataset to 5 min data
-        #  or 30 or 60 should be flexible soln
-        # implement way to only get market hours
-        # given a symbol, return a cached dataframe
-        dates = self.traveller.dates_in_range(timeframe)
+    def get_intraday(
+            self, symbol, min=1, timeframe='max', extra_hrs=True,
+            dates=None, cache=None):
+        # given a symbol, return a cached dataframe per day
+        # (of the given dates instead of all dates in the timeframe)
+        # of min minute bars resampled from the stored 1 minute bars,
+        # extra_hrs=False keeps only market hours (crypto never closes)
+        # cache=True keeps the resampled bars (see RESAMPLE_CACHE)
+        if dates is None:
+            dates = self.traveller.dates_in_range(timeframe)
+        cache = C.RESAMPLE_CACHE if cache is None else cache
+        crypto = self.is_crypto(symbol)
         for date in dates:
-            df = self.reader.load_csv(
-                self.finder.get_intraday_path(symbol, date, self.provider))
-            yield self.reader.data_in_timeframe(df, C.TIME, timeframe)
+            filename = self.finder.get_intraday_path(
+                symbol, date, self.provider)
+            df = self.reader.data_in_timeframe(
+                self.reader.load_csv(filename, read_only=True),
+                C.TIME, timeframe)
+            yield self.resample_intraday(
+                filename, df, min, extra_hrs or crypto, crypto, cache)
+
+    def resample_intraday(
+            self, filename, df, min, extra_hrs, crypto, cache):
+        # stocks' bars line up with the open, crypto's with midnight
+        if C.TIME not in df or (min == 1 and extra_hrs):
+            return df
+        # filtering alone is cheaper than a cache lookup
+        cache = cache and min > 1
+        if cache:
+            version = self.resampler.get_version(df)
+            path = self.resampler.get_path(filename, min, extra_hrs, version)
+            bars = self.resampler.load(path)
+            if bars is not None:
+                return bars
+        bars = df if extra_hrs else self.resampler.filter_hours(df)
+        anchor = '00:00' if crypto else C.MARKET_OPEN
+        bars = self.resampler.resample(bars, min, anchor)
+        if cache:
+            self.resampler.save(path, bars)
+        return bars
+
+    def get_intraday_dates(self, symbol):
+        # given a symbol, return the dates of its stored intraday files
+        intraday_dir = self.finder.get_intraday_dir(
+            symbol, self.provider).replace('\\', '/')
+        if self.writer.librarian.enabled:
+            keys = self.writer.librarian.get_keys(f'{intraday_dir}/')
+        else:
+            keys = self.reader.store.get_keys(f'{intraday_dir}/')
+        return sorted(
+            os.path.splitext(os.path.basename(key))[0] for key in keys)
+
+    def plan_intraday(self, symbol, timeframe='max'):
+        # the dates in the timeframe without a stored intraday file
+        # (stocks don't trade on weekends and holidays)
+        stored = set(self.get_intraday_dates(symbol))
+        start, end = self.traveller.convert_dates(timeframe)
+        return [
+            date for date in self.traveller.get_market_dates(
+                start, end, self.is_crypto(symbol))
+            if date not in stored
+        ]
 
     def save_intraday(self, **kwargs):
+        # only fetches the dates missing from the stored data
+        # (see plan_intraday) unless incremental=False,
+        # dry_run=True returns the dates instead
         symbol = kwargs['symbol']
+        incremental = kwargs.pop('incremental', True)
+        dry_run = kwargs.pop('dry_run', False)
+        timeframe = kwargs.get('timeframe', 'max')
+        if incremental:
+            kwargs['dates'] = self.plan_intraday(symbol, timeframe)
+        if dry_run:
+            return kwargs.get(
+                'dates', self.traveller.dates_in_range(timeframe))
+        if incremental and not kwargs['dates']:
+            return []
         dfs = self.get_intraday(**kwargs)
         filenames = []
 
@@ -397,7 +661,7 @@ class MarketData:
             # alternatives:
             # https://www.nasdaq.com/solutions/nasdaq-100/companies
             # https://www.cnbc.com/nasdaq-100/
-            res = requests.get(url)
+            res = self.http.get(url)
             soup = BeautifulSoup(res.text, 'html.parser')
             html = soup.select("table#constituents")[0]
             df = pd.read_html(str(html))[0]
@@ -435,15 +699,33 @@ class MarketData:
         if os.path.exists(filename):
             return filename
 
-    def log_api_call_time(self):
-        self.last_api_call_time = time()
-
-    def obey_free_limit(self, free_delay):
-        if self.free and hasattr(self, 'last_api_call_time'):
-            time_since_last_call = time() - self.last_api_call_time
-            delay = free_delay - time_since_last_call
-            if delay > 0:
-                sleep(delay)
+    def get_limiter(self):
+        # the bucket shared by every instance, thread and process
+        # calling this provider (None if it isn't limited)
+        limit = C.RATE_LIMITS.get(self.provider) or (
+            C.FREE_RATE_LIMITS.get(self.provider) if self.free else None)
+        if not limit:
+            return None
+        key = (self.provider, limit)
+        if key not in MarketData.limiters:
+            MarketData.limiters[key] = TokenBucket(
+                self.provider, limit / 60, C.RATE_LIMIT_BURST)
+        return MarketData.limiters[key]
+
+    def throttle(self):
+        # waits (only) if the provider's rate limit is reached
+        # and returns the seconds waited
+        limiter = self.get_limiter()
+        if limiter and self.http.cache:
+            # cached responses don't count toward the limit,
+            # so the next request that goes out waits instead
+            self.http.defer(limiter)
+            return 0
+        return limiter.acquire() if limiter else 0
+
+    def get_rate_stats(self):
+        limiter = self.get_limiter()
+        return limiter.stats() if limiter else {}
 
 
 class Indices(MarketData):
@@ -483,72 +765,156 @@ class AlpacaData(MarketData):
     # def get_splits(self, **kwargs):
     #     pass
 
+    def get_bars(self, symbols, timeframe='max'):
+        # pages through one bars request for many symbols
+        # (all stocks or all crypto) and demultiplexes the bars by symbol
+        is_crypto = symbols[0] in C.ALPC_CRYPTO_SYMBOLS
+        version = 'v1beta3' if is_crypto else 'v2'
+        page_token = None
+        start, _ = self.traveller.convert_dates(timeframe)
+        parts = [
+            self.base,
+            version,
+            'crypto/us' if is_crypto else 'stocks',
+            'bars',
+        ]
+        url = '/'.join(parts)
+        pre_params = {
+            'symbols': ','.join(symbols),
+            'timeframe': '1D',
+            'start': start,
+            # end should be > 15 min before current UTC time in this format
+            # 2025-01-01T00:00:00Z
+            'limit': 10000,
+        } | ({} if is_crypto else {'adjustment': 'all'})
+        headers = {
+            'APCA-API-KEY-ID': self.token,
+            'APCA-API-SECRET-KEY': self.secret
+        }
+        results = {symbol: [] for symbol in symbols}
+        while True:
+            self.throttle()
+            post_params = {
+                'page_token': page_token} if page_token else {}
+            params = pre_params | post_params
+            response = self.http.get(url, params, headers=headers)
+            if not response.ok:
+                raise Exception(
+                    'Invalid response from Alpaca for OHLC',
+                    response.status_code,
+                    response.text
+                )
+            data = response.json()
+            for symbol, bars in (data.get('bars') or {}).items():
+                if symbol in results:
+                    results[symbol] += bars
+            if data.get('next_page_token'):
+                page_token = data['next_page_token']
+            else:
+                break
+        return results
+
+    def standardize_bars(self, symbol, bars, timeframe='max'):
+        df = pd.DataFrame(bars)
+        columns = {
+            't': 'date',
+            'o': 'open',
+            'h': 'high',
+            'l': 'low',
+            'c': 'close',
+            'v': 'volume',
+            'vw': 'average',
+            'n': 'trades'
+        }
+        df = df.rename(columns=columns)
+        df['date'] = pd.to_datetime(df['date']).dt.tz_convert(
+            C.TZ).dt.tz_localize(None)
+        df = self.standardize_ohlc(symbol, df)
+        return self.reader.data_in_timeframe(df, C.TIME, timeframe)
+
     def get_ohlc(self, **kwargs):
         def _get_ohlc(symbol, timeframe='max'):
-            is_crypto = symbol in C.ALPC_CRYPTO_SYMBOLS
-            version = 'v1beta3' if is_crypto else 'v2'
-            page_token = None
-            start, _ = self.traveller.convert_dates(timeframe)
-            parts = [
-                self.base,
-                version,
-                'crypto/us' if is_crypto else 'stocks',
-                'bars',
-            ]
-            url = '/'.join(parts)
-            pre_params = {
-                'symbols': symbol,
-                'timeframe': '1D',
-                'start': start,
-                # end should be > 15 min before current UTC time in this format
-                # 2025-01-01T00:00:00Z
-                'limit': 10000,
-            } | ({} if is_crypto else {'adjustment': 'all'})
-            headers = {
-                'APCA-API-KEY-ID': self.token,
-                'APCA-API-SECRET-KEY': self.secret
-            }
-            results = []
-            while True:
-                self.obey_free_limit(C.ALPACA_FREE_DELAY)
-                try:
-                    post_params = {
-                        'page_token': page_token} if page_token else {}
-                    params = pre_params | post_params
-                    response = requests.get(url, params, headers=headers)
-                    if not response.ok:
-                        raise Exception(
-                            'Invalid response from Alpaca for OHLC',
-                            response.status_code,
-                            response.text
-                        )
-                    data = response.json()
-                    if data.get('bars') and data['bars'].get(symbol):
-                        results += data['bars'][symbol]
-                finally:
-                    self.log_api_call_time()
-                if data.get('next_page_token'):
-                    page_token = data['next_page_token']
-                else:
-                    break
-            df = pd.DataFrame(results)
-            columns = {
-                't': 'date',
-                'o': 'open',
-                'h': 'high',
-                'l': 'low',
-                'c': 'close',
-                'v': 'volume',
-                'vw': 'average',
-                'n': 'trades'
-            }
-            df = df.rename(columns=columns)
-            df['date'] = pd.to_datetime(df['date']).dt.tz_convert(
-                C.TZ).dt.tz_localize(None)
-            df = self.standardize_ohlc(symbol, df)
-            return self.reader.data_in_timeframe(df, C.TIME, timeframe)
+            bars = self.get_bars([symbol], timeframe)[symbol]
+            return self.standardize_bars(symbol, bars, timeframe)
         return self.try_again(func=_get_ohlc, **kwargs)
 
+    def get_ohlc_many(
+            self,
+            symbols,
+            timeframe='max',
+            retries=C.DEFAULT_RETRIES,
+            delay=C.DEFAULT_DELAY
+    ):
+        # given many symbols, return a df per symbol that was fetched
+        # (empty if it has no bars), symbols of failed requests are left out
+        # requesting up to ALPACA_BATCH_SIZE symbols at a time
+        stocks = [
+            symbol for symbol in symbols
+            if symbol not in C.ALPC_CRYPTO_SYMBOLS]
+        crypto = [
+            symbol for symbol in symbols if symbol in C.ALPC_CRYPTO_SYMBOLS]
+        size = C.ALPACA_BATCH_SIZE
+        batches = [
+            group[idx:idx + size]
+            for group in [stocks, crypto]
+            for idx in range(0, len(group), size)
+        ]
+        dfs = {}
+        for batch in batches:
+            try:
+                results = self.try_again(
+                    func=self.get_bars, symbols=batch, timeframe=timeframe,
+                    retries=retries, delay=delay)
+            except Exception as e:
+                # one failed batch doesn't lose the others
+                print(f'Alpaca OHLC request failed for {batch}.')
+                print(e)
+                continue
+            for symbol, bars in results.items():
+                dfs[symbol] = self.standardize_bars(
+                    symbol, bars, timeframe) if bars else pd.DataFrame()
+        return dfs
+
+    def save_ohlc_many(
+            self,
+            symbols,
+            timeframe='max',
+            incremental=True,
+            dry_run=False,
+            **kwargs
+    ):
+        # given many symbols, save their ohlc from batched requests
+        # and return the filename of each symbol that was updated
+        # (None if it was current or had no new bars),
+        # symbols whose request or write failed are left out
+        # symbols missing the same window are fetched together
+        # (see plan_ohlc), dry_run=True returns the plans instead
+        plans = {
+            symbol: self.plan_ohlc(symbol, timeframe, incremental)
+            for symbol in symbols
+        }
+        if dry_run:
+            return plans
+        groups = {}
+        filenames = {}
+        for symbol, plan in plans.items():
+            if plan:
+                groups.setdefault(plan['timeframe'], []).append(symbol)
+            else:
+                filenames[symbol] = None
+        dfs = {}
+        for timeframe_, group in groups.items():
+            dfs.update(self.get_ohlc_many(group, timeframe_, **kwargs))
+        for symbol, df in dfs.items():
+            try:
+                filenames[symbol] = self.write_ohlc(
+                    symbol, df) if not df.empty else None
+                self.cover_ohlc(plans[symbol])
+            except Exception as e:
+                print(f'Alpaca OHLC save failed for {symbol}.')
+                print(e)
+        return filenames
+
         # def get_intraday(self, **kwargs):
         #     pass
 
@@ -562,39 +928,39 @@ class Polygon(MarketData):
         self.client = RESTClient(token)
         self.provider = 'polygon'
         self.free = free
+        if self.http.cache:
+            # the client sends its requests through its own urllib3 pool
+            self.client.client = CachedPool(
+                self.client.client, self.http.cache, self.http.wait)
 
     def paginate(self, gen, apply):
         results = []
         for idx, item in enumerate(gen):
-            if idx % C.POLY_MAX_LIMIT == 0:
-                self.log_api_call_time()
-            if self.free and idx % C.POLY_MAX_LIMIT == C.POLY_MAX_LIMIT - 1:
-                sleep(C.POLY_FREE_DELAY)
+            # the next item fetches the next page
+            if idx % C.POLY_MAX_LIMIT == C.POLY_MAX_LIMIT - 1:
+                self.throttle()
             results.append(apply(item))
         return results
 
     def get_dividends(self, **kwargs):
         def _get_dividends(symbol, timeframe='max'):
-            self.obey_free_limit(C.POLY_FREE_DELAY)
-            try:
-                start, _ = self.traveller.convert_dates(timeframe)
-                response = self.paginate(
-                    self.client.list_dividends(
-                        symbol,
-                        ex_dividend_date_gte=start,
-                        order='desc',
-                        sort='ex_dividend_date',
-                        limit=C.POLY_MAX_LIMIT
-                    ),
-                    lambda div: {
-                        'exDate': div.ex_dividend_date,
-                        'paymentDate': div.pay_date,
-                        'declaredDate': div.declaration_date,
-                        'amount': div.cash_amount
-                    }
-                )
-            finally:
-                self.log_api_call_time()
+            self.throttle()
+            start, _ = self.traveller.convert_dates(timeframe)
+            response = self.paginate(
+                self.client.list_dividends(
+                    symbol,
+                    ex_dividend_date_gte=start,
+                    order='desc',
+                    sort='ex_dividend_date',
+                    limit=C.POLY_MAX_LIMIT
+                ),
+                lambda div: {
+                    'exDate': div.ex_dividend_date,
+                    'paymentDate': div.pay_date,
+                    'declaredDate': div.declaration_date,
+                    'amount': div.cash_amount
+                }
+            )
             raw = pd.DataFrame(response)
             df = self.standardize_dividends(symbol, raw)
             return self.reader.data_in_timeframe(df, C.EX, timeframe)
@@ -602,24 +968,21 @@ class Polygon(MarketData):
 
     def get_splits(self, **kwargs):
         def _get_splits(symbol, timeframe='max'):
-            self.obey_free_limit(C.POLY_FREE_DELAY)
-            try:
-                start, _ = self.traveller.convert_dates(timeframe)
-                response = self.paginate(
-                    self.client.list_splits(
-                        symbol,
-                        execution_date_gte=start,
-                        order='desc',
-                        sort='execution_date',
-                        limit=C.POLY_MAX_LIMIT
-                    ),
-                    lambda split: {
-                        'exDate': split.execution_date,
-                        'ratio': split.split_from / split.split_to
-                    }
-                )
-            finally:
-                self.log_api_call_time()
+            self.throttle()
+            start, _ = self.traveller.convert_dates(timeframe)
+            response = self.paginate(
+                self.client.list_splits(
+                    symbol,
+                    execution_date_gte=start,
+                    order='desc',
+                    sort='execution_date',
+                    limit=C.POLY_MAX_LIMIT
+                ),
+                lambda split: {
+                    'exDate': split.execution_date,
+                    'ratio': split.split_from / split.split_to
+                }
+            )
             raw = pd.DataFrame(response)
             df = self.standardize_splits(symbol, raw)
             return self.reader.data_in_timeframe(df, C.EX, timeframe)
@@ -630,17 +993,14 @@ class Polygon(MarketData):
             is_crypto = symbol.find('X%3A') == 0
             formatted_start, formatted_end = self.traveller.convert_dates(
                 timeframe)
-            self.obey_free_limit(C.POLY_FREE_DELAY)
-            try:
-                response = self.client.get_aggs(
-                    symbol, 1, 'day',
-                    from_=formatted_start,
-                    to=formatted_end,
-                    adjusted=True,
-                    limit=C.POLY_MAX_AGGS_LIMIT
-                )
-            finally:
-                self.log_api_call_time()
+            self.throttle()
+            response = self.client.get_aggs(
+                symbol, 1, 'day',
+                from_=formatted_start,
+                to=formatted_end,
+                adjusted=True,
+                limit=C.POLY_MAX_AGGS_LIMIT
+            )
 
             raw = [vars(item) for item in response]
             columns = {'timestamp': 'date',
@@ -659,28 +1019,169 @@ class Polygon(MarketData):
 
         return self.try_again(func=_get_ohlc, **kwargs)
 
+    def get_grouped_daily(self, date):
+        # every stock's daily bar on a date in one call
+        self.throttle()
+        try:
+            response = self.client.get_grouped_daily_aggs(
+                date, adjusted=True)
+        except exceptions.NoResultsError:
+            # e.g. a holiday
+            return []
+        # the bars are labeled with the close, not the date
+        return [{**vars(item), 'date': date} for item in response]
+
+    def get_ohlc_grouped(
+            self,
+            symbols,
+            dates,
+            retries=C.DEFAULT_RETRIES,
+            delay=C.DEFAULT_DELAY
+    ):
+        # given many stocks and the dates to fetch, return a df per stock
+        # (that has bars) from one grouped daily call per date
+        raw = []
+        for date in dates:
+            raw += self.try_again(
+                func=self.get_grouped_daily, date=date,
+                retries=retries, delay=delay)
+        if not raw:
+            return {}
+        columns = {'vwap': 'average', 'transactions': 'trades'}
+        df = pd.DataFrame(raw).rename(columns=columns)
+        df = df[df['ticker'].isin(set(symbols))]
+        tickers = df['ticker']
+        # the whole market is standardized at once, then split by symbol
+        mapping = {k: v for k, v in self.ohlc_mapping.items() if k in df}
+        df = df[list(mapping)].rename(columns=mapping)
+        df[C.TIME] = pd.to_datetime(df[C.TIME])
+        for col in [C.OPEN, C.HIGH, C.LOW, C.CLOSE]:
+            df[col] = self.to_floats(df[col], 0)
+        for col in [C.VOL, C.TRADES]:
+            if col in df:
+                df[col] = self.to_ints(df[col])
+        return {
+            symbol: bars.sort_values(by=[C.TIME]).reset_index(drop=True)
+            for symbol, bars in df.groupby(tickers, sort=False)
+        }
+
+    def save_ohlc_grouped(
+            self,
+            symbols,
+            timeframe='max',
+            incremental=True,
+            dry_run=False,
+            **kwargs
+    ):
+        # given many symbols, save their ohlc and return the filename
+        # of each symbol that was saved (None if it was already current
+        # or had no new bars), symbols that failed are left out
+        # stocks missing at most POLY_GROUPED_MAX_DAYS market days
+        # (see plan_ohlc) are fetched from grouped daily bars,
+        # a call per day for all of them instead of a call per symbol,
+        # the rest (e.g. new symbols and crypto) a symbol at a time
+        # dry_run=True returns the plans instead
+        plans = {
+            symbol: self.plan_ohlc(symbol, timeframe, incremental)
+            for symbol in symbols
+        }
+        if dry_run:
+            return plans
+        filenames = {}
+        grouped = {}
+        single = []
+        for symbol, plan in plans.items():
+            if not plan:
+                filenames[symbol] = None
+                continue
+            dates = self.traveller.get_market_dates(
+                plan['start'], plan['end'])
+            if (
+                not self.is_crypto(symbol) and
+                len(dates) <= C.POLY_GROUPED_MAX_DAYS
+            ):
+                grouped[symbol] = dates
+            else:
+                single.append(symbol)
+        dates = sorted(set().union(*grouped.values()))
+        dfs = self.get_ohlc_grouped(list(grouped), dates, **kwargs)
+        for symbol in grouped:
+            if symbol not in dfs:
+                # every day was fetched, but none had its bars
+                filenames[symbol] = None
+                self.cover_ohlc(plans[symbol])
+                continue
+            try:
+                filenames[symbol] = self.write_ohlc(symbol, dfs[symbol])
+                self.cover_ohlc(plans[symbol])
+            except Exception as e:
+                print(f'Polygon.io OHLC save failed for {symbol}.')
+                print(e)
+        for symbol in single:
+            try:
+                filenames[symbol] = self.save_ohlc(
+                    symbol=symbol, timeframe=plans[symbol]['timeframe'],
+                    incremental=False, **kwargs)
+            except Exception as e:
+                print(f'Polygon.io OHLC update failed for {symbol}.')
+                print(e)
+        return filenames
+
+    def get_days_per_call(self, crypto, min=1):
+        # as many days of min minute bars per call as fit under the limit
+        minutes = C.CRYPTO_MINUTES if crypto else C.STOCK_MINUTES
+        return max(C.POLY_MAX_AGGS_LIMIT * min // minutes, 1)
+
+    def get_date_ranges(self, dates, days_per_call):
+        # packs sorted dates into (first, last) ranges
+        # that span at most days_per_call days each
+        ranges = []
+        for date in sorted(dates):
+            day = pd.Timestamp(date)
+            if ranges and (day - pd.Timestamp(ranges[-1][0])).days < (
+                    days_per_call):
+                ranges[-1][1] = date
+            else:
+                ranges.append([date, date])
+        return [tuple(date_range) for date_range in ranges]
+
+    def get_aggs_range(self, symbol, min, start, end):
+        # the minute bars of a range of days in as few calls as possible
+        self.throttle()
+        try:
+            response = self.client.get_aggs(
+                symbol, min, 'minute', from_=start, to=end,
+                adjusted=True, limit=C.POLY_MAX_AGGS_LIMIT
+            )
+        except exceptions.NoResultsError:
+            # e.g. a range of weekends and holidays
+            return []
+        if len(response) >= C.POLY_MAX_AGGS_LIMIT and start != end:
+            # truncated, so split the range in half
+            days = pd.date_range(start, end).strftime(C.DATE_FMT)
+            mid = len(days) // 2
+            return (
+                self.get_aggs_range(symbol, min, start, days[mid - 1]) +
+                self.get_aggs_range(symbol, min, days[mid], end)
+            )
+        return [vars(item) for item in response]
+
     def get_intraday(self, **kwargs):
-        def _get_intraday(symbol, min=1, timeframe='max', extra_hrs=True):
+        def _get_intraday(
+                symbol, min=1, timeframe='max', extra_hrs=True, dates=None):
             # pass min directly into stock_aggs function as multiplier
             is_crypto = symbol.find('X%3A') == 0
-            dates = self.traveller.dates_in_range(timeframe)
+            if dates is None:
+                dates = self.traveller.dates_in_range(timeframe)
             if dates == []:
                 raise Exception(f'No dates in timeframe: {timeframe}.')
 
-            for _, date in enumerate(dates):
-                self.obey_free_limit(C.POLY_FREE_DELAY)
-                try:
-                    response = self.client.get_aggs(
-                        symbol, min, 'minute', from_=date, to=date,
-                        adjusted=True, limit=C.POLY_MAX_AGGS_LIMIT
-                    )
-                except exceptions.NoResultsError:
-                    # This is to prevent breaking the loop over weekends
+            days_per_call = self.get_days_per_call(is_crypto, min)
+            requested = set(dates)
+            for start, end in self.get_date_ranges(dates, days_per_call):
+                raw = self.get_aggs_range(symbol, min, start, end)
+                if not raw:
                     continue
-                finally:
-                    self.log_api_call_time()
-
-                raw = [vars(item) for item in response]
                 columns = {'timestamp': 'date',
                            'vwap': 'average', 'transactions': 'trades'}
                 df = pd.DataFrame(raw).rename(columns=columns)
@@ -692,11 +1193,16 @@ class Polygon(MarketData):
                         df['date'], unit='ms').dt.tz_localize(
                         'UTC').dt.tz_convert(
                         C.TZ).dt.tz_localize(None)
-                filename = self.finder.get_intraday_path(
-                    symbol, date, self.provider)
-                df = self.standardize_ohlc(symbol, df, filename)
-                df = df[df[C.TIME].dt.strftime(C.DATE_FMT) == date]
-                yield df
+                # one file per day
+                days = df['date'].dt.strftime(C.DATE_FMT)
+                for date, day in df.groupby(days, sort=True):
+                    if date not in requested:
+                        # in the range but already stored
+                        continue
+                    filename = self.finder.get_intraday_path(
+                        symbol, date, self.provider)
+                    yield self.standardize_ohlc(
+                        symbol, day.reset_index(drop=True), filename)
 
         return self.try_again(func=_get_intraday, **kwargs)
 
@@ -728,7 +1234,8 @@ class LaborStats(MarketData):
                       'startyear': start, 'endyear': end,
                       'seriesid': 'LNS14000000'}
 
-            response = requests.post(url, data=params)
+            # a read, so it's safe to resend
+            response = self.http.post(url, data=params, idempotent=True)
 
             if (
                     response.ok and
@@ -827,10 +1334,9 @@ class Glassnode(MarketData):
             params['api_key'] = self.token
             headers = {}
             cookies = {}
-        response = requests.get(
+        self.throttle()
+        return self.http.get(
             url, params=params, headers=headers, cookies=cookies)
-        sleep(random() * 5)
-        return response
 
     def get_s2f_ratio(self, **kwargs):
         def _get_s2f_ratio(timeframe):
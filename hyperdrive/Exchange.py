@@ -3,18 +3,21 @@ import time
 import hmac
 import base64
 import hashlib
-import requests
 import urllib.parse
 from time import sleep
 from binance import Client
 from typing import Iterable, Union, Optional
 from binance.helpers import round_step_size
 from dotenv import load_dotenv, find_dotenv
+from Http import HttpClient
 import Constants as C
 load_dotenv(find_dotenv('config.env'))
 
 
 class CEX:
+    def __init__(self) -> None:
+        self.http = HttpClient()
+
     def create_pair(self, base: str, quote: str) -> str:
         return f'{base}{quote}'
 
@@ -73,7 +76,8 @@ class AlpacaEx(CEX):
             "APCA-API-KEY-ID": self.token,
             "APCA-API-SECRET-KEY": self.secret
         }
-        response = requests.request(method, url, json=payload, headers=headers)
+        response = self.http.request(
+            method, url, json=payload, headers=headers)
         if response.ok:
             return response.json()
         else:
@@ -121,6 +125,7 @@ class Kraken(CEX):
             self.secret = os.environ['KRAKEN_SECRET']
         self.api_url = 'https://api.kraken.com'
         self.version = '0'
+        self.nonce = 0
 
     def get_signature(self, urlpath, data):
         postdata = urllib.parse.urlencode(data)
@@ -132,20 +137,25 @@ class Kraken(CEX):
         return sigdigest.decode()
 
     def make_auth_req(self, uri_path, data={}):
-        data['nonce'] = self.gen_nonce()
-        headers = {}
-        headers['API-Key'] = self.key
-        # get_kraken_signature() as defined in the 'Authentication' section
-        headers['API-Sign'] = self.get_signature(uri_path, data)
-        response = requests.post(
+        def sign():
+            # a retry (e.g. after a 429) needs a fresh nonce,
+            # Kraken rejects one it has already seen
+            data['nonce'] = self.gen_nonce()
+            headers = {}
+            headers['API-Key'] = self.key
+            # get_kraken_signature() as defined in the 'Authentication' section
+            headers['API-Sign'] = self.get_signature(uri_path, data)
+            return {'headers': headers, 'data': data}
+        response = self.http.post(
             (self.api_url + uri_path),
-            headers=headers,
-            data=data
+            sign=sign
         )
         return self.handle_response(response)
 
     def gen_nonce(self):
-        return str(int(1000 * time.time()))
+        # always increasing, even for retries within the same ms
+        self.nonce = max(int(1000 * time.time()), self.nonce + 1)
+        return str(self.nonce)
 
     def get_balance(self):
         access = 'private'
@@ -175,7 +185,7 @@ class Kraken(CEX):
         params = {
             'pair': pair
         }
-        response = requests.get(url, params=params)
+        response = self.http.get(url, params=params)
         result = self.handle_response(response)[pair]
         return result
 
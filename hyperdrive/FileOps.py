@@ -1,20 +1,34 @@
+import io
 import os
 import json
 import time
 import pickle
 from datetime import datetime
+import numpy as np
 import pandas as pd
+import pyarrow.parquet as pq
 from Storage import Store
-from Constants import TZ
+from Cache import FrameCache, DiskCache
+from Catalog import Librarian
+from Constants import TZ, PARQUET, ETAG, DATE_COLS, INT_COLS, FLOAT_COLS
+from Constants import FRAME_CACHE_BYTES, CACHE_DIR, DISK_CACHE_BYTES
+from Constants import STREAM_READS
 from TimeMachine import TimeTraveller
 # consider combining fileoperations into one class
 
 
 class FileReader:
     # file read operations
+    # tiers: parsed frames in memory -> local copies on disk -> S3
+    # parsed frames shared by every FileReader in the process
+    cache = FrameCache(FRAME_CACHE_BYTES)
+    # local copies shared by every process using CACHE_DIR
+    disk = DiskCache(CACHE_DIR, DISK_CACHE_BYTES)
+
     def __init__(self):
-        self.store = Store()
+        self.store = Store(CACHE_DIR)
         self.traveller = TimeTraveller()
+        self.streaming = STREAM_READS
 
     def should_be_updated(self, filename):
         one_day = 60 * 60 * 24
@@ -27,19 +41,96 @@ class FileReader:
             last_modified = delta.total_seconds()
         return not file_exists or last_modified > one_day
 
+    def refresh(self, filename, revalidate=False):
+        # makes sure the local copy of filename is usable
+        # and returns its path
+        path = self.store.get_local_path(filename)
+        if self.store.freshness == ETAG or revalidate:
+            downloaded = self.store.revalidate_file(filename)
+        else:
+            downloaded = self.should_be_updated(path)
+            if downloaded:
+                self.store.download_file(filename)
+        self.disk.access(filename, hit=not downloaded)
+        return path
+
+    def get_cache_stats(self):
+        return {'memory': self.cache.stats(), 'disk': self.disk.stats()}
+
     def load_json(self, filename):
         # loads json file as dictionary data
-        if self.should_be_updated(filename):
-            self.store.download_file(filename)
-        with open(filename, 'r') as file:
+        path = self.refresh(filename)
+        with open(path, 'r') as file:
             return json.load(file)
 
-    def load_csv(self, filename):
-        # loads csv file as Dataframe
+    def is_columnar(self, filename):
+        return self.store.finder.get_format(filename) == PARQUET
+
+    def read_df(self, filename, source=None):
+        # parses a local file (or a stream of it) according to its format
+        source = source or filename
+        if self.is_columnar(filename):
+            if not isinstance(source, str):
+                # parquet needs to seek
+                source = io.BytesIO(source.read())
+            # parquet columns are already typed
+            return pd.read_parquet(source)
+        return pd.read_csv(source).round(10)
+
+    def read_chunks(self, filename, stream, chunksize):
+        with stream:
+            if self.is_columnar(filename):
+                file = pq.ParquetFile(io.BytesIO(stream.read()))
+                for batch in file.iter_batches(batch_size=chunksize):
+                    yield batch.to_pandas()
+            else:
+                for chunk in pd.read_csv(stream, chunksize=chunksize):
+                    yield chunk.round(10)
+
+    def stream_csv(self, filename, chunksize=None):
+        # parses a csv (or parquet) object straight from S3
+        # optionally as an iterator of dataframes of chunksize rows
+        if chunksize:
+            stream, _ = self.store.stream_object(filename)
+            return self.read_chunks(filename, stream, chunksize)
+        # a cached frame is only revalidated, not transferred again
+        version = self.cache.peek(filename) if self.cache.max_bytes else None
+        # frames parsed from local copies are versioned by their stat
+        # (see read_cached_df), only streamed ones by their ETag
+        if not isinstance(version, str):
+            version = None
+        stream, etag = self.store.stream_object(filename, version)
+        if stream is None:
+            df = self.cache.get(filename, version)
+            if df is not None:
+                return df
+            stream, etag = self.store.stream_object(filename)
+        with stream:
+            df = self.read_df(filename, stream)
+        if self.cache.max_bytes:
+            self.cache.put(filename, etag, df)
+        return df
+
+    def read_cached_df(self, filename, path):
+        # parses a local copy unless an unchanged frame is cached
+        if not self.cache.max_bytes:
+            return self.read_df(path)
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        df = self.cache.get(filename, version)
+        if df is None:
+            df = self.read_df(path)
+            self.cache.put(filename, version, df)
+        return df
+
+    def load_csv(self, filename, revalidate=False, read_only=False):
+        # loads csv (or parquet) file as Dataframe
+        # read only loads can skip the local copy (see STREAM_READS)
         try:
-            if self.should_be_updated(filename):
-                self.store.download_file(filename)
-            df = pd.read_csv(filename).round(10)
+            if read_only and self.streaming:
+                return self.stream_csv(filename)
+            path = self.refresh(filename, revalidate)
+            df = self.read_cached_df(filename, path)
         except pd.errors.EmptyDataError:
             print(f'{filename} is an empty csv file.')
             raise
@@ -55,85 +146,278 @@ class FileReader:
         # return whether the csv needs to be updated
         return len(df) >= len(self.load_csv(filename))
 
-    def update_df(self, filename, new, column, save_fmt=None):
-        old = self.load_csv(filename)
+    def merge_df(self, old, new, column):
         if not old.empty:
             old[column] = pd.to_datetime(old[column])
             new[column] = pd.to_datetime(new[column])
             # preference to new entries over old
             old = old[~old[column].isin(new[column])]
             new = pd.concat([old, new], ignore_index=True)
-        if save_fmt:
-            new[column] = pd.to_datetime(new[column]).dt.strftime(save_fmt)
+        return new
+
+    def get_sort_keys(self, old, new, column, save_fmt):
+        # returns the old and new keys in the old column's representation,
+        # so the history is searched without parsing or formatting it
+        new_keys = pd.to_datetime(new[column])
+        old_keys = old[column]
+        if pd.api.types.is_datetime64_any_dtype(old_keys):
+            return old_keys, new_keys
+        if save_fmt and len(old_keys) and all(
+            isinstance(key, str) and
+            pd.to_datetime(key).strftime(save_fmt) == key
+            for key in [old_keys.iloc[0], old_keys.iloc[-1]]
+        ):
+            return old_keys, new_keys.dt.strftime(save_fmt)
+        return pd.to_datetime(old_keys), new_keys
+
+    def same_rows(self, a, b):
+        # compares frames like a round trip through csv would
+        if set(a.columns) != set(b.columns) or len(a) != len(b):
+            return False
+        for col in a:
+            x, y = a[col].to_numpy(), b[col].to_numpy()
+            if (
+                pd.api.types.is_numeric_dtype(x) and
+                pd.api.types.is_numeric_dtype(y)
+            ):
+                if not np.allclose(x, y, rtol=0, atol=1e-9, equal_nan=True):
+                    return False
+            elif not np.array_equal(x.astype(str), y.astype(str)):
+                return False
+        return True
+
+    def upsert_df(self, old, new, column, save_fmt=None):
+        # splices new rows into old (sorted by column), replacing rows
+        # with the same keys, and only touches the overlapping window
+        # returns the merged df and the rows inserted and replaced
+        new = new.copy()
+        report = {'inserted': len(new), 'replaced': 0, 'changed': True}
+        if old.empty:
+            if save_fmt:
+                new[column] = pd.to_datetime(new[column]).dt.strftime(
+                    save_fmt)
+            new = new.sort_values(by=[column], kind='stable')
+            report['changed'] = not new.empty
+            return new.reset_index(drop=True), report
+        old_keys, new_keys = self.get_sort_keys(old, new, column, save_fmt)
+        if not old_keys.is_monotonic_increasing:
+            # unsorted history, fall back to a full merge
+            old = old.assign(**{column: old_keys}).sort_values(
+                by=[column], kind='stable').reset_index(drop=True)
+            old_keys = old[column]
+        new[column] = new_keys.to_numpy()
+        new = new.sort_values(by=[column], kind='stable')
+        if new.empty:
+            report.update(inserted=0, changed=False)
+            return old, report
+        lo = old_keys.searchsorted(new[column].iloc[0], side='left')
+        hi = old_keys.searchsorted(new[column].iloc[-1], side='right')
+        window = old.iloc[lo:hi].assign(**{column: old_keys.iloc[lo:hi]})
+        replaced = window[column].isin(new[column])
+        spliced = pd.concat(
+            [window[~replaced], new], ignore_index=True
+        ).sort_values(by=[column], kind='stable')
+        head = old.iloc[:lo].assign(**{column: old_keys.iloc[:lo]})
+        tail = old.iloc[hi:].assign(**{column: old_keys.iloc[hi:]})
+        merged = pd.concat([head, spliced, tail], ignore_index=True)
+        report['replaced'] = int(replaced.sum())
+        report['inserted'] = len(new) - report['replaced']
+        report['changed'] = bool(report['inserted']) or not self.same_rows(
+            window.reset_index(drop=True), spliced.reset_index(drop=True))
+        return merged, report
+
+    def update_df(self, filename, new, column, save_fmt=None):
+        # merges into the current object, not a day old copy
+        old = self.load_csv(filename, revalidate=True)
+        # columnar formats store datetimes natively
+        if self.is_columnar(filename):
+            save_fmt = None
+        new, report = self.upsert_df(old, new, column, save_fmt)
+        # lets FileWriter.update_csv skip unchanged uploads
+        new.attrs['upsert'] = report
         return new
 
     def check_file_exists(self, filename):
         return os.path.exists(filename) and self.store.key_exists(filename)
 
     def data_in_timeframe(self, df, col, timeframe='max'):  # noqa , tolerance='0d'):
+        # keeps the rows dated on or after the day timeframe ago (in TZ)
+        # without changing df
         if col not in df:
             return df
         delta = self.traveller.convert_delta(timeframe)
         # tol = self.traveller.convert_delta(tolerance)
-        df[col] = pd.to_datetime(df[col]).dt.tz_localize(TZ)
-        today = datetime.now(TZ)
-        filtered = df[df[col].apply(
-            lambda date: date.strftime('%Y-%m-%d')) >= pd.to_datetime(
-                today - delta).strftime('%Y-%m-%d')].copy(deep=True)
+        # times are in TZ, so comparing them to the cutoff's midnight
+        # is the same as comparing dates
+        cutoff = pd.Timestamp((datetime.now(TZ) - delta).date())
+        times = pd.to_datetime(df[col])
+        if times.is_monotonic_increasing:
+            # sorted (as stored), so binary search for the first row
+            # and slice, which shares df's data instead of copying it
+            rows = slice(times.searchsorted(cutoff), None)
+        else:
+            # NaT is never in the timeframe
+            rows = (times >= cutoff).to_numpy()
+        # a shallow copy, so setting columns doesn't warn or touch df
+        filtered = df.iloc[rows].copy(deep=False)
         # if filtered.empty:
         #     filtered = df[df[col] > pd.to_datetime(today - (delta + tol))]
-        filtered[col] = filtered[col].dt.tz_localize(None)
+        if times.dtype != df[col].dtype:
+            filtered[col] = times.iloc[rows].to_numpy()
         return filtered
 
-    def load_pickle(self, filename):
-        if self.should_be_updated(filename):
-            self.store.download_file(filename)
-        with open(filename, 'rb') as file:
+    def load_pickle(self, filename, read_only=False):
+        if read_only and self.streaming:
+            stream, _ = self.store.stream_object(filename)
+            with stream:
+                return pickle.loads(stream.read())
+        path = self.refresh(filename)
+        with open(path, 'rb') as file:
             return pickle.load(file)
 
+    def load_array(self, filename, mmap_mode='r'):
+        # maps a .npy file into memory instead of reading it,
+        # so loads are instant and processes share the same pages
+        path = self.refresh(filename)
+        return np.load(path, mmap_mode=mmap_mode, allow_pickle=False)
+
 
 class FileWriter:
     # file write operations
     def __init__(self):
         self.store = Store()
+        self.librarian = Librarian(self.store)
+
+    def invalidate(self, filename):
+        # drops the copies FileReader may have cached
+        FileReader.cache.invalidate(filename)
+        FileReader.disk.discard(filename)
+
+    def write_atomic(self, filename, write):
+        # write(path) fills a temp file that replaces filename in one step,
+        # so readers (and a crash mid write) never see a partial file
+        temp = f'{filename}.tmp'
+        try:
+            write(temp)
+            os.replace(temp, filename)
+        except BaseException:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
+
+    def upload(self, filename, data=None):
+        # uploads filename unless the stored object has the same content
+        # (the digest it was uploaded with, one HEAD per file)
+        # returns whether it was uploaded
+        digest = self.store.get_digest(filename)
+        if digest == self.store.get_stored_digest(filename):
+            # the manifest can miss the object, e.g. if it was written
+            # with MANIFESTS off, but never decides whether to upload
+            if (
+                self.librarian.tracks(filename) and
+                self.librarian.get_hash(filename) != digest
+            ):
+                self.librarian.record(filename, data, digest)
+            return False
+        self.store.upload_file(filename, digest)
+        self.librarian.record(filename, data, digest)
+        return True
 
     def save_json(self, filename, data):
         # saves data as json file with provided filename
         self.store.finder.make_path(filename)
-        with open(filename, 'w') as file:
-            json.dump(data, file, indent=4)
-        self.store.upload_file(filename)
+        self.invalidate(filename)
+
+        def write(path):
+            with open(path, 'w') as file:
+                json.dump(data, file, indent=4)
+        self.write_atomic(filename, write)
+        self.upload(filename)
         return True
 
+    def cast_df(self, data):
+        # enforces column types before writing a columnar format
+        data = data.copy()
+        for col in DATE_COLS:
+            if col in data:
+                data[col] = pd.to_datetime(data[col])
+        for col in INT_COLS:
+            if col in data:
+                data[col] = pd.to_numeric(
+                    data[col]).fillna(0).astype('int64')
+        for col in FLOAT_COLS:
+            if col in data:
+                data[col] = pd.to_numeric(data[col]).astype('float64')
+        return data
+
+    def write_df(self, filename, data):
+        # writes df to a local file according to its format
+        if self.store.finder.get_format(filename) == PARQUET:
+            self.write_atomic(
+                filename,
+                lambda path: self.cast_df(data).to_parquet(path, index=False))
+        else:
+            def write(path):
+                with open(path, 'w') as f:
+                    data.to_csv(f, index=False)
+            self.write_atomic(filename, write)
+
     def save_csv(self, filename, data):
-        # saves df as csv file with provided filename
+        # saves df as csv (or parquet) file with provided filename
         if data.empty:
             return False
         else:
             self.store.finder.make_path(filename)
-            with open(filename, 'w') as f:
-                data.to_csv(f, index=False)
-            self.store.upload_file(filename)
+            self.invalidate(filename)
+            self.write_df(filename, data)
+            self.upload(filename, data)
             return True
 
     def update_csv(self, filename, df):
         # update csv if needed
+        upsert = df.attrs.get('upsert')
+        if upsert and not upsert['changed']:
+            # nothing new since the stored object (see update_df)
+            return
         if FileReader().check_update(filename, df):
             self.save_csv(filename, df)
 
     def remove_files(self, filenames):
-        [os.remove(file) for file in filenames]
+        [self.invalidate(file) for file in filenames]
+        # e.g. never downloaded (or kept elsewhere, see CACHE_DIR)
+        [os.remove(file) for file in filenames if os.path.exists(file)]
         self.store.delete_objects(filenames)
+        self.librarian.forget_all(filenames)
 
     def rename_file(self, old_name, new_name):
+        self.invalidate(old_name)
+        self.invalidate(new_name)
         os.rename(old_name, new_name)
         self.store.rename_key(old_name, new_name)
+        self.librarian.forget(old_name)
+        self.librarian.record(new_name)
 
     def save_pickle(self, filename, data):
         self.store.finder.make_path(filename)
-        with open(filename, 'wb') as file:
-            pickle.dump(data, file)
-        self.store.upload_file(filename)
+        self.invalidate(filename)
+
+        def write(path):
+            with open(path, 'wb') as file:
+                pickle.dump(data, file)
+        self.write_atomic(filename, write)
+        self.upload(filename)
+        return True
+
+    def save_array(self, filename, data):
+        # saves an array as a .npy file (see load_array)
+        self.store.finder.make_path(filename)
+        self.invalidate(filename)
+
+        def write(path):
+            with open(path, 'wb') as file:
+                np.save(file, np.asarray(data), allow_pickle=False)
+        self.write_atomic(filename, write)
+        self.upload(filename)
         return True
 
 
@@ -0,0 +1,223 @@
+import os
+import threading
+from time import sleep, time
+from random import random
+from typing import Callable, Optional
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from HttpCache import ResponseCache
+import Constants as C
+
+
+class HttpClient:
+    """
+    Sends every provider's HTTP requests through one pooled session,
+    so connections (and TLS sessions) to each host are kept alive
+    and reused instead of opened per request.
+
+    Responses with a 429 (or a 5xx for idempotent requests) are retried
+    with jittered exponential backoff, or after the server's Retry-After.
+    Signed requests (e.g. with a nonce) are signed again for each attempt
+    (see request), so a retry is never a replay of the rejected one.
+    Other errors are returned (or raised) as is.
+    Every request has a timeout.
+
+    The latency and retries of each host are tracked (see get_stats)
+    and each response carries its own retries.
+
+    Clients of market data can serve their GET (and idempotent POST)
+    requests from a ResponseCache (see HTTP_CACHE), in which case
+    a rate limit deferred to the client (see defer) is only waited for
+    by requests that go out.
+
+    In REPLAY mode, a request that isn't cached raises CacheMiss
+    (see ResponseCache.miss) instead of going out.
+
+    Args:
+        cached (bool): Whether to use the response cache,
+            never for e.g. orders.
+
+    Attributes:
+        session (Optional[requests.Session]):
+            The session shared by every client in the process.
+        lock (threading.Lock): Guards the session and the metrics.
+        metrics (dict): The metrics of each host (see get_stats).
+        idempotent (set[str]):
+            The methods that are safe to resend after a server error.
+    """
+
+    session: Optional[requests.Session] = None
+    lock: threading.Lock = threading.Lock()
+    metrics: dict = {}
+    idempotent: set[str] = {'GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS'}
+
+    def __init__(self, cached: bool = False) -> None:
+        cache = ResponseCache() if cached else None
+        self.cache = cache if cache else None
+        self.deferred = None
+
+    def get_session(self) -> requests.Session:
+        # lazily build the shared session
+        if HttpClient.session is None:
+            with HttpClient.lock:
+                if HttpClient.session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(
+                        pool_connections=C.HTTP_POOL_HOSTS,
+                        pool_maxsize=C.HTTP_POOL_SIZE)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    HttpClient.session = session
+        return HttpClient.session
+
+    @staticmethod
+    def reset_session() -> None:
+        # connections can't be shared with a forked process
+        HttpClient.session = None
+        HttpClient.lock = threading.Lock()
+
+    def should_retry(
+            self,
+            response: requests.Response,
+            idempotent: bool
+    ) -> bool:
+        status = response.status_code
+        return status == 429 or (status >= 500 and idempotent)
+
+    def get_delay(self, response: requests.Response, attempt: int) -> float:
+        # the server's Retry-After (seconds or a date) wins over backoff
+        retry_after = response.headers.get('Retry-After')
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                try:
+                    date = parsedate_to_datetime(retry_after)
+                    now = datetime.now(timezone.utc)
+                    delay = (date - now).total_seconds()
+                except (TypeError, ValueError):
+                    delay = None
+            if delay is not None:
+                return min(max(delay, 0), C.HTTP_BACKOFF_MAX)
+        # full jitter keeps workers from retrying in lockstep
+        backoff = min(C.HTTP_BACKOFF * 2 ** attempt, C.HTTP_BACKOFF_MAX)
+        return backoff * random()
+
+    def record(self, host: str, seconds: float, retried: bool) -> None:
+        with HttpClient.lock:
+            metrics = HttpClient.metrics.setdefault(host, {
+                'requests': 0,
+                'retries': 0,
+                'seconds': 0.0,
+                'max_seconds': 0.0
+            })
+            if retried:
+                metrics['retries'] += 1
+            else:
+                metrics['requests'] += 1
+            metrics['seconds'] += seconds
+            metrics['max_seconds'] = max(metrics['max_seconds'], seconds)
+
+    def defer(self, limiter) -> None:
+        # the next request that goes out waits for the limiter
+        self.deferred = limiter
+
+    def wait(self) -> float:
+        # waits for the deferred limiter (if any)
+        # and returns the seconds waited
+        limiter, self.deferred = self.deferred, None
+        return limiter.acquire() if limiter else 0
+
+    def request(
+            self,
+            method: str,
+            url: str,
+            idempotent: Optional[bool] = None,
+            retries: Optional[int] = None,
+            sign: Optional[Callable[[], dict]] = None,
+            **kwargs
+    ) -> requests.Response:
+        """
+        Send a request, retrying rate limits and server errors.
+
+        Args:
+            method (str): The HTTP method.
+            url (str): The url.
+            idempotent (Optional[bool]): Whether the request can be resent
+                after a server error, defaults to whether the method is.
+            retries (Optional[int]): The most retries, defaults to
+                HTTP_RETRIES.
+            sign (Optional[Callable[[], dict]]): Called before each
+                attempt for the arguments it adds (e.g. a fresh nonce
+                and its signature in the headers and body).
+                Signed requests are never cached.
+            **kwargs: The arguments of requests.request.
+
+        Returns:
+            requests.Response:
+                The last response, with its retries as response.retries.
+        """
+        method = method.upper()
+        if idempotent is None:
+            idempotent = method in self.idempotent
+        retries = C.HTTP_RETRIES if retries is None else retries
+        kwargs.setdefault('timeout', C.HTTP_TIMEOUT)
+        host = urlparse(url).netloc
+        cache = self.cache if idempotent and not sign else None
+        if cache:
+            params = kwargs.get('params')
+            key = cache.get_key(
+                method, url, params, kwargs.get('data'), kwargs.get('json'))
+            entry = cache.load(key, url, params)
+            if entry:
+                self.deferred = None
+                return cache.to_response(entry, url)
+            cache.miss(method, url)
+        self.wait()
+        for attempt in range(retries + 1):
+            if sign:
+                kwargs.update(sign())
+            start = time()
+            response = self.get_session().request(method, url, **kwargs)
+            self.record(host, time() - start, attempt > 0)
+            response.retries = attempt
+            if (
+                attempt == retries or
+                not self.should_retry(response, idempotent)
+            ):
+                if cache:
+                    cache.save(key, method, url, response.status_code,
+                               response.headers, response.content)
+                return response
+            sleep(self.get_delay(response, attempt))
+
+    def get(self, url: str, params=None, **kwargs) -> requests.Response:
+        return self.request('GET', url, params=params, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def get_stats(self) -> dict:
+        """
+        Get the metrics of each host.
+
+        Returns:
+            dict: The requests, retries, and total / mean / max seconds
+                per attempt of each host.
+        """
+        with HttpClient.lock:
+            return {
+                host: {
+                    **metrics,
+                    'mean_seconds': metrics['seconds'] / (
+                        metrics['requests'] + metrics['retries'])
+                }
+                for host, metrics in HttpClient.metrics.items()
+            }
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=HttpClient.reset_session)
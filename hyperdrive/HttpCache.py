@@ -0,0 +1,351 @@
+import io
+import os
+import re
+import json
+import base64
+import hashlib
+import threading
+from time import time
+from typing import Any, Callable, Mapping, Optional, Union
+from datetime import datetime
+from urllib.parse import urlsplit, parse_qsl
+import requests
+import urllib3
+from requests.structures import CaseInsensitiveDict
+import Constants as C
+
+
+class CacheMiss(Exception):
+    # a request that isn't cached in replay mode
+    pass
+
+
+class ResponseCache:
+    """
+    Records provider responses on disk and replays them,
+    so repeated runs don't wait on the network (or the rate limits)
+    and tests parse real responses offline.
+
+    Requests are keyed by a hash of their method, url, sorted query params
+    and body, so the same request always has the same key no matter
+    the order of its params. Headers (e.g. API keys) aren't part of it.
+
+    In RECORD mode, every successful response is stored and a stored
+    response is served while it's fresh. How long a response stays fresh
+    depends on its endpoint's class (see HTTP_CACHE_TTLS and classify),
+    e.g. today's bars are only fresh for a few minutes,
+    but bars of days that are over never expire (see is_historical).
+    In REPLAY mode, stored responses are always served
+    and anything else raises CacheMiss instead of going out.
+
+    Args:
+        mode (Optional[str]): RECORD, REPLAY or '' (off),
+            defaults to HTTP_CACHE.
+        root (Optional[str]): The dir of the responses,
+            defaults to HTTP_CACHE_DIR.
+
+    Attributes:
+        endpoints (list[tuple[str, re.Pattern]]): The class of each
+            pattern of host and path, the first match wins.
+        end_date (re.Pattern): A date (or ms timestamp)
+            that ends a range of bars.
+        headers (list[str]): The response headers worth replaying
+            (bodies are stored decoded).
+    """
+
+    endpoints: list[tuple[str, re.Pattern]] = [
+        ('bars', re.compile(r'api\.polygon\.io/v\d/aggs/')),
+        ('bars', re.compile(r'data\.alpaca\.markets/.*/bars')),
+        ('reference', re.compile(r'api\.polygon\.io/v\d/reference/')),
+        ('reference', re.compile(r'wikipedia\.org/')),
+        ('macro', re.compile(r'api\.bls\.gov/')),
+        ('macro', re.compile(r'glassnode\.com/'))
+    ]
+    end_date: re.Pattern = re.compile(r'^(\d{4}-\d{2}-\d{2}|\d{13})')
+    headers: list[str] = ['Content-Type']
+
+    def __init__(
+            self,
+            mode: Optional[str] = None,
+            root: Optional[str] = None
+    ) -> None:
+        self.mode = C.HTTP_CACHE if mode is None else mode
+        self.root = root or C.HTTP_CACHE_DIR
+        self.lock = threading.Lock()
+        self.counts = {'hits': 0, 'misses': 0, 'stores': 0}
+
+    def __bool__(self) -> bool:
+        return self.mode in {C.RECORD, C.REPLAY}
+
+    def normalize(self, url: str, params=None) -> tuple[str, list]:
+        # the url without its query and the sorted params of both
+        parts = urlsplit(url)
+        query = parse_qsl(parts.query, keep_blank_values=True)
+        if isinstance(params, dict):
+            params = params.items()
+        # requests and urllib3 both drop params that are None
+        query += [
+            (key, value) for key, value in params or []
+            if value is not None
+        ]
+        base = (
+            f'{parts.scheme.lower()}://{parts.netloc.lower()}'
+            f'{parts.path or "/"}')
+        return base, sorted((str(key), str(val)) for key, val in query)
+
+    def get_key(
+            self,
+            method: str,
+            url: str,
+            params: Optional[Union[dict, list]] = None,
+            data: Optional[Union[dict, list, str, bytes]] = None,
+            json_body: Any = None
+    ) -> str:
+        """
+        Get the key of a request.
+
+        Args:
+            method (str): The HTTP method.
+            url (str): The url, with or without a query.
+            params (Optional[Union[dict, list]]):
+                The query params (dict or pairs).
+            data (Optional[Union[dict, list, str, bytes]]):
+                The form body (dict, pairs, str or bytes).
+            json_body (Any): The JSON body.
+
+        Returns:
+            str: A hash of the normalized request.
+        """
+        base, query = self.normalize(url, params)
+        if isinstance(data, dict):
+            data = sorted((str(key), str(val)) for key, val in data.items())
+        elif isinstance(data, bytes):
+            data = base64.b64encode(data).decode()
+        request = [method.upper(), base, query, data, json_body]
+        normalized = json.dumps(request, sort_keys=True, default=str)
+        return hashlib.sha256(normalized.encode()).hexdigest()
+
+    def classify(self, url: str) -> str:
+        """
+        Get the class of an endpoint.
+
+        Args:
+            url (str): The url.
+
+        Returns:
+            str: The class, e.g. 'bars', or 'default'.
+        """
+        parts = urlsplit(url)
+        location = f'{parts.netloc.lower()}{parts.path}'
+        for name, pattern in self.endpoints:
+            if pattern.search(location):
+                return name
+        return 'default'
+
+    def is_historical(
+            self,
+            url: str,
+            params: Optional[Union[dict, list]] = None
+    ) -> bool:
+        """
+        Check whether a request is for bars of days that are over,
+        which never change.
+
+        Args:
+            url (str): The url.
+            params (Optional[Union[dict, list]]): The query params.
+
+        Returns:
+            bool: Whether the bars' range (the last part of the path,
+                e.g. Polygon's aggs, or the end param) ends before today.
+        """
+        if self.classify(url) != 'bars':
+            return False
+        base, query = self.normalize(url, params)
+        ends = [val for key, val in query if key == 'end']
+        # e.g. /v2/aggs/ticker/AAPL/range/1/day/2020-01-01/2020-12-31
+        end = ends[0] if ends else base.rstrip('/').rsplit('/', 1)[-1]
+        match = self.end_date.match(end)
+        if not match:
+            return False
+        end = match.group(1)
+        if len(end) == 13:
+            end = datetime.fromtimestamp(
+                int(end) / 1000, C.TZ).strftime(C.DATE_FMT)
+        return end < datetime.now(C.TZ).strftime(C.DATE_FMT)
+
+    def get_ttl(
+            self,
+            url: str,
+            params: Optional[Union[dict, list]] = None
+    ) -> Optional[float]:
+        """
+        Get how long a response stays fresh.
+
+        Args:
+            url (str): The url.
+            params (Optional[Union[dict, list]]): The query params.
+
+        Returns:
+            Optional[float]: The seconds or None if it never expires.
+        """
+        if self.is_historical(url, params):
+            return None
+        ttls = C.HTTP_CACHE_TTLS
+        return ttls.get(self.classify(url), ttls['default'])
+
+    def get_path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f'{key}.json')
+
+    def count(self, name: str) -> None:
+        with self.lock:
+            self.counts[name] += 1
+
+    def load(
+            self,
+            key: str,
+            url: str,
+            params: Optional[Union[dict, list]] = None
+    ) -> Optional[dict]:
+        """
+        Load a stored response that can be served.
+
+        Args:
+            key (str): The request's key (see get_key).
+            url (str): The url.
+            params (Optional[Union[dict, list]]): The query params.
+
+        Returns:
+            Optional[dict]: The status, headers and body (bytes)
+                or None if it isn't stored or (in RECORD mode) is stale.
+        """
+        try:
+            with open(self.get_path(key)) as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            # missing or unreadable
+            entry = None
+        if entry and self.mode != C.REPLAY:
+            ttl = self.get_ttl(url, params)
+            if ttl is not None and time() - entry['time'] >= ttl:
+                entry = None
+        if not entry:
+            self.count('misses')
+            return None
+        self.count('hits')
+        entry['body'] = base64.b64decode(entry['body'])
+        return entry
+
+    def save(
+            self,
+            key: str,
+            method: str,
+            url: str,
+            status: int,
+            headers: Mapping[str, str],
+            body: bytes
+    ) -> None:
+        """
+        Store a successful response (others are ignored).
+
+        Args:
+            key (str): The request's key (see get_key).
+            method (str): The HTTP method.
+            url (str): The url, stored without its query
+                (which can hold API keys).
+            status (int): The status code.
+            headers (Mapping[str, str]): The response headers.
+            body (bytes): The raw body.
+        """
+        if self.mode != C.RECORD or not 200 <= status < 300:
+            return
+        entry = {
+            'method': method.upper(),
+            'url': urlsplit(url)._replace(query='').geturl(),
+            'status': status,
+            'headers': {
+                name: headers[name] for name in self.headers
+                if name in headers
+            },
+            'body': base64.b64encode(body).decode(),
+            'time': time()
+        }
+        path = self.get_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # readers never see a partial file
+        temp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp, 'w') as file:
+            json.dump(entry, file)
+        os.replace(temp, path)
+        self.count('stores')
+
+    def miss(self, method: str, url: str) -> None:
+        # nothing can go out in REPLAY mode
+        if self.mode == C.REPLAY:
+            url = urlsplit(url)._replace(query='').geturl()
+            raise CacheMiss(f'{method.upper()} {url} is not cached.')
+
+    def to_response(self, entry: dict, url: str) -> requests.Response:
+        # a requests response of a stored entry
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response._content = entry['body']
+        response.url = url
+        response.reason = 'OK'
+        response.retries = 0
+        response.from_cache = True
+        return response
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return dict(self.counts)
+
+
+class CachedPool:
+    """
+    Serves the requests of a urllib3 pool (e.g. the one of Polygon's
+    RESTClient) from a ResponseCache.
+
+    Args:
+        pool (urllib3.PoolManager): The pool that sends the requests.
+        cache (ResponseCache): The cache.
+        before (Optional[Callable[[], Any]]):
+            Called before a request goes out,
+            e.g. to wait for a rate limit.
+    """
+
+    def __init__(
+            self,
+            pool: urllib3.PoolManager,
+            cache: ResponseCache,
+            before: Optional[Callable[[], Any]] = None
+    ) -> None:
+        self.pool = pool
+        self.cache = cache
+        self.before = before
+
+    def request(self, method, url, fields=None, headers=None, **kwargs):
+        cache = self.cache
+        key = cache.get_key(method, url, fields)
+        entry = cache.load(key, url, fields)
+        if entry:
+            return urllib3.HTTPResponse(
+                body=io.BytesIO(entry['body']),
+                headers=entry['headers'],
+                status=entry['status'],
+                preload_content=True,
+                request_method=method,
+                request_url=url)
+        cache.miss(method, url)
+        if self.before:
+            self.before()
+        response = self.pool.request(
+            method, url, fields=fields, headers=headers, **kwargs)
+        cache.save(key, method, url, response.status,
+                   response.headers, response.data)
+        return response
+
+    def __getattr__(self, name):
+        # e.g. clear
+        return getattr(self.pool, name)
@@ -1,4 +1,5 @@
 import numpy as np
+from botocore.exceptions import ClientError
 from sklearn.decomposition import PCA
 from autogluon.tabular import TabularDataset, TabularPredictor
 import pandas as pd
@@ -22,16 +23,80 @@ class Oracle:
 
     def load_model_pickle(self, name):
         filename = self.get_filename(name)
-        return self.reader.load_pickle(filename)
+        return self.reader.load_pickle(filename, read_only=True)
 
     def save_model_pickle(self, name, data):
         filename = self.get_filename(name)
         return self.writer.save_pickle(filename, data)
 
+    def load_model_manifest(self):
+        # the dtype, shape and source of each array artifact keyed by name
+        filename = self.get_filename('manifest', 'json')
+        try:
+            return self.reader.load_json(filename)
+        except (ClientError, FileNotFoundError):
+            # no artifact was saved as an array yet
+            return {}
+
+    def get_pickle_version(self, name):
+        # the ETag of an artifact's pickle (None if there is none)
+        store = self.reader.store
+        try:
+            obj = store.get_client().head_object(
+                Bucket=store.bucket_name, Key=self.get_filename(name))
+        except ClientError:
+            return None
+        return obj['ETag']
+
+    def load_model_array(self, name, mmap_mode='r'):
+        # memory maps an array artifact (read only by default),
+        # falling back to its pickle if it was never saved as an array
+        # or the pickle changed since (see sync_model_arrays)
+        entry = self.load_model_manifest().get(name)
+        if not entry or entry.get('source') != self.get_pickle_version(name):
+            return np.asarray(self.load_model_pickle(name))
+        arr = self.reader.load_array(
+            self.get_filename(name, 'npy'), mmap_mode)
+        if (
+            arr.dtype.str != entry['dtype'] or
+            list(arr.shape) != entry['shape']
+        ):
+            raise ValueError(f'{name} does not match the model manifest.')
+        return arr
+
+    def save_model_arrays(self, arrays):
+        # saves each array as .npy and records it in the manifest
+        # with the version of its pickle (if any) it was saved from
+        manifest = self.load_model_manifest()
+        for name, data in arrays.items():
+            arr = np.asarray(data)
+            self.writer.save_array(self.get_filename(name, 'npy'), arr)
+            manifest[name] = {
+                'dtype': arr.dtype.str,
+                'shape': list(arr.shape),
+                'source': self.get_pickle_version(name)
+            }
+        filename = self.get_filename('manifest', 'json')
+        return self.writer.save_json(filename, manifest)
+
+    def sync_model_arrays(self, names):
+        # saves the arrays of pickles that changed since they were saved,
+        # e.g. X and y after a new model was created
+        manifest = self.load_model_manifest()
+        stale = {
+            name: self.load_model_pickle(name) for name in names
+            if manifest.get(name, {}).get('source') !=
+            self.get_pickle_version(name)
+        }
+        if stale:
+            self.save_model_arrays(stale)
+        return list(stale)
+
     def predict(self, data):
         model_path = 'models/latest/autogluon'
         self.reader.store.download_dir(model_path)
-        model = TabularPredictor.load(model_path)
+        model = TabularPredictor.load(
+            self.reader.store.get_local_path(model_path))
         if (
                 isinstance(model, TabularPredictor) and not
                 isinstance(data, TabularDataset)
@@ -0,0 +1,192 @@
+import os
+import hashlib
+from glob import glob
+from typing import Optional
+import pandas as pd
+import Constants as C
+
+
+class BarResampler:
+    """
+    Turns 1 minute bars into N minute bars.
+
+    Bars are grouped by day and by N minute steps from the session's open
+    (e.g. 9:30, 10:00, ... for 30 minute stock bars), so no bar spans
+    two sessions and the last bar of a session ends at the close.
+    Each bar is labeled with the time it opens.
+
+    Derived bars can be cached on disk, tagged with a fingerprint of the
+    1 minute bars they came from, so the same day is only resampled once.
+
+    Args:
+        root (Optional[str]): The dir of cached bars,
+            defaults to RESAMPLE_DIR.
+    """
+
+    def __init__(self, root: Optional[str] = None) -> None:
+        self.root = root or C.RESAMPLE_DIR
+
+    def get_offset(self, time: str) -> pd.Timedelta:
+        # e.g. '09:30' -> 9 hours and 30 minutes after midnight
+        return pd.to_timedelta(f'{time}:00')
+
+    def filter_hours(
+            self,
+            df: pd.DataFrame,
+            start: str = C.MARKET_OPEN,
+            end: str = C.MARKET_CLOSE
+    ) -> pd.DataFrame:
+        """
+        Keep the bars in a session, e.g. regular trading hours.
+
+        Args:
+            df (pd.DataFrame): The bars, with datetimes in the TIME column.
+            start (str): The open, e.g. '09:30'.
+            end (str): The close, e.g. '16:00'.
+
+        Returns:
+            pd.DataFrame: The bars that open at or after start
+                and before end.
+        """
+        times = df[C.TIME]
+        since = times - times.dt.normalize()
+        return df[
+            (since >= self.get_offset(start)) &
+            (since < self.get_offset(end))
+        ]
+
+    def resample(
+            self,
+            df: pd.DataFrame,
+            min: int,
+            anchor: str = '00:00'
+    ) -> pd.DataFrame:
+        """
+        Aggregate 1 minute bars into min minute bars.
+
+        Open is the first open, High the highest high, Low the lowest low
+        and Close the last close of each bar. Vol and Trades are summed
+        and Avg is weighted by Vol (or a plain mean without volume).
+
+        Args:
+            df (pd.DataFrame): The 1 minute bars, sorted by TIME.
+            min (int): The minutes per bar.
+            anchor (str): When the first bar of a day opens,
+                e.g. '09:30' for stocks.
+
+        Returns:
+            pd.DataFrame: The bars with the columns of df.
+        """
+        if min == 1 or df.empty:
+            return df
+        times = df[C.TIME]
+        days = times.dt.normalize()
+        offset = self.get_offset(anchor)
+        width = pd.Timedelta(minutes=min)
+        # floor division, so bars before the anchor (e.g. premarket)
+        # also line up with it
+        steps = (times - days - offset) // width
+        starts = (days + offset + steps * width).rename(C.TIME)
+        grouped = df.groupby(starts, sort=True)
+        aggs = {
+            C.OPEN: 'first',
+            C.HIGH: 'max',
+            C.LOW: 'min',
+            C.CLOSE: 'last',
+            C.VOL: 'sum',
+            C.TRADES: 'sum'
+        }
+        bars = grouped.agg(
+            {col: agg for col, agg in aggs.items() if col in df})
+        if C.AVG in df:
+            avg = df[C.AVG]
+            vol = df[C.VOL] if C.VOL in df else pd.Series(0, df.index)
+            # bars without an Avg don't count toward the weights
+            weights = vol.where(avg.notna(), 0)
+            weighted = (avg * weights).groupby(starts).sum()
+            total = weights.groupby(starts).sum()
+            bars[C.AVG] = (weighted / total).where(
+                total > 0, grouped[C.AVG].mean())
+        return bars.reset_index()[list(df.columns)]
+
+    def get_version(self, df: pd.DataFrame) -> str:
+        """
+        Get a fingerprint of bars, so cached bars derived from other data
+        are never used.
+
+        Args:
+            df (pd.DataFrame): The bars.
+
+        Returns:
+            str: A short hash of the bars' columns and values.
+        """
+        digest = hashlib.sha256(','.join(df.columns).encode())
+        digest.update(
+            pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+        return digest.hexdigest()[:16]
+
+    def get_path(
+            self,
+            filename: str,
+            min: int,
+            extra_hrs: bool,
+            version: str
+    ) -> str:
+        """
+        Get the path of cached bars.
+
+        Args:
+            filename (str): The path of the 1 minute bars,
+                e.g. data/intraday/polygon/AAPL/2020-01-02.csv.
+            min (int): The minutes per bar.
+            extra_hrs (bool): Whether the bars include extended hours.
+            version (str): The fingerprint of the 1 minute bars.
+
+        Returns:
+            str: The path, e.g. {root}/data/intraday/polygon/AAPL/
+                5min_rth/2020-01-02.{version}.parquet.
+        """
+        folder, name = os.path.split(filename)
+        date = os.path.splitext(name)[0]
+        bars = f'{min}min' if extra_hrs else f'{min}min_rth'
+        return os.path.join(
+            self.root, folder, bars, f'{date}.{version}.parquet')
+
+    def load(self, path: str) -> Optional[pd.DataFrame]:
+        """
+        Load cached bars.
+
+        Args:
+            path (str): The path of the bars (see get_path).
+
+        Returns:
+            Optional[pd.DataFrame]: The bars or None if they aren't cached.
+        """
+        try:
+            return pd.read_parquet(path)
+        except (OSError, ValueError):
+            # missing or unreadable
+            return None
+
+    def save(self, path: str, df: pd.DataFrame) -> None:
+        """
+        Cache bars, replacing the bars of older versions of the same day.
+
+        Args:
+            path (str): The path of the bars (see get_path).
+            df (pd.DataFrame): The bars.
+        """
+        folder, name = os.path.split(path)
+        os.makedirs(folder, exist_ok=True)
+        date = name.split('.')[0]
+        for stale in glob(os.path.join(folder, f'{date}.*.parquet')):
+            if stale != path:
+                try:
+                    os.remove(stale)
+                except FileNotFoundError:
+                    # removed by another process
+                    pass
+        # readers never see a partial file
+        temp = f'{path}.{os.getpid()}.tmp'
+        df.to_parquet(temp, index=False)
+        os.replace(temp, path)
@@ -1,48 +1,195 @@
 import os
-from datetime import datetime, timedelta
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+from time import time
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError
 from dotenv import load_dotenv, find_dotenv
-from multiprocessing import Pool
 from Constants import PathFinder
+from Codec import Codec
+from Backends import LocalBackend, MemoryBackend
 import Constants as C
 # from typing import Optional
 
 
 class Store:
-    def __init__(self):
+    # one client (s3 or another backend, see STORAGE) per process,
+    # shared by every Store instance
+    client = None
+    client_lock = threading.Lock()
+    # every Store in the process uses the dev bucket (see use_dev)
+    dev = C.DEV
+
+    def __init__(self, root=''):
         load_dotenv(find_dotenv('config.env'))
-        self.bucket_name = self.get_bucket_name()
+        # local copies of keys live under root (default is the working dir)
+        self.root = root
         self.finder = PathFinder()
+        self.freshness = C.FRESHNESS
+        self.codec = Codec()
+        # large objects are split into parts transferred in parallel
+        self.transfer_config = TransferConfig(
+            multipart_threshold=C.S3_MULTIPART_THRESHOLD,
+            multipart_chunksize=C.S3_MULTIPART_THRESHOLD,
+            max_concurrency=C.S3_MULTIPART_CONCURRENCY
+        )
+
+    def get_local_path(self, key: str) -> str:
+        return os.path.join(self.root, key) if self.root else key
+
+    @property
+    def bucket_name(self):
+        return self.get_bucket_name()
 
     def get_bucket_name(self):
         return os.environ.get(
-            'S3_BUCKET') if not C.DEV else os.environ.get('S3_DEV_BUCKET')
+            'S3_BUCKET') if not Store.dev else os.environ.get('S3_DEV_BUCKET')
+
+    def get_client(self):
+        # lazily build the shared client (boto3 clients are thread-safe)
+        if Store.client is None:
+            with Store.client_lock:
+                if Store.client is None:
+                    Store.client = self.get_backend()
+        return Store.client
+
+    def get_backend(self):
+        # the other backends speak the same subset of the s3 client API
+        if C.STORAGE == C.LOCAL:
+            return LocalBackend(C.STORAGE_ROOT)
+        if C.STORAGE == C.MEMORY:
+            return MemoryBackend()
+        config = Config(max_pool_connections=C.S3_MAX_POOL_CONNECTIONS)
+        session = boto3.session.Session()
+        return session.client('s3', config=config)
 
-    def get_bucket(self):
-        s3 = boto3.resource('s3')
-        bucket = s3.Bucket(self.bucket_name)
-        return bucket
+    @staticmethod
+    def reset_client():
+        # connections can't be shared with a forked process
+        # (the other backends hold no connections)
+        if C.STORAGE == C.S3:
+            Store.client = None
+        Store.client_lock = threading.Lock()
+
+    def get_digest(self, path: str) -> str:
+        # sha256 of a local file
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1024 ** 2), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def get_stored_digest(self, key: str) -> str:
+        # sha256 of the plain bytes an object was uploaded from (if known)
+        try:
+            obj = self.get_client().head_object(
+                Bucket=self.bucket_name, Key=key.replace('\\', '/'))
+        except ClientError:
+            return None
+        return obj.get('Metadata', {}).get(C.DIGEST)
 
-    def upload_file(self, path):
-        bucket = self.get_bucket()
+    def upload_file(self, path, digest=None) -> int:
+        # returns the number of bytes sent
+        # digest is stored with the object (see get_stored_digest)
         key = path.replace('\\', '/')
-        bucket.upload_file(path, key)
+        codec = self.finder.get_codec(path)
+        args = {'Metadata': {C.DIGEST: digest}} if digest else {}
+        if codec:
+            num_bytes = self.upload_encoded(path, key, codec, args)
+        else:
+            self.get_client().upload_file(
+                path, self.bucket_name, key,
+                ExtraArgs=args, Config=self.transfer_config)
+            num_bytes = os.path.getsize(path)
+        # the size of an encoded object doesn't match its local copy,
+        # so its ETag is needed to tell whether the copy is current
+        if self.freshness == C.ETAG or codec:
+            # the local copy is now current
+            self.write_sidecar(path, self.get_client().head_object(
+                Bucket=self.bucket_name, Key=key))
+        return num_bytes
+
+    def upload_encoded(
+            self, path: str, key: str, codec: str, args: dict) -> int:
+        # compresses path into a spooled buffer and uploads it
+        with tempfile.SpooledTemporaryFile(
+                max_size=C.S3_MULTIPART_THRESHOLD) as buffer:
+            with open(path, 'rb') as file:
+                self.codec.compress(file, buffer, codec)
+            num_bytes = buffer.tell()
+            buffer.seek(0)
+            self.get_client().upload_fileobj(
+                buffer, self.bucket_name, key,
+                ExtraArgs={**args, 'ContentEncoding': codec},
+                Config=self.transfer_config)
+        return num_bytes
 
-    def upload_dir(self, **kwargs):
+    def decode_file(self, temp: str, path: str, encoding=None) -> None:
+        # moves a downloaded object into place, decompressing it
+        # only if it's tagged with a ContentEncoding
+        # (plain objects, e.g. a .npy, can start with the same bytes)
+        if encoding in self.codec.magic:
+            plain = f'{temp}.plain'
+            with open(temp, 'rb') as src, open(plain, 'wb') as dst:
+                self.codec.decompress(src, dst, encoding)
+            os.replace(plain, path)
+            os.remove(temp)
+        else:
+            os.replace(temp, path)
+
+    def transfer(self, func, keys: list[str], action: str) -> dict:
+        # runs func (returning bytes moved) on each key in a thread pool
+        # and collects per key errors instead of aborting the batch
+        start = time()
+        num_bytes = 0
+        errors = {}
+        with ThreadPoolExecutor(max_workers=C.S3_TRANSFER_WORKERS) as pool:
+            futures = {pool.submit(func, key): key for key in keys}
+            for future in as_completed(futures):
+                try:
+                    num_bytes += future.result()
+                except Exception as e:
+                    errors[futures[future]] = e
+        seconds = time() - start
+        report = {
+            'files': len(keys) - len(errors),
+            'bytes': num_bytes,
+            'seconds': seconds,
+            'throughput': num_bytes / seconds if seconds else 0,
+            'errors': errors
+        }
+        if keys:
+            print(f'{action.capitalize()}ed {report["files"]}/{len(keys)} '
+                  f'files ({num_bytes / 1e6:.1f} MB) in {seconds:.1f}s '
+                  f'at {report["throughput"] / 1e6:.1f} MB/s.')
+        for key, error in errors.items():
+            print(f'Failed to {action} {key}: {error}')
+        return report
+
+    def upload_dir(self, **kwargs) -> dict:
         paths = self.finder.get_all_paths(**kwargs)
-        with Pool() as p:
-            p.map(self.upload_file, paths)
+        return self.transfer(self.upload_file, paths, 'upload')
 
     def delete_objects(self, keys: list[str]) -> None:
         if keys:
             objects = [{'Key': key.replace('\\', '/')} for key in keys]
-            bucket = self.get_bucket()
-            bucket.delete_objects(Delete={'Objects': objects})
+            self.get_client().delete_objects(
+                Bucket=self.bucket_name, Delete={'Objects': objects})
+
+    def get_objects(self, filter: str = '') -> list[dict]:
+        paginator = self.get_client().get_paginator('list_objects_v2')
+        pages = paginator.paginate(Bucket=self.bucket_name, Prefix=filter)
+        return [obj for page in pages for obj in page.get('Contents', [])]
 
     def get_keys(self, filter: str = '') -> list[str]:
-        bucket = self.get_bucket()
-        keys = [obj.key for obj in bucket.objects.filter(Prefix=filter)]
+        keys = [obj['Key'] for obj in self.get_objects(filter)]
         return keys
 
     def key_exists(self, key: str, download=False) -> bool:
@@ -51,39 +198,134 @@ class Store:
             if download:
                 self.download_file(key)
             else:
-                bucket = self.get_bucket()
-                bucket.Object(key).load()
+                self.get_client().head_object(
+                    Bucket=self.bucket_name, Key=key)
         except ClientError:
             return False
         else:
             return True
 
     def download_file(self, key: str) -> None:
+        path = self.get_local_path(key)
+        temp = f'{path}.tmp'
+        s3_key = key.replace('\\', '/')
         try:
-            self.finder.make_path(key)
-            with open(key, 'wb') as file:
-                bucket = self.get_bucket()
-                s3_key = key.replace('\\', '/')
-                bucket.download_fileobj(s3_key, file)
+            # the object's encoding (if any)
+            obj = self.get_client().head_object(
+                Bucket=self.bucket_name, Key=s3_key)
+            self.finder.make_path(path)
+            with open(temp, 'wb') as file:
+                self.get_client().download_fileobj(
+                    self.bucket_name, s3_key, file,
+                    Config=self.transfer_config)
+            # encoded objects are stored plain locally
+            self.decode_file(temp, path, obj.get('ContentEncoding'))
         except ClientError as e:
             print(f'{key} does not exist in S3.')
-            os.remove(key)
+            if os.path.exists(path):
+                os.remove(path)
             raise e
+        finally:
+            # whatever stopped the download (e.g. missing credentials,
+            # a dropped connection or ctrl-c), no partial file is left
+            for partial in [temp, f'{temp}.plain']:
+                if os.path.exists(partial):
+                    os.remove(partial)
 
-    def download_dir(self, path: str) -> None:
-        keys = self.get_keys(path)
-        with Pool() as p:
-            p.starmap(self.key_exists, zip(keys, [True] * len(keys)))
+    def read_sidecar(self, key: str) -> dict:
+        sidecar = self.get_local_path(self.finder.get_meta_path(key))
+        if not os.path.exists(sidecar):
+            return {}
+        with open(sidecar, 'r') as file:
+            return json.load(file)
+
+    def write_sidecar(self, key: str, obj: dict) -> None:
+        sidecar = self.get_local_path(self.finder.get_meta_path(key))
+        self.finder.make_path(sidecar)
+        meta = {
+            'ETag': obj['ETag'],
+            'LastModified': obj['LastModified'].isoformat()
+        }
+        with open(sidecar, 'w') as file:
+            json.dump(meta, file)
+
+    def revalidate_file(self, key: str) -> bool:
+        # conditional GET that only transfers the body if the ETag changed
+        # returns whether the local copy was (re)downloaded
+        s3_key = key.replace('\\', '/')
+        path = self.get_local_path(key)
+        params = {'Bucket': self.bucket_name, 'Key': s3_key}
+        etag = os.path.exists(path) and self.read_sidecar(key).get('ETag')
+        if etag:
+            params['IfNoneMatch'] = etag
+        try:
+            obj = self.get_client().get_object(**params)
+        except ClientError as e:
+            if e.response['Error']['Code'] in {'304', 'NotModified'}:
+                return False
+            print(f'{key} does not exist in S3.')
+            if os.path.exists(path):
+                os.remove(path)
+            raise e
+        self.finder.make_path(path)
+        temp = f'{path}.tmp'
+        with open(temp, 'wb') as file:
+            shutil.copyfileobj(obj['Body'], file)
+        self.decode_file(temp, path, obj.get('ContentEncoding'))
+        self.write_sidecar(key, obj)
+        return True
+
+    def stream_object(self, key: str, etag: str = None) -> tuple:
+        # returns a plain stream of the object's body and its ETag
+        # (no stream if the object still matches etag)
+        params = {'Bucket': self.bucket_name, 'Key': key.replace('\\', '/')}
+        if etag:
+            params['IfNoneMatch'] = etag
+        try:
+            obj = self.get_client().get_object(**params)
+        except ClientError as e:
+            if e.response['Error']['Code'] in {'304', 'NotModified'}:
+                return None, etag
+            raise e
+        body = obj['Body']
+        encoding = obj.get('ContentEncoding')
+        if encoding in self.codec.magic:
+            body = self.codec.open(body, encoding)
+        return body, obj['ETag']
+
+    def is_current(self, obj: dict) -> bool:
+        # given a listed object, return whether the local copy matches it
+        path = self.get_local_path(obj['Key'])
+        if not os.path.exists(path):
+            return False
+        etag = self.read_sidecar(obj['Key']).get('ETag')
+        if etag:
+            return etag == obj['ETag']
+        then = datetime.fromtimestamp(os.path.getmtime(path), timezone.utc)
+        return (os.path.getsize(path) == obj['Size'] and
+                then >= obj['LastModified'])
+
+    def download_dir(self, path: str) -> dict:
+        # only fetch objects that are missing or changed locally
+        objs = {
+            obj['Key']: obj for obj in self.get_objects(path)
+            if not obj['Key'].endswith('/') and not self.is_current(obj)
+        }
+
+        def download(key):
+            self.download_file(key)
+            self.write_sidecar(key, objs[key])
+            return objs[key]['Size']
+        return self.transfer(download, list(objs), 'download')
 
     def copy_object(self, src: str, dst: str) -> None:
         src = src.replace('\\', '/')
         dst = dst.replace('\\', '/')
-        bucket = self.get_bucket()
         copy_source = {
             'Bucket': self.bucket_name,
             'Key': src
         }
-        bucket.copy(copy_source, dst)
+        self.get_client().copy(copy_source, self.bucket_name, dst)
 
     def rename_key(self, old_key: str, new_key: str) -> None:
         old_key = old_key.replace('\\', '/')
@@ -93,9 +335,8 @@ class Store:
 
     def last_modified(self, key: str) -> datetime:
         key = key.replace('\\', '/')
-        bucket = self.get_bucket()
-        obj = bucket.Object(key)
-        then = obj.last_modified.replace(tzinfo=None)
+        obj = self.get_client().head_object(Bucket=self.bucket_name, Key=key)
+        then = obj['LastModified'].replace(tzinfo=None)
         return then
 
     def modified_delta(self, key: str) -> timedelta:
@@ -103,3 +344,6 @@ class Store:
         then = self.last_modified(key)
         now = datetime.utcnow()
         return now - then
+
+
+os.register_at_fork(after_in_child=Store.reset_client)
@@ -0,0 +1,148 @@
+import os
+import json
+import threading
+from time import sleep, time
+from typing import Any, Callable, Optional
+import Constants as C
+
+try:
+    import fcntl
+except ImportError:
+    # no file locks (e.g. Windows), so buckets are only shared by threads
+    fcntl = None
+
+
+class TokenBucket:
+    """
+    Rate limits calls to a provider across every thread and process
+    on the machine.
+
+    The bucket holds up to capacity tokens and refills at rate tokens
+    per second. Each call takes a token and only waits when the bucket
+    is empty, so bursts below the limit go through without sleeping.
+
+    The state (tokens and wait metrics) lives in a small file under root
+    that's read and written under an exclusive lock,
+    so separate processes (e.g. the workers of update_ohlc.py)
+    draw from the same bucket.
+
+    Args:
+        name (str): The name of the bucket, e.g. the provider.
+        rate (float): The tokens added per second.
+        capacity (float): The most tokens the bucket can hold (burst size).
+        root (Optional[str]): The dir of the state file,
+            defaults to RATE_LIMIT_DIR.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            rate: float,
+            capacity: float = 1,
+            root: Optional[str] = None
+    ) -> None:
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self.root = root or C.RATE_LIMIT_DIR
+        self.path = os.path.join(self.root, f'{name}.json')
+        self.lock = threading.Lock()
+        # used instead of the file when there are no file locks
+        self.state = None
+
+    def get_initial_state(self) -> dict:
+        return {
+            'tokens': self.capacity,
+            'time': time(),
+            'calls': 0,
+            'waits': 0,
+            'wait_seconds': 0.0,
+            'max_wait': 0.0
+        }
+
+    def update(self, func: Callable[[dict], Any]) -> Any:
+        # applies func to the shared state while holding every lock
+        with self.lock:
+            if not fcntl:
+                self.state = self.state or self.get_initial_state()
+                return func(self.state)
+            os.makedirs(self.root, exist_ok=True)
+            with open(self.path, 'a+') as file:
+                fcntl.flock(file, fcntl.LOCK_EX)
+                try:
+                    file.seek(0)
+                    raw = file.read()
+                    state = json.loads(raw) if raw else (
+                        self.get_initial_state())
+                    result = func(state)
+                    file.seek(0)
+                    file.truncate()
+                    json.dump(state, file)
+                    file.flush()
+                    return result
+                finally:
+                    fcntl.flock(file, fcntl.LOCK_UN)
+
+    def refill(self, state: dict) -> None:
+        now = time()
+        elapsed = max(now - state['time'], 0)
+        state['tokens'] = min(
+            self.capacity, state['tokens'] + elapsed * self.rate)
+        state['time'] = now
+
+    def acquire(self, tokens: float = 1) -> float:
+        """
+        Take tokens from the bucket, waiting until there are enough.
+
+        Args:
+            tokens (float): The tokens a call costs.
+
+        Returns:
+            float: The seconds spent waiting.
+        """
+        start = time()
+
+        def take(state):
+            self.refill(state)
+            if state['tokens'] >= tokens:
+                state['tokens'] -= tokens
+                waited = time() - start
+                state['calls'] += 1
+                if waited > 0.001:
+                    state['waits'] += 1
+                    state['wait_seconds'] += waited
+                    state['max_wait'] = max(state['max_wait'], waited)
+                return 0
+            # the time until enough tokens have been added
+            return (tokens - state['tokens']) / self.rate
+
+        while True:
+            delay = self.update(take)
+            if not delay:
+                return time() - start
+            sleep(delay)
+
+    def stats(self) -> dict:
+        """
+        Get the metrics of the bucket, shared by every process.
+
+        Returns:
+            dict: The calls, how many of them waited,
+                the total and max seconds waited and the tokens left.
+        """
+        def read(state):
+            self.refill(state)
+            return {
+                key: state[key] for key in
+                ['calls', 'waits', 'wait_seconds', 'max_wait', 'tokens']
+            }
+        return self.update(read)
+
+    def reset(self) -> None:
+        """
+        Fill the bucket and clear its metrics.
+        """
+        def clear(state):
+            state.clear()
+            state.update(self.get_initial_state())
+        self.update(clear)
@@ -1,11 +1,57 @@
 from time import sleep
 from typing import Union
 from datetime import datetime, timedelta, tzinfo
+import pandas as pd
+from pandas.tseries.holiday import (
+    AbstractHolidayCalendar, Holiday, GoodFriday, USMartinLutherKingJr,
+    USPresidentsDay, USMemorialDay, USLaborDay, USThanksgivingDay,
+    nearest_workday, sunday_to_monday)
+from pandas.tseries.offsets import CustomBusinessDay
 from Constants import TZ, UTC, DATE_FMT, TIME_FMT, PRECISE_TIME_FMT
 
 FlexibleDate = Union[datetime, str]
 
 
+class MarketCalendar(AbstractHolidayCalendar):
+    """
+    The days the US stock market (NYSE and NASDAQ) is closed
+    on a weekday: holidays and unscheduled closures.
+    """
+
+    rules = [
+        # a Saturday New Year's Day isn't observed
+        Holiday('New Years Day', month=1, day=1,
+                observance=sunday_to_monday),
+        USMartinLutherKingJr,
+        USPresidentsDay,
+        GoodFriday,
+        USMemorialDay,
+        Holiday('Juneteenth', month=6, day=19, start_date='2022-01-01',
+                observance=nearest_workday),
+        Holiday('Independence Day', month=7, day=4,
+                observance=nearest_workday),
+        USLaborDay,
+        USThanksgivingDay,
+        Holiday('Christmas', month=12, day=25, observance=nearest_workday)
+    ]
+    # e.g. 9/11, Hurricane Sandy and national days of mourning
+    closures = [
+        '2001-09-11', '2001-09-12', '2001-09-13', '2001-09-14',
+        '2004-06-11', '2007-01-02', '2012-10-29', '2012-10-30',
+        '2018-12-05', '2025-01-09'
+    ]
+
+    def holidays(self, start=None, end=None, return_name=False):
+        holidays = super().holidays(start, end, return_name)
+        if return_name:
+            return holidays
+        closures = pd.DatetimeIndex(self.closures)
+        closures = closures[
+            (closures >= (start or self.start_date)) &
+            (closures <= (end or self.end_date))]
+        return holidays.union(closures)
+
+
 class TimeTraveller:
     """
     A class to handle time-related operations, such as calculating deltas,
@@ -145,6 +191,39 @@ class TimeTraveller:
             dates = [date.strftime(format) for date in dates]
         return dates
 
+    def get_market_dates(
+        self,
+        start: FlexibleDate,
+        end: FlexibleDate,
+        crypto: bool = False,
+        format: str = DATE_FMT
+    ) -> list[FlexibleDate]:
+        """
+        Get the days the market trades on between two dates (inclusive).
+
+        Args:
+            start (FlexibleDate):
+                The first date, can be a datetime object or a string.
+            end (FlexibleDate):
+                The last date, can be a datetime object or a string.
+            crypto (bool):
+                Whether the market is crypto, which trades every day.
+            format (str):
+                The format to return the dates in, defaults to DATE_FMT.
+
+        Returns:
+            list[FlexibleDate]: The trading days, skipping weekends
+            and market holidays (see MarketCalendar) for stocks.
+        """
+        start = pd.Timestamp(start).tz_localize(None).normalize()
+        end = pd.Timestamp(end).tz_localize(None).normalize()
+        freq = 'D' if crypto else CustomBusinessDay(
+            calendar=MarketCalendar())
+        dates = pd.date_range(start, end, freq=freq)
+        if format:
+            return list(dates.strftime(format))
+        return list(dates.to_pydatetime())
+
     def get_time(self, time: str) -> datetime.time:
         """
         Converts time string to a time object.
@@ -1,8 +1,10 @@
-import os
+from Storage import Store
 import Constants as C  # noqa autopep8
 
 
 class SwissArmyKnife:
+    # values that can't hold the attribute (and recurse forever, e.g. 1.real)
+    leaves = (bool, int, float, complex, str, bytes, type(None))
 
     def replace_attr(self, obj, find_key, replace_val):
         try:
@@ -10,6 +12,8 @@ class SwissArmyKnife:
             setattr(obj, find_key, replace_val)
             return obj
         except AttributeError:
+            if isinstance(obj, self.leaves):
+                return obj
             attrs = [attr for attr in dir(obj) if not (
                 attr.startswith('__') and attr.endswith('__'))]
             for key in attrs:
@@ -23,9 +27,7 @@ class SwissArmyKnife:
             return obj
 
     def use_dev(self, obj):
-        # or simply make DevStore class that has s3 dev bucket name
-        dev_obj = obj
+        # points every Store in the process at the dev bucket
         if not C.CI:
-            dev_bucket = os.environ['S3_DEV_BUCKET']
-            dev_obj = self.replace_attr(obj, 'bucket_name', dev_bucket)
-        return dev_obj
+            Store.dev = True
+        return obj
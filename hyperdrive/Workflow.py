@@ -32,7 +32,10 @@ class Flow:
         duration = timedelta(seconds=POLY_FREE_DELAY)
         now = datetime.utcnow()
 
-        if workflow_name in {'ohlc', 'intraday'}:
+        if workflow_name == 'ohlc':
+            # a grouped call per day for every stock (see save_ohlc_grouped)
+            duration *= FEW + num_crypto
+        elif workflow_name == 'intraday':
             duration *= (num_stock + num_crypto) * FEW
         elif workflow_name in {'dividends', 'splits'}:
             duration *= num_stock
@@ -0,0 +1,27 @@
+import sys
+sys.path.append('hyperdrive')
+from Catalog import Librarian  # noqa autopep8
+import Constants as C  # noqa autopep8
+
+# Builds the dataset manifests (see MANIFESTS) from a single listing
+# of the bucket, e.g. before turning manifests on for existing data.
+# Rows, time range and hash are only known for files written afterwards.
+
+librarian = Librarian()
+finder = librarian.store.finder
+datasets = {}
+
+for obj in librarian.store.get_objects(f'{C.DATA_DIR}/'):
+    dataset = finder.get_dataset_dir(obj['Key'])
+    if dataset:
+        datasets.setdefault(dataset, {})[obj['Key']] = {
+            'size': obj['Size'],
+            'rows': None,
+            'min': None,
+            'max': None,
+            'hash': None
+        }
+
+for dataset, files in datasets.items():
+    librarian.apply(dataset, files)
+    print(f'{dataset}: {len(files)} files')
@@ -0,0 +1,35 @@
+import os
+import sys
+import shutil
+sys.path.append('hyperdrive')
+from DataSource import MarketData  # noqa autopep8
+import Constants as C  # noqa autopep8
+
+# Folds the OHLC partitions written by save_ohlc (see OHLC_PARTITION)
+# back into each symbol's ohlc file.
+
+md = MarketData()
+
+for provider in C.folders:
+    md.provider = provider
+    prefix = f'{C.DATA_DIR}/{C.OHLC_DIR}/{C.folders[provider]}/'
+    # partition keys look like prefix/SYMBOL/partition.ext
+    symbols = {
+        key[len(prefix):].split('/')[0]
+        for key in md.reader.store.get_keys(prefix)
+        if '/' in key[len(prefix):]
+    }
+    for symbol in symbols:
+        try:
+            md.compact_ohlc(symbol)
+        except Exception as e:
+            print(f'{provider} OHLC compaction failed for {symbol}.')
+            print(e)
+        finally:
+            filename = md.finder.get_ohlc_path(symbol, provider)
+            partition_dir = md.finder.get_ohlc_partition_dir(
+                symbol, provider)
+            if C.CI and os.path.exists(filename):
+                os.remove(filename)
+            if C.CI and os.path.exists(partition_dir):
+                shutil.rmtree(partition_dir)
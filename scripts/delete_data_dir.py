@@ -1,10 +1,11 @@
 import sys
 sys.path.append('hyperdrive')
 from Storage import Store  # noqa autopep8
+from Catalog import Librarian  # noqa autopep8
 
 store = Store()
-
-bucket = store.get_bucket()
+# deleted files leave their datasets' manifests too
+librarian = Librarian(store)
 
 
 def chunks(lst, size):
@@ -12,7 +13,9 @@ def chunks(lst, size):
     return [lst[i:i+size] for i in range(0, len(lst), size)]
 
 
-keys = [obj.key for obj in bucket.objects.filter(Prefix='data\\')]
+# through the backend selected by STORAGE
+keys = store.get_keys('data\\')
 keys = chunks(keys, 500)
 for key in keys:
     store.delete_objects(key)
+    librarian.forget_all(key)
@@ -1,10 +1,11 @@
 import sys
 sys.path.append('hyperdrive')
 from Storage import Store  # noqa autopep8
+from Catalog import Librarian  # noqa autopep8
 
 store = Store()
-
-bucket = store.get_bucket()
+# deleted files leave their datasets' manifests too
+librarian = Librarian(store)
 
 symbols = ['IAC', 'OTIS', 'VTRS']
 
@@ -15,8 +16,9 @@ def chunks(lst, size):
 
 
 for symbol in symbols:
-    keys = [obj.key for obj in bucket.objects.filter(
-        Prefix=f'data/intraday/polygon/{symbol}\\')]
+    # through the backend selected by STORAGE
+    keys = store.get_keys(f'data/intraday/polygon/{symbol}\\')
     keys = chunks(keys, 500)
     for key in keys:
         store.delete_objects(key)
+        librarian.forget_all(key)
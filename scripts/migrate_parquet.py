@@ -0,0 +1,38 @@
+import os
+import sys
+from multiprocessing import Pool
+sys.path.append('hyperdrive')
+from FileOps import FileReader, FileWriter  # noqa autopep8
+import Constants as C  # noqa autopep8
+
+# One-shot conversion of the time series datasets in S3 from csv to parquet.
+# The csv objects are left in place, so unsetting DATA_FMT rolls back.
+
+reader = FileReader()
+writer = FileWriter()
+src_ext = f'.{C.CSV}'
+dst_ext = f'.{C.PARQUET}'
+
+
+def migrate(key):
+    dst = f'{key[:-len(src_ext)]}{dst_ext}'
+    try:
+        writer.save_csv(dst, reader.load_csv(key))
+    except Exception as e:
+        print(f'Parquet migration failed for {key}.')
+        print(e)
+    finally:
+        for filename in [key, dst]:
+            if os.path.exists(filename):
+                os.remove(filename)
+
+
+if __name__ == '__main__':
+    keys = [
+        key for folder in C.COLUMNAR_DIRS
+        for key in reader.store.get_keys(f'{C.DATA_DIR}/{folder}/')
+        if key.endswith(src_ext)
+    ]
+    print(f'Migrating {len(keys)} files to parquet.')
+    with Pool() as p:
+        p.map(migrate, keys)
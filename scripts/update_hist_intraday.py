@@ -4,36 +4,63 @@ from time import sleep
 from datetime import datetime
 sys.path.append('hyperdrive')
 from DataSource import Polygon  # noqa autopep8
-from Constants import CI, POLY_CRYPTO_SYMBOLS, TIME_FMT  # noqa autopep8
+from Backfill import BackfillPlanner, PENDING  # noqa autopep8
+from Constants import CI, POLY_CRYPTO_SYMBOLS, TIME_FMT, DRY_RUN, INTRA_DIR  # noqa autopep8
 
 
 poly = Polygon(os.environ['POLYGON'])
 stock_symbols = poly.get_symbols()
 crypto_symbols = POLY_CRYPTO_SYMBOLS
 all_symbols = stock_symbols + crypto_symbols
+planner = BackfillPlanner(poly, INTRA_DIR)
+# calls between checks of the time
+calls_per_batch = 100
+
+
+def wait():
+    hour = datetime.now().hour
+    while hour in set(range(8, 12)):
+        print(datetime.now().strftime(TIME_FMT))
+        print('Sleeping for 1 hr')
+        sleep(3600)
+        hour = datetime.now().hour
+
+
+def remove_local_files(plan):
+    # the files of finished tasks are already uploaded
+    for task in plan['tasks']:
+        if task['status'] == PENDING:
+            continue
+        for date in task['dates']:
+            filename = poly.finder.get_intraday_path(
+                task['symbols'][0], date, poly.provider)
+            if os.path.exists(filename):
+                os.remove(filename)
 
 
 def update_poly_intraday():
-    for symbol in all_symbols:
-        now = datetime.now()
-        hour = now.hour
-        while hour in set(range(8, 12)):
-            print(datetime.now().strftime(TIME_FMT))
-            print('Sleeping for 1 hr')
-            sleep(3600)
-            hour = datetime.now().hour
-        filenames = []
+    # resumes the last plan until it's done,
+    # then plans the dates that aren't stored yet
+    plan = planner.load_plan()
+    if not plan or not planner.summarize(plan)[PENDING]:
+        plan = planner.make_plan(
+            planner.find_gaps(all_symbols, timeframe='30d'))
+    report = planner.summarize(plan)
+    print(f'{len(plan["gaps"])} symbols with gaps, '
+          f'{report["remaining_calls"]} calls left '
+          f'(~{plan["seconds"] / 60:.0f} min for the whole plan)')
+    if DRY_RUN:
+        for symbol, ranges in plan['gaps'].items():
+            print(f'{symbol}: {ranges}')
+        return
+    while report[PENDING]:
+        wait()
         try:
-            filenames = poly.save_intraday(
-                symbol=symbol, timeframe='30d', retries=1)
-        except Exception as e:
-            print(f'Polygon.io intraday update failed for {symbol}.')
-            print(e)
+            report = planner.execute(plan, max_calls=calls_per_batch)
+            print(report)
         finally:
             if CI:
-                for filename in filenames:
-                    if os.path.exists(filename):
-                        os.remove(filename)
+                remove_local_files(plan)
 
 
 update_poly_intraday()
@@ -34,15 +34,21 @@ timeframe = '10y'
 
 
 def update_alpc_ohlc():
-    for symbol in alpc_symbols:
-        filename = PathFinder().get_ohlc_path(
-            symbol=symbol, provider=alpc.provider)
-        try:
-            alpc.save_ohlc(symbol=symbol, timeframe=timeframe)
-        except Exception as e:
-            print(f'Alpaca OHLC update failed for {symbol}.')
-            print(e)
-        finally:
+    # many symbols per request instead of one
+    try:
+        # only fetches what's missing from the stored data
+        result = alpc.save_ohlc_many(
+            list(alpc_symbols), timeframe=timeframe, dry_run=C.DRY_RUN)
+        if C.DRY_RUN:
+            for plan in result.values():
+                print(plan)
+    except Exception as e:
+        print('Alpaca OHLC update failed.')
+        print(e)
+    finally:
+        for symbol in alpc_symbols:
+            filename = PathFinder().get_ohlc_path(
+                symbol=symbol, provider=alpc.provider)
             if C.CI and os.path.exists(filename):
                 os.remove(filename)
 
@@ -15,17 +15,21 @@ alpc_symbols = set(alpc.get_ndx()[C.SYMBOL]).union(stock_symbols)
 
 
 def update_poly_ohlc():
-    for symbol in poly_symbols:
-        try:
-            if not C.TEST:
-                filename = poly.save_ohlc(
-                    symbol=symbol, timeframe=C.FEW_DAYS, retries=1)
-            with counter.get_lock():
-                counter.value += 1
-        except Exception as e:
-            print(f'Polygon.io OHLC update failed for {symbol}.')
-            print(e)
-        finally:
+    # a grouped call per day for every stock instead of a call per symbol
+    # every symbol that didn't fail counts, including current ones
+    try:
+        if C.TEST:
+            num_saved = len(poly_symbols)
+        else:
+            num_saved = len(poly.save_ohlc_grouped(
+                poly_symbols, timeframe=C.FEW_DAYS))
+        with counter.get_lock():
+            counter.value += num_saved
+    except Exception as e:
+        print('Polygon.io OHLC update failed.')
+        print(e)
+    finally:
+        for symbol in poly_symbols:
             filename = PathFinder().get_ohlc_path(
                 symbol=symbol, provider=poly.provider)
             if C.CI and os.path.exists(filename):
@@ -33,16 +37,18 @@ def update_poly_ohlc():
 
 
 def update_alpc_ohlc():
-    for symbol in alpc_symbols:
-        try:
-            filename = alpc.save_ohlc(
-                symbol=symbol, timeframe=C.FEW_DAYS, retries=1)
-            with counter.get_lock():
-                counter.value += 1
-        except Exception as e:
-            print(f'Alpaca OHLC update failed for {symbol}.')
-            print(e)
-        finally:
+    # many symbols per request instead of one
+    try:
+        # every symbol that didn't fail, including current ones
+        filenames = alpc.save_ohlc_many(
+            list(alpc_symbols), timeframe=C.FEW_DAYS, retries=1)
+        with counter.get_lock():
+            counter.value += len(filenames)
+    except Exception as e:
+        print('Alpaca OHLC update failed.')
+        print(e)
+    finally:
+        for symbol in alpc_symbols:
             filename = PathFinder().get_ohlc_path(
                 symbol=symbol, provider=alpc.provider)
             if C.CI and os.path.exists(filename):
@@ -56,5 +62,9 @@ p2.start()
 p1.join()
 p2.join()
 
+# the buckets are shared, so the parent sees the workers' waits
+for provider in [poly, alpc]:
+    print(f'{provider.provider} rate limit: {provider.get_rate_stats()}')
+
 if counter.value / (len(poly_symbols) + len(alpc_symbols)) < 0.95:
     exit(1)
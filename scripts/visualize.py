@@ -7,8 +7,11 @@ oracle = Oracle()
 metadata = oracle.reader.load_json('models/latest/metadata.json')
 features = metadata['features']
 
-X = oracle.load_model_pickle('X')
-y = oracle.load_model_pickle('y')
+# create_model saves X and y as pickles, converted once per model
+oracle.sync_model_arrays(['X', 'y'])
+# memory mapped, so X isn't read (or copied) until it's used
+X = oracle.load_model_array('X')
+y = oracle.load_model_array('y')
 
 # 2D
 (
@@ -20,11 +23,19 @@ y = oracle.load_model_pickle('y')
 ) = oracle.visualize(X=X, y=y, dimensions=2, refinement=10)
 
 
+# everything is still pickled for existing readers and the regular
+# arrays are also saved to be memory mapped (see load_model_array),
+# the buy / sell points per component are ragged, so they're only pickled
 oracle.save_model_pickle('2D/actual', actual_2D)
 oracle.save_model_pickle('2D/centroid', centroid_2D)
 oracle.save_model_pickle('2D/radius', radius_2D)
 oracle.save_model_pickle('2D/grid', grid_2D)
 oracle.save_model_pickle('2D/preds', preds_2D)
+oracle.save_model_arrays({
+    '2D/centroid': centroid_2D,
+    '2D/grid': grid_2D,
+    '2D/preds': preds_2D
+})
 
 # 3D
 (
@@ -41,6 +52,11 @@ oracle.save_model_pickle('3D/centroid', centroid_3D)
 oracle.save_model_pickle('3D/radius', radius_3D)
 oracle.save_model_pickle('3D/grid', grid_3D)
 oracle.save_model_pickle('3D/preds', preds_3D)
+oracle.save_model_arrays({
+    '3D/centroid': centroid_3D,
+    '3D/grid': grid_3D,
+    '3D/preds': preds_3D
+})
 
 
 # Don't actually need to save the radius =>
@@ -0,0 +1,91 @@
+import io
+import os
+import sys
+import shutil
+import pytest
+from botocore.exceptions import ClientError
+sys.path.append('hyperdrive')
+from Backends import Backend, LocalBackend, MemoryBackend  # noqa autopep8
+import Constants as C  # noqa autopep8
+
+root = 'test/storage'
+backends = [MemoryBackend(), LocalBackend(root)]
+bucket = 'bucket'
+key = 'data/test.csv'
+body = b'Time,Open\n2020-01-02,300.35\n'
+
+
+@pytest.mark.parametrize('backend', backends)
+class TestBackend:
+    def test_put_object(self, backend):
+        etag = backend.put_object(
+            Bucket=bucket, Key=key, Body=body, IfNoneMatch='*')['ETag']
+        # conditional puts fail if the object changed
+        with pytest.raises(ClientError) as e:
+            backend.put_object(
+                Bucket=bucket, Key=key, Body=body, IfNoneMatch='*')
+        assert e.value.response['Error']['Code'] == 'PreconditionFailed'
+        with pytest.raises(ClientError):
+            backend.put_object(
+                Bucket=bucket, Key=key, Body=body, IfMatch='"x"')
+        backend.put_object(Bucket=bucket, Key=key, Body=body, IfMatch=etag)
+
+    def test_get_object(self, backend):
+        obj = backend.get_object(Bucket=bucket, Key=key)
+        assert obj['Body'].read() == body
+        assert obj['ContentLength'] == len(body)
+        with pytest.raises(ClientError) as e:
+            backend.get_object(Bucket=bucket, Key=key, IfNoneMatch=obj['ETag'])
+        assert e.value.response['Error']['Code'] == '304'
+        with pytest.raises(ClientError) as e:
+            backend.get_object(Bucket=bucket, Key='absent')
+        assert e.value.response['Error']['Code'] == 'NoSuchKey'
+
+    def test_upload_fileobj(self, backend):
+        backend.upload_fileobj(
+            io.BytesIO(body), bucket, f'{key}.zst',
+            ExtraArgs={
+                'ContentEncoding': C.ZSTD, 'Metadata': {C.DIGEST: 'abc'}})
+        obj = backend.head_object(Bucket=bucket, Key=f'{key}.zst')
+        assert obj['ContentEncoding'] == C.ZSTD
+        assert obj['Metadata'] == {C.DIGEST: 'abc'}
+        assert 'ContentEncoding' not in backend.head_object(
+            Bucket=bucket, Key=key)
+
+    def test_download_fileobj(self, backend):
+        file = io.BytesIO()
+        backend.download_fileobj(bucket, key, file)
+        assert file.getvalue() == body
+        with pytest.raises(ClientError):
+            backend.download_fileobj(bucket, 'absent', io.BytesIO())
+
+    def test_paginate(self, backend):
+        pages = backend.get_paginator(
+            'list_objects_v2').paginate(Bucket=bucket, Prefix='data/')
+        keys = [obj['Key'] for page in pages for obj in page['Contents']]
+        assert keys == [key, f'{key}.zst']
+
+    def test_copy(self, backend):
+        backend.copy({'Bucket': bucket, 'Key': f'{key}.zst'}, bucket, 'copy')
+        obj = backend.head_object(Bucket=bucket, Key='copy')
+        assert obj['ContentEncoding'] == C.ZSTD
+        assert obj['Metadata'] == {C.DIGEST: 'abc'}
+
+    def test_delete_objects(self, backend):
+        backend.delete_objects(Bucket=bucket, Delete={'Objects': [
+            {'Key': key}, {'Key': f'{key}.zst'}, {'Key': 'copy'}]})
+        pages = backend.paginate(Bucket=bucket)
+        assert not pages[0]['Contents']
+        if os.path.exists(root):
+            shutil.rmtree(root)
+
+
+class TestAbstractBackend:
+    def test_init(self):
+        class Incomplete(Backend):
+            def load(self, bucket, key):
+                return None
+
+        # a backend missing part of the interface fails up front
+        with pytest.raises(TypeError):
+            Incomplete()
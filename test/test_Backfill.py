@@ -0,0 +1,77 @@
+import os
+import sys
+sys.path.append('hyperdrive')
+from Backfill import BackfillPlanner, PENDING, DONE  # noqa autopep8
+from DataSource import MarketData, Polygon  # noqa autopep8
+import Constants as C  # noqa autopep8
+from Utils import SwissArmyKnife  # noqa autopep8
+
+knife = SwissArmyKnife()
+md = knife.use_dev(MarketData())
+poly = knife.use_dev(Polygon(os.environ.get('POLYGON') or 'test'))
+planner = BackfillPlanner(md)
+# a week of stocks and a day of crypto
+gaps = {
+    'AAPL': [['2024-01-02', '2024-01-05'], ['2024-01-08', '2024-01-08']],
+    'MSFT': [['2024-01-08', '2024-01-08']],
+    'NFLX': [['2024-01-08', '2024-01-08']],
+    'X%3ABTCUSD': [['2024-01-06', '2024-01-06']]
+}
+
+
+class TestBackfillPlanner:
+    def test_init(self):
+        assert type(planner).__name__ == 'BackfillPlanner'
+        assert planner.get_path() == 'data/backfill/polygon/ohlc.json'
+
+    def test_get_ranges(self):
+        dates = ['2024-01-02', '2024-01-03', '2024-01-04',
+                 '2024-01-05', '2024-01-08', '2024-01-09']
+        assert planner.get_ranges(dates, set(dates)) == []
+        assert planner.get_ranges(dates, {'2024-01-03', '2024-01-08'}) == [
+            ['2024-01-02', '2024-01-02'],
+            ['2024-01-04', '2024-01-05'],
+            ['2024-01-09', '2024-01-09']
+        ]
+
+    def test_find_gaps(self):
+        symbol = 'NOT_A_SYMBOL'
+        found = planner.find_gaps([symbol], '1m')
+        start, end = md.traveller.convert_dates('1m')
+        dates = md.traveller.get_market_dates(start, end)
+        assert found == {symbol: [[dates[0], dates[-1]]]}
+
+    def test_make_plan(self):
+        plan = planner.make_plan(gaps)
+        # a call per symbol since its first gap
+        assert [task['symbols'] for task in plan['tasks']] == [
+            ['AAPL'], ['X%3ABTCUSD'], ['MSFT'], ['NFLX']]
+        assert plan['calls'] == 4
+        assert plan['gaps'] == gaps
+        assert all(task['status'] == PENDING for task in plan['tasks'])
+
+        # fewer days than stocks, so they share grouped daily calls
+        plan = BackfillPlanner(poly).make_plan(
+            {**gaps, 'AAPL': [['2024-01-08', '2024-01-08']]})
+        grouped, crypto = plan['tasks']
+        assert grouped['symbols'] == ['AAPL', 'MSFT', 'NFLX']
+        assert grouped['dates'] == ['2024-01-08']
+        assert crypto['symbols'] == ['X%3ABTCUSD']
+        assert plan['calls'] == 2
+
+        # a call per range of days that fits under the aggs limit
+        plan = BackfillPlanner(poly, C.INTRA_DIR).make_plan(gaps)
+        assert plan['tasks'][0]['dates'] == [
+            '2024-01-02', '2024-01-03', '2024-01-04',
+            '2024-01-05', '2024-01-08']
+        assert plan['calls'] == 4
+
+    def test_summarize(self):
+        plan = planner.make_plan(gaps)
+        plan['tasks'][0]['status'] = DONE
+        assert planner.summarize(plan) == {
+            'pending': 3, 'done': 1, 'failed': 0, 'remaining_calls': 3}
+        # nothing left to run
+        for task in plan['tasks']:
+            task['status'] = DONE
+        assert planner.execute(plan, save=False)['calls'] == 0
@@ -0,0 +1,121 @@
+import os
+import sys
+import shutil
+import pandas as pd
+sys.path.append('hyperdrive')
+from Cache import FrameCache, DiskCache  # noqa autopep8
+
+df = pd.DataFrame({'a': [1, 2, 3], 'b': [0.1, 0.2, 0.3]})
+num_bytes = int(df.memory_usage(index=True, deep=True).sum())
+cache = FrameCache(num_bytes * 2)
+
+root = 'test/cache'
+disk = DiskCache(root, 200)
+keys = [f'data/ohlc/polygon/{symbol}.csv' for symbol in ['A', 'B', 'C']]
+
+
+def write(key):
+    path = disk.get_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as file:
+        file.write('x' * 90)
+    meta = disk.get_meta_path(key)
+    os.makedirs(os.path.dirname(meta), exist_ok=True)
+    with open(meta, 'w') as file:
+        file.write('{}')
+
+
+class TestFrameCache:
+    def test_init(self):
+        assert type(cache).__name__ == 'FrameCache'
+        assert cache.stats()['bytes'] == 0
+
+    def test_get(self):
+        assert cache.get('x', 1) is None
+        cache.put('x', 1, df)
+        cached = cache.get('x', 1)
+        assert cached.equals(df)
+        # a new version is a miss
+        assert cache.get('x', 2) is None
+        stats = cache.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 2
+
+    def test_copies(self):
+        cached = cache.get('x', 1)
+        cached.loc[0, 'a'] = 100
+        assert cache.get('x', 1).loc[0, 'a'] == 1
+        df.loc[0, 'a'] = 100
+        cache.put('y', 1, df)
+        df.loc[0, 'a'] = 1
+        assert cache.get('y', 1).loc[0, 'a'] == 100
+
+    def test_put(self):
+        # least recently used frame is evicted
+        cache.get('x', 1)
+        cache.put('z', 1, df)
+        assert cache.get('y', 1) is None
+        assert cache.get('x', 1) is not None
+        stats = cache.stats()
+        assert stats['evictions'] == 1
+        assert stats['frames'] == 2
+        assert stats['bytes'] == num_bytes * 2
+
+        # frames over budget are not cached
+        cache.put('big', 1, pd.concat([df] * 10))
+        assert cache.get('big', 1) is None
+
+    def test_invalidate(self):
+        cache.invalidate('x')
+        assert cache.get('x', 1) is None
+        assert cache.stats()['frames'] == 1
+
+    def test_clear(self):
+        cache.clear()
+        assert cache.stats() == {
+            'hits': 0, 'misses': 0, 'evictions': 0, 'frames': 0, 'bytes': 0
+        }
+
+
+class TestDiskCache:
+    def test_init(self):
+        assert type(disk).__name__ == 'DiskCache'
+        # the working dir is never evicted
+        assert DiskCache('', 200).max_bytes == 0
+
+    def test_get_path(self):
+        assert disk.get_path(keys[0]) == os.path.join(root, keys[0])
+        assert DiskCache().get_path(keys[0]) == keys[0]
+
+    def test_access(self):
+        for key in keys[:2]:
+            write(key)
+            disk.access(key, hit=False)
+        disk.access(keys[0], hit=True)
+        # least recently used copy (and its sidecar) is evicted
+        write(keys[2])
+        disk.access(keys[2], hit=False)
+        assert not os.path.exists(disk.get_path(keys[1]))
+        assert not os.path.exists(disk.get_meta_path(keys[1]))
+        assert os.path.exists(disk.get_path(keys[0]))
+        stats = disk.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 3
+        assert stats['evictions'] == 1
+        assert stats['files'] == 2
+        assert stats['bytes'] == 180
+
+        # the root is only walked on first use
+        scans = []
+        disk.scan = lambda: scans.append(1)
+        for key in keys[::2] * 2:
+            disk.access(key, hit=True)
+        del disk.scan
+        assert not scans
+        assert disk.stats()['bytes'] == 180
+
+    def test_discard(self):
+        disk.discard(keys[0])
+        assert not os.path.exists(disk.get_path(keys[0]))
+        assert disk.stats()['bytes'] == 90
+        shutil.rmtree(root)
@@ -0,0 +1,78 @@
+import os
+import sys
+import pandas as pd
+sys.path.append('hyperdrive')
+from Catalog import Librarian  # noqa autopep8
+import Constants as C  # noqa autopep8
+from Utils import SwissArmyKnife  # noqa autopep8
+
+knife = SwissArmyKnife()
+librarian = knife.use_dev(Librarian())
+librarian.enabled = True
+
+run_id = ''
+if C.CI:
+    run_id = os.environ['RUN_ID']
+
+dataset = f'data/ohlc/test{run_id}'
+filename = f'{dataset}/AAPL.csv'
+df = pd.DataFrame({
+    C.TIME: ['2020-01-02', '2020-01-03'],
+    C.CLOSE: [300.35, 297.43]
+})
+
+
+def teardown_module():
+    # runs even if a test failed, so nothing is left behind
+    librarian.store.delete_objects([librarian.get_manifest_key(dataset)])
+    if os.path.exists(filename):
+        os.remove(filename)
+
+
+class TestLibrarian:
+    def test_init(self):
+        assert type(librarian).__name__ == 'Librarian'
+        assert librarian.manifests == {}
+
+    def test_get_manifest_key(self):
+        assert librarian.get_manifest_key(
+            'data/ohlc/polygon') == 'data/ohlc/polygon/manifest.json'
+
+    def test_describe(self):
+        librarian.store.finder.make_path(filename)
+        df.to_csv(filename, index=False)
+        entry = librarian.describe(filename, df)
+        assert entry['size'] == os.path.getsize(filename)
+        assert entry['rows'] == 2
+        assert entry['min'] == '2020-01-02T00:00:00'
+        assert entry['max'] == '2020-01-03T00:00:00'
+        assert len(entry['hash']) == 64
+        assert librarian.describe(filename)['rows'] is None
+
+    def test_record(self):
+        librarian.record(filename, df)
+        # the manifest is updated with the write
+        assert filename in librarian.manifests[dataset][1]
+        # files outside of a dataset are ignored
+        librarian.record('data/symbols.csv')
+        assert list(librarian.manifests) == [dataset]
+
+    def test_get_files(self):
+        # a new Librarian (e.g. in another process) sees the entry
+        files = Librarian(librarian.store).get_files(dataset)
+        assert files[filename]['rows'] == 2
+        assert librarian.get_keys(f'{dataset}/AA') == [filename]
+
+    def test_get_hash(self):
+        assert librarian.tracks(filename)
+        assert not librarian.tracks('data/symbols.csv')
+        digest = librarian.describe(filename)['hash']
+        assert librarian.get_hash(filename) == digest
+        librarian.record(filename, df, 'abc')
+        assert librarian.get_hash(filename) == 'abc'
+        librarian.record(filename, df, digest)
+        assert librarian.get_hash(f'{dataset}/absent.csv') is None
+
+    def test_forget(self):
+        librarian.forget(filename)
+        assert filename not in librarian.get_files(dataset)
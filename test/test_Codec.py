@@ -0,0 +1,44 @@
+import io
+import os
+import sys
+sys.path.append('hyperdrive')
+from Codec import Codec  # noqa autopep8
+import Constants as C  # noqa autopep8
+
+codec = Codec()
+data = b'Time,Open\n' + b'2020-01-02,300.35\n' * 1000
+path = 'test/test_codec.bin'
+
+
+class TestCodec:
+    def test_init(self):
+        assert type(codec).__name__ == 'Codec'
+        assert Codec({C.ZSTD: 19}).levels[C.ZSTD] == 19
+
+    def test_compress(self):
+        for encoding in [C.ZSTD, C.GZIP]:
+            compressed = io.BytesIO()
+            codec.compress(io.BytesIO(data), compressed, encoding)
+            assert compressed.tell() < len(data)
+            compressed.seek(0)
+            plain = io.BytesIO()
+            codec.decompress(compressed, plain, encoding)
+            assert plain.getvalue() == data
+
+    def test_open(self):
+        for encoding in [C.ZSTD, C.GZIP]:
+            compressed = io.BytesIO()
+            codec.compress(io.BytesIO(data), compressed, encoding)
+            compressed.seek(0)
+            with codec.open(compressed, encoding) as stream:
+                assert stream.read() == data
+
+    def test_detect(self):
+        for encoding in [C.ZSTD, C.GZIP]:
+            with open(path, 'wb') as file:
+                codec.compress(io.BytesIO(data), file, encoding)
+            assert codec.detect(path) == encoding
+        with open(path, 'wb') as file:
+            file.write(data)
+        assert codec.detect(path) is None
+        os.remove(path)
@@ -1,6 +1,7 @@
 import sys
 sys.path.append('hyperdrive')
 from Constants import PathFinder  # noqa autopep8
+import Constants as C  # noqa autopep8
 
 
 finder = PathFinder()
@@ -35,6 +36,47 @@ class TestPathFinder():
         assert finder.get_ohlc_path(
             'TSLA', 'polygon') == 'data/ohlc/polygon/TSLA.csv'
 
+    def test_get_ohlc_partition_path(self):
+        assert finder.get_ohlc_partition_path(
+            'aapl', '2020') == 'data/ohlc/polygon/AAPL/2020.csv'
+        assert finder.get_ohlc_partition_path(
+            'AMD', '2020-01', 'alpaca') == 'data/ohlc/alpaca/AMD/2020-01.csv'
+
+    def test_get_coverage_path(self):
+        assert finder.get_coverage_path(
+            'aapl') == 'data/coverage/polygon/AAPL.json'
+        assert finder.get_coverage_path(
+            'AMD', 'alpaca') == 'data/coverage/alpaca/AMD.json'
+
+    def test_get_codec(self):
+        compression = {
+            '*': C.GZIP, 'data/intraday': C.ZSTD, 'data/api/': 'none'}
+        finder_ = PathFinder(compression=compression)
+        assert finder_.get_codec(
+            'data/intraday/polygon/AAPL/2020-01-01.csv') == C.ZSTD
+        assert finder_.get_codec('data/ohlc/polygon/AAPL.csv') == C.GZIP
+        assert finder_.get_codec('data/api/signals.json') is None
+        # parquet is compressed internally
+        assert finder_.get_codec('data/ohlc/polygon/AAPL.parquet') is None
+        assert PathFinder(compression={}).get_codec(
+            'data/ohlc/polygon/AAPL.csv') is None
+
+    def test_get_dataset_dir(self):
+        assert finder.get_dataset_dir(
+            'data/ohlc/polygon/AAPL.csv') == 'data/ohlc/polygon'
+        assert finder.get_dataset_dir(
+            'data/ohlc/polygon/AAPL/2020.csv') == 'data/ohlc/polygon'
+        assert finder.get_dataset_dir(
+            'data/intraday/polygon/AAPL/2020-01-01.csv'
+        ) == 'data/intraday/polygon/AAPL'
+        assert finder.get_dataset_dir('data/symbols.csv') is None
+        assert finder.get_dataset_dir(
+            'data/ohlc/polygon/manifest.json') is None
+
+    def test_get_intraday_dir(self):
+        assert finder.get_intraday_dir(
+            'aapl') == 'data/intraday/polygon/AAPL'
+
     def test_get_intraday_path(self):
         assert finder.get_intraday_path(
             'aapl', '2020-01-01'
@@ -46,6 +88,18 @@ class TestPathFinder():
             'TSLA', '2020-01-01', 'polygon'
         ) == 'data/intraday/polygon/TSLA/2020-01-01.csv'
 
+    def test_get_format(self):
+        assert finder.get_format('data/ohlc/polygon/AAPL.csv') == C.CSV
+        assert finder.get_format(
+            'data/ohlc/polygon/AAPL.parquet') == C.PARQUET
+        assert PathFinder(C.PARQUET).get_ohlc_path(
+            'aapl') == 'data/ohlc/polygon/AAPL.parquet'
+        assert PathFinder(C.PARQUET).get_intraday_path(
+            'aapl', '2020-01-01'
+        ) == 'data/intraday/polygon/AAPL/2020-01-01.parquet'
+        # non time series datasets keep their format
+        assert PathFinder(C.PARQUET).get_symbols_path() == 'data/symbols.csv'
+
     def test_get_all_paths(self):
         paths = set(finder.get_all_paths('hyperdrive', False))
         assert 'hyperdrive/DataSource.py' in paths
@@ -152,6 +152,32 @@ class TestMarketData:
             col_in_df = column in standardized
             assert col_in_df if curr_idx >= sel_idx else not col_in_df
 
+    def test_to_floats(self):
+        def convert(vals):
+            return vals.apply(lambda val: float(val) if val else 0)
+        for vals in [
+            pd.Series([], dtype=float),
+            pd.Series([1.5, None, 0, -2]),
+            pd.Series([0.0, 0.0]),
+            pd.Series([1, 0, 3]),
+            pd.Series([True, False]),
+            pd.Series([None, '', '1.5'])
+        ]:
+            pd.testing.assert_series_equal(md.to_floats(vals, 0),
+                                           convert(vals))
+
+    def test_to_ints(self):
+        def convert(vals):
+            return vals.apply(lambda val: 0 if pd.isnull(val) else int(val))
+        for vals in [
+            pd.Series([], dtype=float),
+            pd.Series([1.9, None, -1.9]),
+            pd.Series([None, None]),
+            pd.Series([1, 2]),
+            pd.Series([None, '3'])
+        ]:
+            pd.testing.assert_series_equal(md.to_ints(vals), convert(vals))
+
     def test_save_ohlc(self):
         symbol = 'NFLX'
         ohlc_path = md.finder.get_ohlc_path(symbol)
@@ -161,7 +187,9 @@ class TestMarketData:
             os.rename(ohlc_path, temp_path)
 
         for _ in range(retries):
-            poly.save_ohlc(symbol=symbol, timeframe='1m', retries=1, delay=0)
+            poly.save_ohlc(
+                symbol=symbol, timeframe='1m', retries=1, delay=0,
+                incremental=False)
             if not md.reader.check_file_exists(ohlc_path):
                 delay = choice(range(5, 10))
                 sleep(delay)
@@ -178,6 +206,58 @@ class TestMarketData:
         if os.path.exists(temp_path):
             os.rename(temp_path, ohlc_path)
 
+    def test_save_ohlc_partitions(self):
+        symbol = 'NFLX'
+        poly.partition = 'month'
+        filenames = poly.save_ohlc(
+            symbol=symbol, timeframe='1m', retries=1, delay=0,
+            incremental=False)
+        poly.partition = C.OHLC_PARTITION
+        # only the months of the fetched rows, not the whole history
+        assert 0 < len(filenames) <= 2
+        assert set(filenames) == set(poly.get_ohlc_partitions(symbol))
+
+        ohlc_path = md.finder.get_ohlc_path(symbol)
+        assert poly.compact_ohlc(symbol) == ohlc_path
+        assert not poly.get_ohlc_partitions(symbol)
+        assert md.reader.store.modified_delta(ohlc_path).total_seconds() < 60
+
+    def test_plan_ohlc(self):
+        symbol = 'NFLX'
+        plan = md.plan_ohlc(symbol, '1y', incremental=False)
+        assert plan['symbol'] == symbol
+        assert plan['timeframe'] == '1y'
+        # NFLX is stored through the last trading day (see above)
+        plan = md.plan_ohlc(symbol, '1y')
+        assert plan is None or md.traveller.convert_delta(
+            plan['timeframe']).days < 7
+        assert poly.save_ohlc(
+            symbol=symbol, timeframe='1y', dry_run=True) == plan
+
+        # stored data that starts after the window is missing its history
+        symbol = 'LATE'
+        filename = md.finder.get_ohlc_path(symbol, md.provider)
+        start, end = md.traveller.convert_dates('1m')
+        dates = md.traveller.get_market_dates(start, end)
+        md.writer.save_csv(filename, pd.DataFrame({
+            C.TIME: dates, C.OPEN: 1.0, C.HIGH: 1.0,
+            C.LOW: 1.0, C.CLOSE: 1.0, C.VOL: 1
+        }))
+        plan = md.plan_ohlc(symbol, '10y')
+        assert plan['timeframe'] == '10y'
+        assert plan['start'] == md.traveller.convert_dates('10y')[0]
+        assert plan['covers']
+        # but not a window inside it
+        plan = md.plan_ohlc(symbol, '2w')
+        assert plan is None or md.traveller.convert_delta(
+            plan['timeframe']).days < 7
+        # nor once the whole window was fetched (e.g. listed since)
+        md.cover_ohlc(md.plan_ohlc(symbol, '10y'))
+        plan = md.plan_ohlc(symbol, '10y')
+        assert plan is None or not plan['covers']
+        md.writer.remove_files(
+            [filename, md.finder.get_coverage_path(symbol, md.provider)])
+
     def test_save_intraday(self):
         sleep(C.POLY_FREE_DELAY)
         symbol = 'NFLX'
@@ -186,10 +266,17 @@ class TestMarketData:
         intra_paths = [md.finder.get_intraday_path(
             symbol, date) for date in dates]
         filenames = set(poly.save_intraday(
-            symbol=symbol, timeframe=timeframe))
+            symbol=symbol, timeframe=timeframe, incremental=False))
         intersection = filenames.intersection(intra_paths)
         assert intersection
 
+        # the saved dates aren't fetched again
+        stored = set(md.get_intraday_dates(symbol))
+        missing = poly.save_intraday(
+            symbol=symbol, timeframe=timeframe, dry_run=True)
+        assert not stored.intersection(missing)
+        assert all(pd.Timestamp(date).dayofweek < 5 for date in missing)
+
         for path in intersection:
             df = md.reader.load_csv(path)
             assert {C.TIME, C.OPEN, C.HIGH, C.LOW,
@@ -208,6 +295,18 @@ class TestMarketData:
         assert {C.TIME, C.OPEN, C.HIGH, C.LOW,
                 C.CLOSE, C.VOL}.issubset(df.columns)
         assert len(df) > 0
+        # market hours only
+        rth = pd.concat(md.get_intraday(
+            symbol='NFLX', timeframe='2m', extra_hrs=False))
+        times = rth[C.TIME].dt.strftime(C.TIME_FMT)
+        assert times.between(C.MARKET_OPEN, '15:59').all()
+        assert len(rth) <= len(df)
+        # 5 minute bars from the open
+        bars = pd.concat(md.get_intraday(
+            symbol='NFLX', min=5, timeframe='2m'))
+        assert (bars[C.TIME].dt.minute % 5 == 0).all()
+        assert bars[C.VOL].sum() >= df[C.VOL].sum()
+        assert len(bars) < len(df)
 
     def test_get_unemployment_rate(self):
         df = md.get_unemployment_rate()
@@ -294,6 +393,18 @@ class TestAlpaca:
         else:
             print('Skipping Alpaca OHLC test because update in progress')
 
+    def test_get_ohlc_many(self):
+        if not flow.is_any_workflow_running():
+            symbols = ['AAPL', 'MSFT', 'BTC/USD']
+            dfs = alpc.get_ohlc_many(symbols, timeframe='1m')
+            assert set(dfs) == set(symbols)
+            for df in dfs.values():
+                assert {C.TIME, C.OPEN, C.HIGH, C.LOW,
+                        C.CLOSE, C.VOL, C.AVG}.issubset(df.columns)
+                assert len(df) > 10
+        else:
+            print('Skipping Alpaca OHLC test because update in progress')
+
 
 class TestPolygon:
     def test_init(self):
@@ -328,6 +439,21 @@ class TestPolygon:
         else:
             print('Skipping Polygon.io OHLC test because update in progress')
 
+    def test_get_ohlc_grouped(self):
+        if not flow.is_any_workflow_running():
+            symbols = ['AAPL', 'MSFT']
+            dates = poly.traveller.dates_in_range('1w')
+            dfs = poly.get_ohlc_grouped(symbols, dates)
+            assert set(dfs) == set(symbols)
+            for df in dfs.values():
+                assert {C.TIME, C.OPEN, C.HIGH, C.LOW,
+                        C.CLOSE, C.VOL, C.AVG}.issubset(df.columns)
+                # a bar per market day
+                assert 0 < len(df) <= 5
+                assert df[C.TIME].is_monotonic_increasing
+        else:
+            print('Skipping Polygon.io OHLC test because update in progress')
+
     def test_get_intraday(self):
         if not flow.is_any_workflow_running():
             df = pd.concat(poly.get_intraday(symbol='AAPL', timeframe='1w'))
@@ -338,21 +464,25 @@ class TestPolygon:
             print(
                 'Skipping Polygon.io intraday test because update in progress')
 
-    def test_log_api_call_time(self):
-        if hasattr(poly, 'last_api_call_time'):
-            delattr(poly, 'last_api_call_time')
-        poly.log_api_call_time()
-        assert hasattr(poly, 'last_api_call_time')
+    def test_get_date_ranges(self):
+        dates = ['2020-01-01', '2020-01-02', '2020-01-03', '2020-01-10']
+        assert poly.get_date_ranges(dates, 3) == [
+            ('2020-01-01', '2020-01-03'), ('2020-01-10', '2020-01-10')]
+        assert poly.get_date_ranges(dates, 30) == [
+            ('2020-01-01', '2020-01-10')]
 
-    def test_obey_free_limit(self):
-        if hasattr(poly, 'last_api_call_time'):
-            delattr(poly, 'last_api_call_time')
+    def test_throttle(self):
+        poly.get_limiter().reset()
+        assert poly.throttle() < 1
 
         then = time()
-        poly.log_api_call_time()
-        poly.obey_free_limit(C.POLY_FREE_DELAY)
+        poly.throttle()
         now = time()
-        assert now - then > C.POLY_FREE_DELAY
+        assert now - then > C.POLY_FREE_DELAY - 1
+        stats = poly.get_rate_stats()
+        assert stats['calls'] == 2
+        assert stats['waits'] == 1
+        assert stats['max_wait'] > C.POLY_FREE_DELAY - 1
 
 
 class TestLaborStats:
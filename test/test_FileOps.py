@@ -1,8 +1,11 @@
 import os
 import sys
+from datetime import datetime
+import numpy as np
 import pandas as pd
 sys.path.append('hyperdrive')
 from FileOps import FileReader, FileWriter  # noqa autopep8
+from Cache import FrameCache  # noqa autopep8
 import Constants as C  # noqa autopep8
 from Utils import SwissArmyKnife  # noqa autopep8
 
@@ -24,6 +27,8 @@ json_path2 = 'test/test2.json'
 
 csv_path1 = f'test/test1_{run_id}.csv'
 csv_path2 = f'test/test2_{run_id}.csv'
+parquet_path = f'test/test_{run_id}.parquet'
+npy_path = f'test/test_{run_id}.npy'
 
 empty = {}
 data = [
@@ -54,6 +59,11 @@ test_df = pd.DataFrame(data)
 big_df = pd.DataFrame(data_)
 small_df = pd.DataFrame([snippet])
 empty_df = pd.DataFrame()
+ohlc_df = pd.DataFrame({
+    C.TIME: ['2020-12-24', '2020-12-28'],
+    C.OPEN: [2400.85, 2401],
+    C.VOL: [402265, None]
+})
 
 
 class TestFileWriter:
@@ -79,6 +89,29 @@ class TestFileWriter:
         assert writer.save_csv(csv_path2, test_df)
         assert reader.check_file_exists(csv_path2)
 
+    def test_upload(self):
+        # the stored object already has the same content
+        assert not writer.upload(csv_path2)
+        writer.write_df(csv_path2, big_df)
+        assert writer.upload(csv_path2)
+        assert not os.path.exists(f'{csv_path2}.tmp')
+        writer.save_csv(csv_path2, test_df)
+        assert reader.load_csv(csv_path2).equals(test_df)
+
+        # a stale manifest never drops an upload
+        writer.librarian.enabled = True
+        tracked = f'data/ohlc/test{run_id}/AAPL.csv'
+        assert writer.save_csv(tracked, test_df)
+        assert writer.librarian.get_hash(tracked)
+        writer.store.delete_objects([tracked])
+        assert writer.upload(tracked)
+        assert writer.store.key_exists(tracked)
+        writer.remove_files([tracked])
+        assert writer.librarian.get_hash(tracked) is None
+        writer.store.delete_objects(
+            [writer.librarian.get_manifest_key(f'data/ohlc/test{run_id}')])
+        writer.librarian.enabled = C.MANIFESTS
+
     def test_update_csv(self):
         writer.update_csv(csv_path2, test_df)
         assert reader.load_csv(csv_path2).equals(test_df)
@@ -93,6 +126,14 @@ class TestFileWriter:
 
         writer.save_csv(csv_path2, test_df)
 
+    def test_save_parquet(self):
+        assert writer.save_csv(parquet_path, ohlc_df)
+        assert reader.check_file_exists(parquet_path)
+
+    def test_save_array(self):
+        assert writer.save_array(npy_path, np.arange(4))
+        assert reader.check_file_exists(npy_path)
+
     def test_remove_files(self):
         filename = f'{C.DEV_DIR}/{run_id}_x'
         assert not reader.check_file_exists(filename)
@@ -103,6 +144,13 @@ class TestFileWriter:
         assert reader.check_file_exists(filename)
         writer.remove_files([filename])
         assert not reader.check_file_exists(filename)
+        # only stored, not on disk
+        with open(filename, 'w') as file:
+            file.write('123')
+        writer.store.upload_file(filename)
+        os.remove(filename)
+        writer.remove_files([filename])
+        assert not writer.store.key_exists(filename)
 
     def test_rename_file(self):
         src_path = f'{symbols_path}_{run_id}_SRC1'
@@ -140,17 +188,106 @@ class TestFileReader:
         # mock data case from above
         assert reader.load_csv(csv_path2).equals(test_df)
 
+    def test_stream_csv(self):
+        assert reader.stream_csv(csv_path2).equals(test_df)
+        chunks = list(reader.stream_csv(csv_path2, chunksize=1))
+        assert len(chunks) == len(test_df)
+        assert pd.concat(chunks, ignore_index=True).equals(test_df)
+
+        # a frame cached by a normal load doesn't break a streamed load
+        reader.cache = FrameCache(10 ** 6)
+        reader.streaming = True
+        assert reader.load_csv(csv_path2).equals(test_df)
+        assert reader.load_csv(csv_path2, read_only=True).equals(test_df)
+        assert isinstance(reader.cache.peek(csv_path2), str)
+        # the streamed frame is revalidated, not transferred again
+        assert reader.load_csv(csv_path2, read_only=True).equals(test_df)
+        assert reader.cache.stats()['hits'] == 1
+        reader.streaming = C.STREAM_READS
+        del reader.cache
+
+    def test_load_parquet(self):
+        df = reader.load_csv(parquet_path)
+        assert str(df[C.TIME].dtype) == 'datetime64[ns]'
+        assert str(df[C.OPEN].dtype) == 'float64'
+        assert str(df[C.VOL].dtype) == 'int64'
+        assert list(df[C.VOL]) == [402265, 0]
+        writer.remove_files([parquet_path])
+
+    def test_load_array(self):
+        arr = reader.load_array(npy_path)
+        assert isinstance(arr, np.memmap)
+        assert list(arr) == [0, 1, 2, 3]
+        writer.remove_files([npy_path])
+
     def test_check_update(self):
         assert reader.check_update(csv_path2, test_df)
         assert not reader.check_update(csv_path2, small_df)
         assert reader.check_update(csv_path2, big_df)
 
+    def test_upsert_df(self):
+        old = ohlc_df.fillna(0)
+        new = pd.DataFrame({
+            C.TIME: ['2020-12-28', '2020-12-29'],
+            C.OPEN: [2401.0, 2402.0],
+            C.VOL: [0.0, 1.0]
+        })
+        df, report = reader.upsert_df(old, new, C.TIME, C.DATE_FMT)
+        assert list(df[C.TIME]) == ['2020-12-24', '2020-12-28', '2020-12-29']
+        assert report == {'inserted': 1, 'replaced': 1, 'changed': True}
+        # rows that are already stored aren't a change
+        df, report = reader.upsert_df(old, new.head(1), C.TIME, C.DATE_FMT)
+        assert df.equals(old)
+        assert report == {'inserted': 0, 'replaced': 1, 'changed': False}
+
     def test_update_df(self):
-        assert reader.update_df(csv_path2, test_df, 'date').equals(test_df)
-        assert reader.update_df(csv_path2, big_df, 'date').equals(big_df)
+        def expected(df):
+            df = df.assign(date=pd.to_datetime(df['date']))
+            return df.sort_values(by='date', kind='stable', ignore_index=True)
+        df = reader.update_df(csv_path2, test_df, 'date')
+        assert df.equals(expected(test_df))
+        df = reader.update_df(csv_path2, big_df, 'date')
+        assert df.equals(expected(big_df))
+        assert df.attrs['upsert'] == {
+            'inserted': 1, 'replaced': 2, 'changed': True}
 
         writer.remove_files([csv_path2])
 
+    def test_data_in_timeframe(self):
+        def expected(df, col, timeframe):
+            df = df.copy()
+            df[col] = pd.to_datetime(df[col]).dt.tz_localize(C.TZ)
+            cutoff = (datetime.now(C.TZ) -
+                      reader.traveller.convert_delta(timeframe))
+            df = df[df[col].apply(lambda date: date.strftime('%Y-%m-%d'))
+                    >= cutoff.strftime('%Y-%m-%d')]
+            return df.assign(**{col: df[col].dt.tz_localize(None)})
+        now = pd.Timestamp.now(C.TZ).tz_localize(None)
+        times = pd.date_range(now - pd.Timedelta('10d'), now, freq='7h')
+        sorted_df = pd.DataFrame({
+            C.TIME: times.strftime('%Y-%m-%d %H:%M:%S'),
+            C.CLOSE: range(len(times))
+        })
+        unsorted_df = sorted_df[::-1].assign(
+            **{C.TIME: lambda df: pd.to_datetime(df[C.TIME])})
+        for df in [sorted_df, unsorted_df]:
+            original = df.copy()
+            for timeframe in ['1d', '3d', '1w', 'max']:
+                filtered = reader.data_in_timeframe(df, C.TIME, timeframe)
+                assert filtered.equals(expected(df, C.TIME, timeframe))
+            # the input is left as is
+            assert df.equals(original)
+        # sorted frames are sliced, not copied
+        filtered = reader.data_in_timeframe(unsorted_df[::-1], C.TIME, '3d')
+        assert np.shares_memory(filtered[C.CLOSE].to_numpy(),
+                                unsorted_df[C.CLOSE].to_numpy())
+        assert reader.data_in_timeframe(sorted_df, 'missing') is sorted_df
+
     def test_check_file_exists(self):
         assert not reader.check_file_exists('test_check_file_exists')
         assert reader.check_file_exists(symbols_path)
+
+    def test_get_cache_stats(self):
+        stats = reader.get_cache_stats()
+        assert set(stats) == {'memory', 'disk'}
+        assert stats['disk']['hits'] + stats['disk']['misses'] > 0
@@ -0,0 +1,102 @@
+import sys
+import threading
+from time import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+sys.path.append('hyperdrive')
+from Http import HttpClient  # noqa autopep8
+import Constants as C  # noqa autopep8
+
+http = HttpClient()
+# path -> statuses to respond with (the last one repeats)
+statuses = {
+    '/ok': [200],
+    '/limited': [429, 429, 200],
+    '/after': [429, 200],
+    '/error': [503, 200],
+    '/missing': [404],
+    '/signed': [429, 200]
+}
+hits = {}
+bodies = []
+
+
+class Handler(BaseHTTPRequestHandler):
+    def respond(self):
+        count = hits.get(self.path, 0)
+        hits[self.path] = count + 1
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            bodies.append(self.rfile.read(length).decode())
+        codes = statuses[self.path]
+        self.send_response(codes[min(count, len(codes) - 1)])
+        if self.path == '/after':
+            self.send_header('Retry-After', '1')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    do_GET = respond
+    do_POST = respond
+
+    def log_message(self, *args):
+        pass
+
+
+server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+base = f'http://127.0.0.1:{server.server_port}'
+host = f'127.0.0.1:{server.server_port}'
+C.HTTP_BACKOFF = 0.01
+
+
+class TestHttpClient:
+    def test_init(self):
+        assert type(http).__name__ == 'HttpClient'
+        assert http.get_session() is HttpClient().get_session()
+
+    def test_get(self):
+        response = http.get(f'{base}/ok')
+        assert response.ok
+        assert response.retries == 0
+
+    def test_retry(self):
+        response = http.get(f'{base}/limited')
+        assert response.ok
+        assert response.retries == 2
+        # client errors aren't retried
+        response = http.get(f'{base}/missing')
+        assert response.status_code == 404
+        assert response.retries == 0
+
+    def test_retry_after(self):
+        start = time()
+        response = http.get(f'{base}/after')
+        assert response.ok
+        assert time() - start >= 1
+
+    def test_idempotent(self):
+        # a POST may have been applied before the server error
+        response = http.post(f'{base}/error')
+        assert response.status_code == 503
+        response = http.post(f'{base}/error', idempotent=True)
+        assert response.ok
+        assert response.retries == 0
+        hits.pop('/error')
+        assert http.get(f'{base}/error').retries == 1
+
+    def test_get_stats(self):
+        stats = http.get_stats()[host]
+        assert stats['requests'] == 7
+        assert stats['retries'] == 4
+        assert stats['max_seconds'] >= stats['mean_seconds'] > 0
+
+    def test_sign(self):
+        nonces = iter(range(2))
+
+        def sign():
+            return {'data': {'nonce': next(nonces)}}
+
+        # a rate limited POST is resent with a fresh nonce
+        response = http.post(f'{base}/signed', sign=sign)
+        assert response.ok
+        assert response.retries == 1
+        assert bodies == ['nonce=0', 'nonce=1']
@@ -0,0 +1,185 @@
+import sys
+import json
+import tempfile
+import threading
+from time import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import urllib3
+sys.path.append('hyperdrive')
+from HttpCache import ResponseCache, CachedPool, CacheMiss  # noqa autopep8
+from Http import HttpClient  # noqa autopep8
+import Constants as C  # noqa autopep8
+
+root = tempfile.mkdtemp()
+recorder = ResponseCache(C.RECORD, root)
+replayer = ResponseCache(C.REPLAY, root)
+aggs = 'https://api.polygon.io/v2/aggs/ticker/AAPL/range/1/day'
+hits = {}
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        hits[self.path] = hits.get(self.path, 0) + 1
+        body = json.dumps({'path': self.path}).encode()
+        self.send_response(404 if self.path.startswith('/missing') else 200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+base = f'http://127.0.0.1:{server.server_port}'
+
+
+class TestResponseCache:
+    def test_init(self):
+        assert type(recorder).__name__ == 'ResponseCache'
+        assert recorder and replayer
+        assert not ResponseCache('', root)
+
+    def test_get_key(self):
+        key = recorder.get_key('get', f'{base}/bars?b=2', {'a': 1})
+        # the same request no matter the order or place of its params
+        assert key == recorder.get_key(
+            'GET', f'{base.upper()}/bars?a=1&b=2')
+        assert key == recorder.get_key(
+            'GET', f'{base}/bars', [('b', '2'), ('a', '1'), ('c', None)])
+        assert key != recorder.get_key('GET', f'{base}/bars?a=1&b=3')
+        assert key != recorder.get_key('POST', f'{base}/bars?a=1&b=2')
+        assert recorder.get_key(
+            'POST', base, data={'x': 1, 'y': 2}) == recorder.get_key(
+            'POST', base, data={'y': 2, 'x': 1})
+
+    def test_classify(self):
+        assert recorder.classify(f'{aggs}/2020-01-01/2020-12-31') == 'bars'
+        assert recorder.classify(
+            'https://data.alpaca.markets/v2/stocks/bars') == 'bars'
+        assert recorder.classify(
+            'https://api.polygon.io/v3/reference/dividends') == 'reference'
+        assert recorder.classify(
+            'https://api.bls.gov/publicAPI/v2/timeseries/data/') == 'macro'
+        assert recorder.classify(base) == 'default'
+
+    def test_get_ttl(self):
+        # past bars never expire
+        assert recorder.is_historical(f'{aggs}/2020-01-01/2020-12-31')
+        assert recorder.get_ttl(f'{aggs}/2020-01-01/2020-12-31') is None
+        assert recorder.is_historical(f'{aggs}/1577836800000/1609372800000')
+        assert recorder.is_historical(
+            'https://data.alpaca.markets/v2/stocks/bars',
+            {'start': '2020-01-01', 'end': '2020-12-31'})
+        # but today's bars do
+        today = datetime.now(C.TZ).strftime(C.DATE_FMT)
+        today = f'{aggs}/2020-01-01/{today}'
+        assert not recorder.is_historical(today)
+        assert recorder.get_ttl(today) == C.HTTP_CACHE_TTLS['bars']
+        assert not recorder.is_historical(base, {'end': '2020-01-01'})
+        assert recorder.get_ttl(base) == C.HTTP_CACHE_TTLS['default']
+
+    def test_save(self):
+        url = f'{aggs}/2020-01-01/2020-12-31'
+        key = recorder.get_key('GET', url, {'apiKey': 'secret'})
+        assert recorder.load(key, url) is None
+        recorder.save(key, 'GET', f'{url}?apiKey=secret', 200,
+                      {'Content-Type': 'application/json'}, b'{"a": 1}')
+        entry = recorder.load(key, url)
+        assert entry['status'] == 200
+        assert entry['body'] == b'{"a": 1}'
+        assert entry['headers'] == {'Content-Type': 'application/json'}
+        # API keys aren't stored
+        with open(recorder.get_path(key)) as file:
+            assert 'secret' not in file.read()
+        # failures aren't stored and nothing is stored in replay mode
+        for cache, status in [(recorder, 500), (replayer, 200)]:
+            key = cache.get_key('GET', url, {'status': status})
+            cache.save(key, 'GET', url, status, {}, b'')
+            assert cache.load(key, url) is None
+
+    def test_load(self):
+        url = f'{base}/fresh'
+        key = recorder.get_key('GET', url)
+        recorder.save(key, 'GET', url, 200, {}, b'ok')
+        # the default class expires at once, but is always replayed
+        assert recorder.load(key, url) is None
+        assert replayer.load(key, url)['body'] == b'ok'
+        with pytest.raises(CacheMiss):
+            replayer.miss('GET', f'{base}/uncached')
+        recorder.miss('GET', f'{base}/uncached')
+
+
+class TestRecordReplay:
+    def test_http_client(self):
+        url = f'{base}/data/2020-01-02'
+        client = HttpClient(cached=True)
+        client.cache = recorder
+        response = client.get(url, {'a': 1})
+        assert response.json() == {'path': '/data/2020-01-02?a=1'}
+        assert not hasattr(response, 'from_cache')
+
+        # the server isn't called again
+        client.cache = replayer
+        for _ in range(2):
+            response = client.get(url, {'a': 1})
+            assert response.ok
+            assert response.from_cache
+            assert response.json() == {'path': '/data/2020-01-02?a=1'}
+        assert hits['/data/2020-01-02?a=1'] == 1
+        with pytest.raises(CacheMiss):
+            client.get(url, {'a': 2})
+        # uncached clients (e.g. for orders) always go out
+        assert not hasattr(HttpClient().get(url, {'a': 1}), 'from_cache')
+
+        # errors aren't cached
+        client.cache = recorder
+        assert client.get(f'{base}/missing').status_code == 404
+        client.cache = replayer
+        with pytest.raises(CacheMiss):
+            client.get(f'{base}/missing')
+
+    def test_deferred_limit(self):
+        class Limiter:
+            calls = 0
+
+            def acquire(self):
+                Limiter.calls += 1
+                return 0
+
+        client = HttpClient(cached=True)
+        client.cache = recorder
+        url = f'{base}/deferred'
+        # only requests that go out wait
+        client.defer(Limiter())
+        client.get(url)
+        client.defer(Limiter())
+        client.cache = replayer
+        client.get(url)
+        assert Limiter.calls == 1
+        assert client.deferred is None
+
+    def test_cached_pool(self):
+        url = f'{base}/pool'
+        waited = []
+        pool = CachedPool(
+            urllib3.PoolManager(), recorder, lambda: waited.append(time()))
+        response = pool.request('GET', url, fields={'a': 1})
+        assert response.status == 200
+        assert len(waited) == 1
+
+        pool.cache = replayer
+        response = pool.request('GET', url, fields={'a': 1})
+        assert json.loads(response.data) == {'path': '/pool?a=1'}
+        assert response.geturl() == url
+        assert response.headers['Content-Type'] == 'application/json'
+        assert len(waited) == 1
+        assert hits['/pool?a=1'] == 1
+        with pytest.raises(CacheMiss):
+            pool.request('GET', url)
+        # the rest of the pool is still there
+        assert pool.connection_pool_kw == pool.pool.connection_pool_kw
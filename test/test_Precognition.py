@@ -32,6 +32,34 @@ class TestOracle:
         assert oracle.load_model_pickle(name) == {}
         oracle.writer.remove_files([actual])
 
+    def test_save_model_arrays(self):
+        arr = np.arange(6, dtype=float).reshape(2, 3)
+        assert oracle.save_model_arrays({name: arr})
+        manifest = oracle.load_model_manifest()
+        assert manifest[name] == {
+            'dtype': '<f8', 'shape': [2, 3], 'source': None}
+
+    def test_load_model_array(self):
+        arr = oracle.load_model_array(name)
+        assert isinstance(arr, np.memmap)
+        assert np.array_equal(arr, np.arange(6).reshape(2, 3))
+
+        # a pickle saved after the array wins until it's synced
+        oracle.save_model_pickle(name, [[1, 2]])
+        arr = oracle.load_model_array(name)
+        assert not isinstance(arr, np.memmap)
+        assert arr.tolist() == [[1, 2]]
+        assert oracle.sync_model_arrays([name]) == [name]
+        assert oracle.sync_model_arrays([name]) == []
+        arr = oracle.load_model_array(name)
+        assert isinstance(arr, np.memmap)
+        assert arr.tolist() == [[1, 2]]
+        oracle.writer.remove_files([
+            actual,
+            oracle.get_filename(name, 'npy'),
+            oracle.get_filename('manifest', 'json')
+        ])
+
     def test_predict(self):
         metadata = oracle.reader.load_json('models/latest/metadata.json')
         features = metadata['features']
@@ -43,8 +71,8 @@ class TestOracle:
         assert pred.dtype == np.dtype(bool)
 
     def test_visualize(self):
-        X = oracle.load_model_pickle('X')
-        y = oracle.load_model_pickle('y')
+        X = oracle.load_model_array('X')
+        y = oracle.load_model_array('y')
 
         # 2D
         (
@@ -0,0 +1,81 @@
+import os
+import sys
+import tempfile
+import pandas as pd
+sys.path.append('hyperdrive')
+from Resample import BarResampler  # noqa autopep8
+import Constants as C  # noqa autopep8
+
+root = tempfile.mkdtemp()
+resampler = BarResampler(root)
+filename = 'data/intraday/polygon/AAPL/2020-01-02.csv'
+# 1 minute bars from 9:28 to 10:01 with a missing minute (9:45)
+times = pd.date_range('2020-01-02 09:28', '2020-01-02 10:01', freq='min')
+times = times[times != pd.Timestamp('2020-01-02 09:45')]
+bars = pd.DataFrame({
+    C.TIME: times,
+    C.OPEN: range(len(times)),
+    C.HIGH: [val + 2.0 for val in range(len(times))],
+    C.LOW: [val - 2.0 for val in range(len(times))],
+    C.CLOSE: [val + 1.0 for val in range(len(times))],
+    C.VOL: [0] * 2 + [10] * (len(times) - 2),
+    C.AVG: [val + 0.5 for val in range(len(times))],
+    C.TRADES: [1] * len(times)
+})
+
+
+class TestBarResampler:
+    def test_init(self):
+        assert type(resampler).__name__ == 'BarResampler'
+        assert resampler.root == root
+
+    def test_filter_hours(self):
+        rth = resampler.filter_hours(bars)
+        assert rth[C.TIME].iloc[0] == pd.Timestamp('2020-01-02 09:30')
+        assert len(rth) == len(bars) - 2
+        rth = resampler.filter_hours(bars, end='10:00')
+        assert rth[C.TIME].iloc[-1] == pd.Timestamp('2020-01-02 09:59')
+
+    def test_resample(self):
+        assert resampler.resample(bars, 1).equals(bars)
+        df = resampler.resample(bars, 15, C.MARKET_OPEN)
+        assert list(df.columns) == list(bars.columns)
+        # premarket bars line up with the open too
+        assert list(df[C.TIME].dt.strftime(C.TIME_FMT)) == [
+            '09:15', '09:30', '09:45', '10:00']
+        first, second, third, _ = df.to_dict('records')
+        # 9:30 to 9:44
+        assert second[C.OPEN] == 2
+        assert second[C.HIGH] == 16 + 2
+        assert second[C.LOW] == 2 - 2
+        assert second[C.CLOSE] == 16 + 1
+        assert second[C.VOL] == 150
+        assert second[C.TRADES] == 15
+        assert second[C.AVG] == sum(range(2, 17)) / 15 + 0.5
+        # 9:46 to 9:59 (9:45 is missing)
+        assert third[C.OPEN] == 17
+        assert third[C.VOL] == 140
+        # no volume, so Avg is a plain mean
+        assert first[C.VOL] == 0
+        assert first[C.AVG] == 1
+        assert resampler.resample(bars.head(0), 15).empty
+
+    def test_get_version(self):
+        version = resampler.get_version(bars)
+        assert version == resampler.get_version(bars.copy())
+        changed = bars.assign(**{C.CLOSE: bars[C.CLOSE] + 1})
+        assert version != resampler.get_version(changed)
+
+    def test_cache(self):
+        df = resampler.resample(bars, 5, C.MARKET_OPEN)
+        path = resampler.get_path(filename, 5, False, 'v1')
+        assert path == os.path.join(
+            root, 'data/intraday/polygon/AAPL/5min_rth/2020-01-02.v1.parquet')
+        assert resampler.load(path) is None
+        resampler.save(path, df)
+        assert resampler.load(path).equals(df)
+        # a new version replaces the old one
+        new_path = resampler.get_path(filename, 5, False, 'v2')
+        resampler.save(new_path, df)
+        assert os.listdir(os.path.dirname(path)) == [
+            os.path.basename(new_path)]
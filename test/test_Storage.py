@@ -30,18 +30,48 @@ class TestStore:
         assert hasattr(store, 'bucket_name')
         assert hasattr(store, 'finder')
 
+    def test_get_client(self):
+        client = store.get_client()
+        assert client is Store().get_client()
+        if C.STORAGE == C.S3:
+            config = client.meta.config
+            assert config.max_pool_connections == C.S3_MAX_POOL_CONNECTIONS
+
+            Store.reset_client()
+            assert Store.client is None
+            assert store.get_client() is not client
+
     def test_upload_file(self):
         store.finder.make_path(test_file1)
         with open(test_file1, 'w') as file:
             file.write('123')
         store.upload_file(test_file1)
         assert store.key_exists(test_file1)
+        assert store.get_stored_digest(test_file1) is None
+
+        digest = store.get_digest(test_file1)
+        assert len(digest) == 64
+        store.upload_file(test_file1, digest)
+        assert store.get_stored_digest(test_file1) == digest
+        assert store.get_stored_digest(f'{test_file1}_absent') is None
 
     def test_upload_dir(self):
         with open(test_file2, 'w') as file:
             file.write('b')
-        store.upload_dir(path=C.DEV_DIR)
+        report = store.upload_dir(path=C.DEV_DIR)
         assert store.key_exists(test_file2)
+        assert not report['errors']
+        assert report['files'] >= 2
+        assert report['bytes'] > 0
+
+    def test_download_dir(self):
+        os.remove(test_file2)
+        report = store.download_dir(C.DEV_DIR)
+        assert os.path.exists(test_file2)
+        assert not report['errors']
+        assert report['files'] > 0
+        # current local copies are skipped
+        assert store.download_dir(C.DEV_DIR)['files'] == 0
 
     def test_delete_objects(self):
         shutil.rmtree(C.DEV_DIR)
@@ -70,6 +100,79 @@ class TestStore:
         store.download_file(symbols_path)
         assert os.path.exists(symbols_path)
 
+        # other failures (e.g. a dropped connection) leave no partial file
+        client = store.get_client()
+        download = client.download_fileobj
+
+        def drop(*args, **kwargs):
+            raise ConnectionError('dropped')
+
+        client.download_fileobj = drop
+        try:
+            with pytest.raises(ConnectionError):
+                store.download_file(symbols_path)
+        finally:
+            client.download_fileobj = download
+        assert not os.path.exists(f'{symbols_path}.tmp')
+
+    def test_stream_object(self):
+        stream, etag = store.stream_object(symbols_path)
+        with stream:
+            with open(symbols_path, 'rb') as file:
+                assert stream.read() == file.read()
+        # unchanged objects are not transferred again
+        assert store.stream_object(symbols_path, etag) == (None, etag)
+
+    def test_revalidate_file(self):
+        store.freshness = C.ETAG
+        if os.path.exists(symbols_path):
+            os.remove(symbols_path)
+        assert store.revalidate_file(symbols_path)
+        assert os.path.exists(symbols_path)
+        assert store.read_sidecar(symbols_path)['ETag']
+        # unchanged objects are not transferred again
+        assert not store.revalidate_file(symbols_path)
+
+        with pytest.raises(ClientError):
+            store.revalidate_file(test_file1)
+        assert not os.path.exists(test_file1)
+        store.freshness = C.FRESHNESS
+
+    def test_upload_encoded(self):
+        store.finder.compression = {C.DEV_DIR: C.ZSTD}
+        data = 'Time,Open\n' + '2020-01-02,300.35\n' * 1000
+        store.finder.make_path(test_file1)
+        with open(test_file1, 'w') as file:
+            file.write(data)
+        assert store.upload_file(test_file1) < len(data)
+        obj = store.get_client().head_object(
+            Bucket=store.bucket_name, Key=test_file1)
+        assert obj['ContentEncoding'] == C.ZSTD
+        # local copies are stored plain
+        os.remove(test_file1)
+        store.download_file(test_file1)
+        with open(test_file1, 'r') as file:
+            assert file.read() == data
+
+        store.delete_objects([test_file1])
+        shutil.rmtree(C.DEV_DIR)
+        store.finder.compression = C.COMPRESSION
+
+    def test_download_plain(self):
+        # plain objects that start like an encoding aren't decoded
+        data = store.codec.magic[C.GZIP] + b'not gzip'
+        store.finder.make_path(test_file1)
+        with open(test_file1, 'wb') as file:
+            file.write(data)
+        store.upload_file(test_file1)
+        os.remove(test_file1)
+        store.download_file(test_file1)
+        with open(test_file1, 'rb') as file:
+            assert file.read() == data
+
+        store.delete_objects([test_file1])
+        shutil.rmtree(C.DEV_DIR)
+
     def test_rename_key(self):
         src_path = f'{symbols_path}_{run_id}_SRC2'
         dst_path = f'{symbols_path}_{run_id}_DST2'
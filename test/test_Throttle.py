@@ -0,0 +1,50 @@
+import sys
+import tempfile
+from time import time
+from multiprocessing import Process
+sys.path.append('hyperdrive')
+from Throttle import TokenBucket  # noqa autopep8
+
+root = tempfile.mkdtemp()
+# 20 calls per second after a burst of 2
+bucket = TokenBucket('test', 20, 2, root)
+
+
+def take(num_calls):
+    bucket_ = TokenBucket('test', 20, 2, root)
+    for _ in range(num_calls):
+        bucket_.acquire()
+
+
+class TestTokenBucket:
+    def test_init(self):
+        assert type(bucket).__name__ == 'TokenBucket'
+        assert bucket.path.startswith(root)
+
+    def test_acquire(self):
+        bucket.reset()
+        # the burst doesn't wait
+        assert bucket.acquire() < 0.01
+        assert bucket.acquire() < 0.01
+        # the bucket is empty now
+        assert bucket.acquire() > 0.03
+
+    def test_stats(self):
+        stats = bucket.stats()
+        assert stats['calls'] == 3
+        assert stats['waits'] == 1
+        assert stats['max_wait'] > 0.03
+        assert stats['wait_seconds'] >= stats['max_wait']
+
+    def test_reset(self):
+        bucket.reset()
+        assert bucket.stats()['calls'] == 0
+
+    def test_processes(self):
+        # 2 processes share the bucket, so 12 calls take ~0.5s, not ~0.2s
+        start = time()
+        procs = [Process(target=take, args=(6,)) for _ in range(2)]
+        [proc.start() for proc in procs]
+        [proc.join() for proc in procs]
+        assert time() - start > 0.45
+        assert bucket.stats()['calls'] == 12
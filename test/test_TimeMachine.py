@@ -41,6 +41,19 @@ class TestTimeTraveller:
     def test_dates_in_range(self):
         assert len(traveller.dates_in_range('1m')) > 20
 
+    def test_get_market_dates(self):
+        dates = traveller.get_market_dates('2024-01-01', '2024-12-31')
+        assert len(dates) == 252
+        # New Year's Day, MLK Day, Good Friday and Juneteenth
+        for holiday in ['2024-01-01', '2024-01-15',
+                        '2024-03-29', '2024-06-19']:
+            assert holiday not in dates
+        assert '2025-01-09' not in traveller.get_market_dates(
+            '2025-01-06', '2025-01-10')
+        # crypto trades every day
+        assert len(traveller.get_market_dates(
+            '2024-01-01', '2024-01-31', crypto=True)) == 31
+
     def test_combine_date_time(self):
         dt = traveller.combine_date_time('2020-01-02', '09:30')
         assert dt == datetime(2020, 1, 2, 9, 30)
@@ -3,6 +3,7 @@ import sys
 import pytest
 sys.path.append('hyperdrive')
 from Utils import SwissArmyKnife  # noqa autopep8
+from Storage import Store  # noqa autopep8
 import Constants as C  # noqa autopep8
 
 
@@ -15,6 +16,13 @@ class Example:
         self.bucket_name = 'random'
 
 
+class Parent:
+    def __init__(self):
+        self.count = 0
+        self.free = True
+        self.child = Example()
+
+
 ex = Example()
 
 
@@ -27,8 +35,14 @@ class TestSwissArmyKnife:
         with pytest.raises(AttributeError):
             getattr(ex, 'absent')
 
+        parent = knife.replace_attr(Parent(), 'var', 'nested')
+        assert parent.child.var == 'nested'
+        assert parent.count == 0
+
     def test_use_dev(self):
-        assert ex.bucket_name == 'random'
+        store = Store()
+        assert knife.use_dev(store) is store
         if not C.CI:
-            dev_ex = knife.use_dev(ex)
-            assert dev_ex.bucket_name == os.environ['S3_DEV_BUCKET']
+            assert store.bucket_name == os.environ['S3_DEV_BUCKET']
+            # stores made later use the dev bucket too
+            assert Store().bucket_name == os.environ['S3_DEV_BUCKET']
@@ -0,0 +1,55 @@
+import io
+import os
+import sys
+from time import perf_counter
+sys.path.append('hyperdrive')
+from Storage import Store  # noqa autopep8
+from Codec import Codec  # noqa autopep8
+import Constants as C  # noqa autopep8
+
+# Compares the size and speed of each codec and level (see COMPRESSION)
+# on a real dataset, synced from S3 first.
+# BENCH_DIR picks the dataset, defaults to data/ohlc/polygon.
+
+bench_dir = os.environ.get('BENCH_DIR') or '/'.join(
+    [C.DATA_DIR, C.OHLC_DIR, C.POLY_DIR])
+levels = {C.ZSTD: [1, 3, 9, 19], C.GZIP: [1, 6, 9]}
+
+store = Store()
+store.download_dir(bench_dir)
+
+files = []
+for root, _, names in os.walk(bench_dir):
+    for name in names:
+        path = os.path.join(root, name)
+        # parquet is already compressed internally
+        if store.finder.get_format(path) != C.PARQUET:
+            with open(path, 'rb') as file:
+                files.append(file.read())
+
+raw = sum(len(data) for data in files)
+print(f'{len(files)} files ({raw / 1e6:.1f} MB) in {bench_dir}')
+print(f'{"codec":<6}{"level":>6}{"MB":>10}{"ratio":>8}'
+      f'{"comp MB/s":>12}{"decomp MB/s":>14}')
+
+for codec, codec_levels in levels.items():
+    for level in codec_levels:
+        codec_ = Codec({codec: level})
+        size = 0
+        compress_time = 0
+        decompress_time = 0
+        for data in files:
+            compressed = io.BytesIO()
+            start = perf_counter()
+            codec_.compress(io.BytesIO(data), compressed, codec)
+            compress_time += perf_counter() - start
+            size += compressed.tell()
+            compressed.seek(0)
+            start = perf_counter()
+            codec_.decompress(compressed, io.BytesIO(), codec)
+            decompress_time += perf_counter() - start
+        mb = raw / 1e6
+        print(f'{codec:<6}{level:>6}{size / 1e6:>10.2f}'
+              f'{raw / size if size else 0:>8.2f}'
+              f'{mb / compress_time if compress_time else 0:>12.1f}'
+              f'{mb / decompress_time if decompress_time else 0:>14.1f}')
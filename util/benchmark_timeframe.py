@@ -0,0 +1,59 @@
+import sys
+from datetime import datetime
+from time import perf_counter
+import numpy as np
+import pandas as pd
+sys.path.append('hyperdrive')
+from FileOps import FileReader  # noqa autopep8
+import Constants as C  # noqa autopep8
+
+# Compares the old data_in_timeframe (a strftime per row on a deep copy)
+# with the vectorized one on a year of synthetic minute bars,
+# checking that both keep the same rows.
+
+reader = FileReader()
+now = pd.Timestamp.now(C.TZ).tz_localize(None).floor('min')
+times = pd.date_range(now - pd.Timedelta('365d'), now, freq='min')
+# weekdays from 9:30 to 16:00
+minutes = times.hour * 60 + times.minute
+times = times[(times.dayofweek < 5) & (minutes >= 570) & (minutes < 960)]
+rng = np.random.default_rng(0)
+df = pd.DataFrame({
+    C.TIME: times,
+    C.CLOSE: 100 + rng.standard_normal(len(times)).cumsum() / 10,
+    C.VOL: rng.integers(0, 10000, len(times))
+})
+
+
+def old(df, col, timeframe):
+    df = df.copy()
+    delta = reader.traveller.convert_delta(timeframe)
+    df[col] = pd.to_datetime(df[col]).dt.tz_localize(C.TZ)
+    today = datetime.now(C.TZ)
+    filtered = df[df[col].apply(
+        lambda date: date.strftime('%Y-%m-%d')) >= pd.to_datetime(
+            today - delta).strftime('%Y-%m-%d')].copy(deep=True)
+    filtered[col] = filtered[col].dt.tz_localize(None)
+    return filtered
+
+
+inputs = {
+    'sorted': df,
+    'unsorted': df.sample(frac=1, random_state=0),
+    'str': df.assign(**{C.TIME: df[C.TIME].dt.strftime(
+        f'{C.DATE_FMT} {C.PRECISE_TIME_FMT}')})
+}
+print(f'{len(df)} bars')
+print(f'{"input":<10}{"timeframe":>10}{"old s":>10}{"new s":>10}'
+      f'{"speedup":>10}')
+for name, data in inputs.items():
+    for timeframe in ['1w', '3m', 'max']:
+        start = perf_counter()
+        expected = old(data, C.TIME, timeframe)
+        old_time = perf_counter() - start
+        start = perf_counter()
+        filtered = reader.data_in_timeframe(data, C.TIME, timeframe)
+        new_time = perf_counter() - start
+        pd.testing.assert_frame_equal(filtered, expected)
+        print(f'{name:<10}{timeframe:>10}{old_time:>10.3f}'
+              f'{new_time:>10.4f}{old_time / new_time:>9.0f}x')